@@ -299,7 +299,7 @@ def get_audit_logs():
 
 
 # ============ 客户端同步推送 ============
-import requests
+from node_client import node_http
 
 @admin_bp.route('/api/admin/node-files/<node_id>', methods=['GET'])
 @login_required
@@ -311,7 +311,7 @@ def get_node_client_files(node_id):
         return jsonify({'error': '节点不存在'}), 404
 
     try:
-        resp = requests.get(
+        resp = node_http.get(
             f"http://{node_config['ip']}:{node_config['port']}/api/client-files",
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
             timeout=30
@@ -349,7 +349,7 @@ def sync_client():
         if mode == 'selective' and selected_files:
             params['files'] = ','.join(selected_files)
 
-        resp = requests.get(
+        resp = node_http.get(
             export_url,
             params=params,
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -375,7 +375,7 @@ def sync_client():
             continue
 
         try:
-            resp = requests.post(
+            resp = node_http.post(
                 f"http://{target['ip']}:{target['port']}/api/receive-update",
                 files={'package': ('client.tar.gz', package_data)},
                 data={'backup': '1' if backup else '0'},
@@ -67,7 +67,9 @@ from user_routes import user_bp
 from node_routes import node_bp
 from file_routes import file_bp
 from encryption_routes import encryption_bp
-from ec_routes import ec_bp, init_ec_tables
+from ec_routes import ec_bp, init_ec_tables, start_repair_scheduler
+from node_stats import start_node_stats_poller
+from node_registry import start_node_registry
 from proxy_routes import proxy_bp
 from admin_routes import admin_bp
 from cross_pool_routes import cross_pool_bp, init_cross_pool_tables
@@ -307,6 +309,9 @@ if __name__ == '__main__':
 
     # 只在重载后的子进程打印一次
     if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_repair_scheduler()
+        start_node_registry()
+        start_node_stats_poller()
         url, _ng = start_ngrok(silent=True)  # 静默启动
         print("\n" + "=" * 40)
         print(f"🏠 内网: http://127.0.0.1:{FLASK_PORT}")
@@ -137,39 +137,19 @@ def get_all_nodes_from_db():
         return []
 
 
-def update_node_config(node_id, data):
-    """更新或添加节点配置"""
-    config = load_nodes_config()
-    existing = next((n for n in config if n['id'] == node_id), None)
-
-    if existing:
-        existing['name'] = data.get('name', existing.get('name'))
-        existing['ip'] = data.get('ip', existing.get('ip'))
-        existing['port'] = data.get('port', existing.get('port'))
-    else:
-        config.append({
-            'id': node_id,
-            'name': data.get('name', '未命名节点'),
-            'ip': data.get('ip'),
-            'port': data.get('port'),
-            'type': 'auto'
-        })
-
-    save_nodes_config(config)
-
-
 # ========== 节点数据获取 ==========
 def fetch_node_data(node_config, timeout=3):
     """从真实节点获取数据"""
-    import requests
+    from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+    from node_client import node_http
     try:
         base_url = f"http://{node_config['ip']}:{node_config['port']}"
 
-        info_response = requests.get(f"{base_url}/api/node-info", timeout=timeout)
+        info_response = node_http.get(f"{base_url}/api/node-info", timeout=timeout)
         if info_response.status_code != 200:
             raise Exception("节点信息获取失败")
 
-        stats_response = requests.get(f"{base_url}/api/system-stats", timeout=timeout)
+        stats_response = node_http.get(f"{base_url}/api/system-stats", timeout=timeout)
         if stats_response.status_code != 200:
             raise Exception("系统统计获取失败")
 
@@ -191,10 +171,10 @@ def fetch_node_data(node_config, timeout=3):
             "last_updated": datetime.now().isoformat()
         }
 
-    except requests.exceptions.Timeout:
+    except Timeout:
         print(f"[WARNING] 节点 {node_config['name']} 连接超时")
         return create_offline_node(node_config, "timeout")
-    except requests.exceptions.ConnectionError:
+    except RequestsConnectionError:
         print(f"[WARNING] 无法连接到节点 {node_config['name']}")
         return create_offline_node(node_config, "connection_error")
     except Exception as e:
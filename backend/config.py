@@ -6,4 +6,93 @@ NAS_SHARED_SECRET = "your-shared-secret-key"
 
 
 # 其他配置
-DATABASE_PATH = 'nas_center.db'
\ No newline at end of file
+DATABASE_PATH = 'nas_center.db'
+
+# 跨节点EC条带大小（每个数据分片每个条带的字节数），编解码按条带进行，内存占用约为 stripe × (k+m)
+EC_STRIPE_SIZE = 1 * 1024 * 1024
+
+# EC编解码进程池：工作进程数（None 为 CPU 核数，0 为在请求线程内同步执行）和最大在途条带任务数
+EC_CODEC_WORKERS = None
+EC_CODEC_QUEUE_SIZE = 16
+
+# 分片读写线程池大小，以及中心对单个节点同时发起的分片请求上限
+EC_SHARD_IO_WORKERS = 32
+EC_NODE_MAX_CONCURRENCY = 4
+
+# 分片读取对冲：节点延迟样本不足时，数据片超过该时间（秒）未返回即向校验片发起对冲请求
+EC_HEDGE_DEFAULT_DELAY = 1.0
+
+# 流式下载预读：每个下载在发送当前条带时预先收集/解码的条带数，以及全局预取线程数
+EC_READ_AHEAD_STRIPES = 2
+EC_PREFETCH_WORKERS = 8
+
+# 流式上传：每次从请求体读取的字节数；文件字段位于 target 之前时边接收边编码分发
+EC_UPLOAD_READ_SIZE = 256 * 1024
+
+# 新建EC策略/跨节点配置未指定编解码器时使用的默认值（已有文件按各自记录的编解码器读取），
+# 可通过环境变量切换以逐步灰度新编解码器；'auto' 表示按 k/m 选最快的编解码器（m ≤ 2 时为 pq）
+EC_DEFAULT_CODEC = os.environ.get('EC_DEFAULT_CODEC', 'reedsolo')
+
+# 分片巡检：节点分片清单接口的连接超时和读超时（秒）；连接不上的节点在连接超时后即判定其上分片全部丢失
+EC_MANIFEST_CONNECT_TIMEOUT = 3
+EC_MANIFEST_READ_TIMEOUT = 60
+
+# 分片校验巡检：每次巡检最多读取的分片字节数（按上次校验时间轮转，最久未校验的文件优先）
+# 与读取限速（字节/秒，0 表示不限速）；读到的条带块与记录的 CRC32 比对，不一致的分片标记为损坏并加入修复队列
+EC_SCRUB_BYTES_PER_SCAN = 2 * 1024 * 1024 * 1024
+EC_SCRUB_BANDWIDTH = 20 * 1024 * 1024
+
+# 后台EC修复：是否启用、同时修复的文件数、全量巡检间隔（秒）、单个文件最多重试次数，
+# 以及修复流量预算（字节/秒，读写合计，0 表示不限速），避免修复挤占前台读写
+EC_REPAIR_ENABLED = True
+EC_REPAIR_WORKERS = 2
+EC_REPAIR_SCAN_INTERVAL = 600
+EC_REPAIR_MAX_ATTEMPTS = 3
+EC_REPAIR_BANDWIDTH = 50 * 1024 * 1024
+# 巡检时节点不可达，其上的分片状态未知而不是丢失；连续不可达超过该时长（秒）才按丢失安排修复
+EC_REPAIR_OFFLINE_GRACE = 1800
+
+# 分片放置：各磁盘剩余空间（节点 /api/disk-info）的缓存时间（秒），放置时按剩余空间加权选择磁盘
+EC_PLACEMENT_FREE_TTL = 60
+
+# 中心访问节点的共享 HTTP 客户端：每个节点的连接池大小、连接失败重试次数与退避系数（秒），
+# 连接超时（秒，调用方给出的超时只约束读取），以及调用方未指定时的默认读超时（秒）
+NODE_HTTP_POOL_SIZE = 16
+NODE_HTTP_RETRIES = 2
+NODE_HTTP_RETRY_BACKOFF = 0.2
+NODE_HTTP_CONNECT_TIMEOUT = 3
+NODE_HTTP_TIMEOUT = 30
+
+# 节点熔断：连续失败（连接失败 / 超时）多少次后熔断，熔断期间请求立即失败，后台按间隔（秒）探测恢复
+NODE_BREAKER_FAILURES = 3
+NODE_BREAKER_PROBE_INTERVAL = 5
+
+# 自适应超时：每个节点的每种操作（方法 + 路径）保留最近多少次成功请求的耗时，样本足够后读超时取该操作 p99 的若干倍，
+# 下限（秒）防止抖动误判；调用方超时超过上限（秒）的长操作（上传、加密等）以及分片读写等数据传输仍按调用方给出的超时
+NODE_LATENCY_SAMPLES = 200
+NODE_ADAPTIVE_MIN_SAMPLES = 20
+NODE_ADAPTIVE_TIMEOUT_FACTOR = 3
+NODE_ADAPTIVE_TIMEOUT_MIN = 2.0
+NODE_ADAPTIVE_TIMEOUT_MAX = 30
+
+# 节点状态后台轮询：拉取间隔（秒）、并行线程数、单个节点请求超时（秒）；
+# /api/nodes、/api/stats 与监控视图读取轮询得到的内存快照，不在请求路径上访问节点
+NODE_STATS_INTERVAL = 5
+NODE_STATS_WORKERS = 16
+NODE_STATS_TIMEOUT = 5
+# 连续多少轮拉取系统状态失败才把节点标记为离线，偶发的一次超时不改变节点状态
+NODE_STATS_OFFLINE_FAILURES = 3
+
+# 节点心跳：内存登记表中的 last_seen / 状态批量写回数据库的间隔（秒），
+# 以及多久（秒）收不到心跳即判定节点离线
+NODE_HEARTBEAT_FLUSH_INTERVAL = 2
+NODE_HEARTBEAT_TIMEOUT = 90
+
+# 节点指标时序存储（由节点状态轮询写入）：各层的名称、降采样粒度（秒，0 为原始采样，间隔即 NODE_STATS_INTERVAL）
+# 与保留点数；每个节点每层一组定长环形缓冲，内存只随节点数增长，与运行时长无关
+NODE_METRICS_TIERS = [
+    ('raw', 0, 720),       # 5 秒一点，约 1 小时
+    ('1m', 60, 1440),      # 24 小时
+    ('5m', 300, 2016),     # 7 天
+    ('1h', 3600, 720),     # 30 天
+]
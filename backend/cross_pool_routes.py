@@ -2,7 +2,7 @@
 from flask import Blueprint, request, jsonify, session
 import sqlite3
 import json
-import requests
+from node_client import node_http
 import random
 from datetime import datetime
 from auth import login_required, admin_required
@@ -293,7 +293,7 @@ def delete_pool(pool_id):
 
             # 节点在线，立即删除
             try:
-                resp = requests.post(
+                resp = node_http.post(
                     f"http://{node_info['ip']}:{node_info['port']}/api/internal/delete-dir",
                     json={'path': f"{disk_path}/cross_pool"},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -417,7 +417,7 @@ def pool_disk_status(pool_id):
 
         # 向节点查询磁盘状态
         try:
-            resp = requests.get(
+            resp = node_http.get(
                 f"http://{node[0]}:{node[1]}/api/disk-info",
                 params={'path': disk_path},
                 headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -487,7 +487,7 @@ def select_disk_by_strategy(pool_id):
                 if not node:
                     continue
 
-                resp = requests.get(
+                resp = node_http.get(
                     f"http://{node[0]}:{node[1]}/api/disk-info",
                     params={'path': disk_info.get('disk')},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -525,7 +525,7 @@ def select_disk_by_strategy(pool_id):
                     weights.append(1)
                     continue
 
-                resp = requests.get(
+                resp = node_http.get(
                     f"http://{node[0]}:{node[1]}/api/disk-info",
                     params={'path': disk_info.get('disk')},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -738,7 +738,7 @@ def delete_file(pool_id, file_id):
     if node:
         # 请求节点删除实际文件
         try:
-            requests.post(
+            node_http.post(
                 f"http://{node[0]}:{node[1]}/api/internal/delete",
                 json={'path': real_path},
                 headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -940,7 +940,7 @@ def delete_volume(pool_id, volume_name):
 
             # 节点在线，立即删除
             try:
-                resp = requests.post(
+                resp = node_http.post(
                     f"http://{node_info['ip']}:{node_info['port']}/api/internal/delete-dir",
                     json={'path': target_path},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -1034,7 +1034,7 @@ def upload_file(pool_id):
 
     # 代理上传到目标节点
     try:
-        resp = requests.post(
+        resp = node_http.post(
             f"http://{node_ip}:{node_port}/api/internal/upload",
             files={'file': (file.filename, file_data)},
             data={'path': target_path},
@@ -1104,7 +1104,7 @@ def download_file(pool_id):
 
     # 从节点获取文件
     try:
-        resp = requests.get(
+        resp = node_http.get(
             f"http://{node[0]}:{node[1]}/api/internal/download",
             params={'path': real_path},
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -1185,7 +1185,7 @@ def rebuild_pool_index(pool_id):
         node_port = node_info['port']
 
         try:
-            resp = requests.get(
+            resp = node_http.get(
                 f"http://{node_ip}:{node_port}/api/internal/scan-dir",
                 params={'path': f"{disk_path}/cross_pool"},
                 headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -1417,7 +1417,7 @@ def process_pending_tasks():
         try:
             if task_type == 'delete_pool_files':
                 target_dir = params.get('target_dir')
-                resp = requests.post(
+                resp = node_http.post(
                     f"http://{node_info['ip']}:{node_info['port']}/api/internal/delete-dir",
                     json={'path': target_dir},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -1430,7 +1430,7 @@ def process_pending_tasks():
             elif task_type == 'delete_volume_files':
                 # 删除逻辑卷文件
                 target_path = params.get('target_path')
-                resp = requests.post(
+                resp = node_http.post(
                     f"http://{node_info['ip']}:{node_info['port']}/api/internal/delete-dir",
                     json={'path': target_path},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -1446,7 +1446,7 @@ def process_pending_tasks():
                 success_count = 0
                 for shard in shards:
                     try:
-                        resp = requests.delete(
+                        resp = node_http.delete(
                             f"http://{node_info['ip']}:{node_info['port']}/api/ec_shard",
                             params={
                                 'filename': shard.get('filename'),
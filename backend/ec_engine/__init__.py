@@ -1,5 +1,35 @@
 # ec_engine/__init__.py
-from .rs_systematic import encode as rs_encode, decode as rs_decode
+import os
+
 from .ec_error import ECError
+from .stripe import Stripe, stripe_count, get_stripe, iter_stripes, shard_length
+from .codecs import Codec, DEFAULT_CODEC, register_codec, get_codec, best_codec, list_codecs, _register_builtin
+
+# reedsolo 兼容编解码器的实现：auto（优先 NumPy 矩阵实现，缺少 numpy 时回退 reedsolo）/ vectorized / reedsolo
+_register_builtin(os.environ.get('EC_CODEC_BACKEND', 'auto').lower())
+EC_CODEC_BACKEND = get_codec(DEFAULT_CODEC).backend
+
+
+def rs_encode(data, k, m, codec=None):
+    """编码入口，codec 为编解码器名称，默认 reedsolo 兼容格式"""
+    return get_codec(codec).encode(data, k, m)
+
+
+def rs_decode(shards, k, m, shard_size, original_size, codec=None):
+    """
+    解码入口：系统码前 k 片即原始数据，数据片齐全时直接拼接截断，不走编解码器
+    """
+    return get_codec(codec).decode(shards, k, m, shard_size, original_size)
+
+
+def rs_reconstruct(shards, k, m, shard_size, targets, codec=None):
+    """定向修复入口：由存活分片只重建 targets 指定的分片，按 targets 顺序返回"""
+    return get_codec(codec).reconstruct(shards, k, m, shard_size, list(targets))
+
+
+from .codec_pool import CodecPool
+
 
-__all__ = ['rs_encode', 'rs_decode', 'ECError']
\ No newline at end of file
+__all__ = ['rs_encode', 'rs_decode', 'rs_reconstruct', 'ECError', 'EC_CODEC_BACKEND',
+           'Codec', 'DEFAULT_CODEC', 'register_codec', 'get_codec', 'best_codec', 'list_codecs',
+           'Stripe', 'stripe_count', 'get_stripe', 'iter_stripes', 'shard_length', 'CodecPool']
@@ -0,0 +1,369 @@
+# ec_engine/benchmark.py
+"""
+编解码基准测试：不需要任何节点，直接测量 ec_engine 各编解码实现的编码/解码吞吐（MB/s）和峰值内存，
+结果以 JSON 输出，便于保存下来与后续版本对比，在部署前发现编解码性能回退。
+
+用法（在 backend 目录下执行）:
+    python -m ec_engine.benchmark
+    python -m ec_engine.benchmark --codecs vectorized,pool --schemes 4+2,8+3 --sizes 4K,1M,64M -o bench.json
+
+说明:
+    - 擦除数 e 表示丢失前 e 个数据片（最坏情况，必须走矩阵求逆/纠删解码）
+    - 峰值内存由 tracemalloc 统计，单独跑一轮，不影响计时；pool 的子进程内存不在统计范围内
+    - 预计耗时超过 --max-seconds 的组合直接跳过（纯 Python 的 reedsolo 在大文件上非常慢）
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from . import EC_CODEC_BACKEND, get_codec, list_codecs
+from .stripe import iter_stripes
+
+DEFAULT_SCHEMES = '2+1,4+2,8+3,10+4'
+DEFAULT_SIZES = '4K,64K,1M,16M,256M,1G'
+# legacy（旧版 rs.py）只能正确还原很小的数据，不在默认列表中，需要时用 --codecs 指定
+DEFAULT_CODECS = 'vectorized,reedsolo,vandermonde,cauchy,pool'
+DEFAULT_STRIPE_SIZE = 1024 * 1024
+
+_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    for unit in ('G', 'M', 'K'):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f'{size // _UNITS[unit]}{unit}'
+    return str(size)
+
+
+def parse_scheme(text: str):
+    k, m = text.strip().split('+')
+    return int(k), int(m)
+
+
+# ==================== 各编解码实现的统一接口 ====================
+# encode(data, k, m) -> state；decode(state, k, m, size, erasures) -> bytes
+
+class _Codec:
+    max_erasures = None  # None 表示 0..m 都支持
+
+    def encode(self, data: bytes, k: int, m: int):
+        raise NotImplementedError
+
+    def decode(self, state, k: int, m: int, size: int, erasures: int) -> bytes:
+        raise NotImplementedError
+
+    def cleanup(self, state):
+        pass
+
+    def close(self):
+        pass
+
+
+class _MatrixCodec(_Codec):
+    """rs_vectorized / rs_systematic 模块或注册表中的编解码器：整块数据一次编码成 k+m 个分片"""
+
+    def __init__(self, impl):
+        self._encode = impl.encode
+        self._decode = impl.decode
+
+    def encode(self, data, k, m):
+        return self._encode(data, k, m)
+
+    def decode(self, shards, k, m, size, erasures):
+        shards = [None if i < erasures else s for i, s in enumerate(shards)]
+        return self._decode(shards, k, m, len(shards[-1]), size)
+
+
+class _PoolCodec(_Codec):
+    """生产路径：按条带切分，经 CodecPool 进程池并行编解码"""
+
+    def __init__(self, stripe_size: int, workers: Optional[int]):
+        from .codec_pool import CodecPool
+        self.stripe_size = stripe_size
+        self.pool = CodecPool(workers)
+
+    def encode(self, data, k, m):
+        futures = [(stripe, self.pool.submit_encode(data[stripe.data_offset:stripe.data_offset + stripe.data_len], k, m))
+                   for stripe in iter_stripes(len(data), k, self.stripe_size)]
+        return [(stripe, future.result()) for stripe, future in futures]
+
+    def decode(self, encoded, k, m, size, erasures):
+        futures = []
+        for stripe, shards in encoded:
+            shards = [None if i < erasures else s for i, s in enumerate(shards)]
+            futures.append(self.pool.submit_decode(shards, k, m, stripe.chunk_size, stripe.data_len))
+        return b''.join(future.result() for future in futures)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class _LegacyFileCodec(_Codec):
+    """旧版 rs.py：基于文件、整体交给 RSCodec，不支持按位置擦除，只测无擦除的情况"""
+    max_erasures = 0
+
+    def encode(self, data, k, m):
+        from .rs import rs_encode
+        workdir = tempfile.mkdtemp(prefix='ec-bench-')
+        source = os.path.join(workdir, 'source.bin')
+        with open(source, 'wb') as f:
+            f.write(data)
+        block_dirs = [os.path.join(workdir, f'disk{i}') for i in range(k + m)]
+        try:
+            rs_encode(source, k, m, block_dirs)
+        except BaseException:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        return workdir, block_dirs
+
+    def decode(self, state, k, m, size, erasures):
+        from .rs import rs_decode
+        workdir, block_dirs = state
+        output = os.path.join(workdir, 'out', 'decoded.bin')
+        rs_decode(block_dirs, output, k, m)
+        with open(output, 'rb') as f:
+            return f.read()
+
+    def cleanup(self, state):
+        shutil.rmtree(state[0], ignore_errors=True)
+
+
+def _vectorized_codec():
+    from . import rs_vectorized
+    return _MatrixCodec(rs_vectorized)
+
+
+def _reedsolo_codec():
+    from . import rs_systematic
+    return _MatrixCodec(rs_systematic)
+
+
+def make_codecs(names: List[str], stripe_size: int, workers: Optional[int]) -> Dict[str, Callable[[], _Codec]]:
+    """按名称返回各编解码实现的构造函数，缺少依赖时在构造时才报错；其余名称按编解码器注册表查找"""
+    available = {
+        'vectorized': _vectorized_codec,
+        'reedsolo': _reedsolo_codec,
+        'pool': lambda: _PoolCodec(stripe_size, workers),
+        'legacy': _LegacyFileCodec
+    }
+    for info in list_codecs():
+        available.setdefault(info['name'], lambda name=info['name']: _MatrixCodec(get_codec(name)))
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f'未知的编解码实现: {", ".join(unknown)}')
+    return {name: available[name] for name in names}
+
+
+# ==================== 计时与内存 ====================
+
+def _best_time(fn, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _peak_memory(fn):
+    """执行 fn 并返回 (tracemalloc 统计的峰值字节数, fn 的返回值)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, result
+
+
+def _mb_per_s(size: int, seconds: float) -> Optional[float]:
+    if not seconds:
+        return None
+    return round(size / seconds / 1e6, 3)
+
+
+def bench_case(codec: _Codec, k: int, m: int, size: int, repeat: int, measure_memory: bool) -> dict:
+    """对一组 (k, m, size) 测量编码和 0..m 个擦除下的解码，返回一条结果记录"""
+    data = os.urandom(size)
+    record = {'k': k, 'm': m, 'size': size, 'size_label': format_size(size)}
+
+    def encode():
+        return codec.encode(data, k, m)
+
+    # 计时轮次的编码结果只保留最后一份，避免多份分片同时驻留内存
+    encoded = None
+    encode_seconds = None
+    for _ in range(repeat):
+        if encoded is not None:
+            codec.cleanup(encoded)
+        start = time.perf_counter()
+        encoded = encode()
+        elapsed = time.perf_counter() - start
+        encode_seconds = elapsed if encode_seconds is None else min(encode_seconds, elapsed)
+
+    record['encode'] = {'seconds': round(encode_seconds, 6), 'mb_per_s': _mb_per_s(size, encode_seconds)}
+    if measure_memory:
+        peak, extra = _peak_memory(encode)
+        codec.cleanup(extra)
+        record['encode']['peak_memory'] = peak
+
+    max_erasures = m if codec.max_erasures is None else min(m, codec.max_erasures)
+    decode_records = []
+    try:
+        for erasures in range(max_erasures + 1):
+            try:
+                seconds, decoded = _best_time(lambda: codec.decode(encoded, k, m, size, erasures), repeat)
+            except Exception as e:
+                # 解码失败只记录在该擦除数下，保留编码结果
+                decode_records.append({'erasures': erasures, 'error': f'{type(e).__name__}: {e}'})
+                continue
+            entry = {
+                'erasures': erasures,
+                'seconds': round(seconds, 6),
+                'mb_per_s': _mb_per_s(size, seconds),
+                'correct': decoded == data
+            }
+            del decoded
+            if measure_memory:
+                entry['peak_memory'], _ = _peak_memory(lambda: codec.decode(encoded, k, m, size, erasures))
+            decode_records.append(entry)
+    finally:
+        codec.cleanup(encoded)
+
+    record['decode'] = decode_records
+    return record
+
+
+def run(codec_names: List[str], schemes, sizes: List[int], repeat: int = 3, max_seconds: float = 30.0,
+        measure_memory: bool = True, stripe_size: int = DEFAULT_STRIPE_SIZE, workers: Optional[int] = None,
+        log=None) -> dict:
+    """
+    运行基准测试并返回 JSON 可序列化的结果。
+    同一 codec、同一 (k, m) 下按大小递增执行，按上一档耗时线性外推，预计超过 max_seconds 的档位标记为 skipped。
+    """
+    log = log or (lambda msg: None)
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': _environment(),
+        'settings': {
+            'repeat': repeat,
+            'max_seconds': max_seconds,
+            'stripe_size': stripe_size,
+            'workers': workers,
+            'measure_memory': measure_memory
+        },
+        'results': []
+    }
+
+    for name, factory in make_codecs(codec_names, stripe_size, workers).items():
+        try:
+            codec = factory()
+        except Exception as e:
+            report['results'].append({'codec': name, 'error': f'{type(e).__name__}: {e}'})
+            log(f'[{name}] 初始化失败: {e}')
+            continue
+
+        try:
+            for k, m in schemes:
+                last_size, last_cost = None, None
+                for size in sorted(sizes):
+                    entry = {'codec': name}
+                    estimate = last_cost * size / last_size if last_cost is not None else 0.0
+                    if estimate > max_seconds:
+                        entry.update({'k': k, 'm': m, 'size': size, 'size_label': format_size(size),
+                                      'skipped': f'预计耗时 {estimate:.1f}s 超过 {max_seconds}s'})
+                        report['results'].append(entry)
+                        log(f'[{name}] {k}+{m} {format_size(size)}: 跳过')
+                        continue
+
+                    start = time.perf_counter()
+                    try:
+                        entry.update(bench_case(codec, k, m, size, repeat, measure_memory))
+                    except Exception as e:
+                        entry.update({'k': k, 'm': m, 'size': size, 'size_label': format_size(size),
+                                      'error': f'{type(e).__name__}: {e}'})
+                    report['results'].append(entry)
+
+                    # 耗时与数据大小近似线性，用本档总耗时外推下一档
+                    last_size, last_cost = size, time.perf_counter() - start
+                    if 'error' in entry:
+                        log(f'[{name}] {k}+{m} {format_size(size)}: 失败 {entry["error"]}')
+                    else:
+                        log(f'[{name}] {k}+{m} {format_size(size)}: 编码 {entry["encode"]["mb_per_s"]} MB/s, '
+                            f'解码 ' + ' / '.join(f'{d["mb_per_s"]} MB/s' if 'error' not in d
+                                                else f'擦除{d["erasures"]}失败（{d["error"]}）'
+                                                for d in entry['decode']))
+        finally:
+            codec.close()
+
+    return report
+
+
+def _environment() -> dict:
+    env = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'default_backend': EC_CODEC_BACKEND
+    }
+    for module in ('numpy', 'reedsolo'):
+        try:
+            env[module] = getattr(__import__(module), '__version__', 'unknown')
+        except ImportError:
+            env[module] = None
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ec_engine 编解码基准测试（无需节点）')
+    parser.add_argument('--codecs', default=DEFAULT_CODECS, help=f'逗号分隔，可选 {DEFAULT_CODECS},legacy')
+    parser.add_argument('--schemes', default=DEFAULT_SCHEMES, help='逗号分隔的 k+m 组合')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='逗号分隔的数据大小，支持 K/M/G 后缀')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测量重复次数，取最快一次')
+    parser.add_argument('--max-seconds', type=float, default=30.0, help='单个组合预计耗时上限（秒），超过则跳过')
+    parser.add_argument('--stripe-size', default=format_size(DEFAULT_STRIPE_SIZE), help='pool 使用的条带大小')
+    parser.add_argument('--workers', type=int, default=None, help='pool 的工作进程数，默认 CPU 核数')
+    parser.add_argument('--no-memory', action='store_true', help='不统计峰值内存')
+    parser.add_argument('-o', '--output', help='结果 JSON 写入的文件，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    report = run(
+        codec_names=[c.strip() for c in args.codecs.split(',') if c.strip()],
+        schemes=[parse_scheme(s) for s in args.schemes.split(',') if s.strip()],
+        sizes=[parse_size(s) for s in args.sizes.split(',') if s.strip()],
+        repeat=max(1, args.repeat),
+        max_seconds=args.max_seconds,
+        measure_memory=not args.no_memory,
+        stripe_size=parse_size(args.stripe_size),
+        workers=args.workers,
+        log=lambda msg: print(msg, file=sys.stderr)
+    )
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f'结果已写入 {args.output}', file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
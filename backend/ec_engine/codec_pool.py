@@ -0,0 +1,226 @@
+# ec_engine/codec_pool.py
+"""
+多进程编解码服务：条带之间相互独立，交给进程池并行编解码，不再占用 Flask 请求线程的 GIL。
+数据通过 multiprocessing.shared_memory 传递，共享内存中按槽位存放分片（槽位 i 在 i × chunk_size 处），
+只有分片元信息经过 pickle。
+工作进程用 forkserver（不可用时 spawn）启动：中心进程里有大量线程，fork 会把其他线程持有的锁原样复制进子进程。
+工作进程异常退出会使整个进程池失效（BrokenProcessPool），之后的提交换用新建的进程池。
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+from . import rs_encode, rs_decode, rs_reconstruct
+
+
+def _encode_job(shm_name: str, data_len: int, k: int, m: int, codec: Optional[str]) -> int:
+    """子进程：从共享内存读取条带数据，把 k+m 个分片写回各自槽位"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shards = rs_encode(bytes(shm.buf[:data_len]), k, m, codec)
+        chunk_size = len(shards[0])
+        for i, shard in enumerate(shards):
+            shm.buf[i * chunk_size:(i + 1) * chunk_size] = shard
+        return chunk_size
+    finally:
+        shm.close()
+
+
+def _decode_job(shm_name: str, present: List[bool], k: int, m: int, shard_size: int, original_size: int,
+                codec: Optional[str]) -> int:
+    """子进程：从共享内存槽位读取存活分片，解码结果写回共享内存开头"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shards = [bytes(shm.buf[i * shard_size:(i + 1) * shard_size]) if present[i] else None
+                  for i in range(k + m)]
+        decoded = rs_decode(shards, k, m, shard_size, original_size, codec)
+        shm.buf[:len(decoded)] = decoded
+        return len(decoded)
+    finally:
+        shm.close()
+
+
+def _reconstruct_job(shm_name: str, present: List[bool], k: int, m: int, shard_size: int, targets: List[int],
+                     codec: Optional[str]) -> int:
+    """子进程：从共享内存槽位读取存活分片，重建出的目标分片写回各自（原本为空的）槽位"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shards = [bytes(shm.buf[i * shard_size:(i + 1) * shard_size]) if present[i] else None
+                  for i in range(k + m)]
+        for t, shard in zip(targets, rs_reconstruct(shards, k, m, shard_size, targets, codec)):
+            shm.buf[t * shard_size:(t + 1) * shard_size] = shard
+        return len(targets)
+    finally:
+        shm.close()
+
+
+def _mp_context():
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _completed(result=None, error: Optional[BaseException] = None) -> Future:
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+class CodecPool:
+    """
+    进程池编解码服务。
+    workers: 工作进程数，None 表示 CPU 核数，<= 0 表示在调用线程内同步执行（调试或不支持多进程的环境）
+    queue_size: 同时在途（排队 + 执行中）的最大任务数，超出时 submit 阻塞，避免积压条带撑爆内存
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_size = queue_size or max(self.workers, 1) * 2
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor() if self.workers > 0 else None
+
+    @property
+    def inline(self) -> bool:
+        return self._executor is None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+
+    def _replace_broken(self, executor: ProcessPoolExecutor):
+        """进程池已失效时换一个新的；并发发现同一个失效进程池时只替换一次"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = self._new_executor()
+        executor.shutdown(wait=False)
+
+    def _submit(self, fn, shm, args, finish) -> Future:
+        self._slots.acquire()
+        outer = Future()
+        executor = self._executor
+
+        def _done(inner: Future):
+            try:
+                outer.set_result(finish(inner.result()))
+            except BrokenProcessPool as e:
+                # 执行中的工作进程异常退出：本任务失败，后续任务提交到新的进程池
+                self._replace_broken(executor)
+                outer.set_exception(e)
+            except BaseException as e:
+                outer.set_exception(e)
+            finally:
+                shm.close()
+                shm.unlink()
+                self._slots.release()
+
+        try:
+            try:
+                inner = executor.submit(fn, shm.name, *args)
+            except BrokenProcessPool:
+                self._replace_broken(executor)
+                executor = self._executor
+                inner = executor.submit(fn, shm.name, *args)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            self._slots.release()
+            raise
+        inner.add_done_callback(_done)
+        return outer
+
+    def submit_encode(self, data: bytes, k: int, m: int, codec: Optional[str] = None) -> Future:
+        """提交一个条带的编码任务，Future 结果为 k+m 个分片；codec 为编解码器名称"""
+        if self.inline:
+            try:
+                return _completed(rs_encode(data, k, m, codec))
+            except Exception as e:
+                return _completed(error=e)
+
+        chunk_size = (len(data) + k - 1) // k if len(data) else 1
+        shm = shared_memory.SharedMemory(create=True, size=(k + m) * chunk_size)
+        shm.buf[:len(data)] = data
+        # 末尾补零部分也属于数据片，需显式清零（共享内存不保证初始内容）
+        shm.buf[len(data):k * chunk_size] = bytes(k * chunk_size - len(data))
+
+        def finish(size):
+            return [bytes(shm.buf[i * size:(i + 1) * size]) for i in range(k + m)]
+
+        return self._submit(_encode_job, shm, (len(data), k, m, codec), finish)
+
+    def submit_decode(self, shards: List[Optional[bytes]], k: int, m: int,
+                      shard_size: int, original_size: int, codec: Optional[str] = None) -> Future:
+        """提交一个条带的解码任务，Future 结果为原始数据"""
+        shards = list(shards[:k + m]) + [None] * (k + m - len(shards[:k + m]))
+        data_intact = all(s is not None and len(s) >= shard_size for s in shards[:k])
+        if self.inline or data_intact:
+            # 数据片齐全时只是拼接，没必要经过进程池
+            try:
+                return _completed(rs_decode(shards, k, m, shard_size, original_size, codec))
+            except Exception as e:
+                return _completed(error=e)
+
+        shm = shared_memory.SharedMemory(create=True, size=(k + m) * shard_size)
+        present = []
+        for i, s in enumerate(shards):
+            present.append(s is not None)
+            if s is not None:
+                s = s[:shard_size]
+                base = i * shard_size
+                shm.buf[base:base + len(s)] = s
+                shm.buf[base + len(s):base + shard_size] = bytes(shard_size - len(s))
+
+        def finish(size):
+            return bytes(shm.buf[:size])
+
+        return self._submit(_decode_job, shm, (present, k, m, shard_size, original_size, codec), finish)
+
+    def submit_reconstruct(self, shards: List[Optional[bytes]], k: int, m: int, shard_size: int,
+                           targets: List[int], codec: Optional[str] = None) -> Future:
+        """
+        提交一个条带的定向修复任务，Future 结果为 targets 对应的分片列表。
+        只有前 k 个存活分片进入共享内存，运算量与 len(targets) 成正比
+        """
+        shards = list(shards[:k + m]) + [None] * (k + m - len(shards[:k + m]))
+        used = [i for i, s in enumerate(shards) if s is not None and i not in targets][:k]
+        shards = [s if i in used else None for i, s in enumerate(shards)]
+        targets = list(targets)
+        if self.inline:
+            try:
+                return _completed(rs_reconstruct(shards, k, m, shard_size, targets, codec))
+            except Exception as e:
+                return _completed(error=e)
+
+        shm = shared_memory.SharedMemory(create=True, size=(k + m) * shard_size)
+        for i in used:
+            s = shards[i][:shard_size]
+            base = i * shard_size
+            shm.buf[base:base + len(s)] = s
+            shm.buf[base + len(s):base + shard_size] = bytes(shard_size - len(s))
+
+        def finish(_):
+            return [bytes(shm.buf[t * shard_size:(t + 1) * shard_size]) for t in targets]
+
+        present = [s is not None for s in shards]
+        return self._submit(_reconstruct_job, shm, (present, k, m, shard_size, targets, codec), finish)
+
+    def encode(self, data: bytes, k: int, m: int, codec: Optional[str] = None) -> List[bytes]:
+        return self.submit_encode(data, k, m, codec).result()
+
+    def decode(self, shards: List[Optional[bytes]], k: int, m: int, shard_size: int, original_size: int,
+               codec: Optional[str] = None) -> bytes:
+        return self.submit_decode(shards, k, m, shard_size, original_size, codec).result()
+
+    def reconstruct(self, shards: List[Optional[bytes]], k: int, m: int, shard_size: int, targets: List[int],
+                    codec: Optional[str] = None) -> List[bytes]:
+        return self.submit_reconstruct(shards, k, m, shard_size, targets, codec).result()
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,178 @@
+# ec_engine/codecs.py
+"""
+编解码器注册表：每个文件记录写入时使用的编解码器名称，读取时按名称取回同一个编解码器，
+新策略可以换用更快的编解码器，旧文件仍按原编解码器解码。
+
+内置编解码器（均为系统码，前 k 片即原始数据）：
+    reedsolo     与 reedsolo 逐列编码逐字节兼容，历史文件默认使用；有 numpy 时走矩阵实现，否则回退 reedsolo
+    vandermonde  Vandermonde 矩阵化为系统形式的 RS 码（需要 numpy）
+    cauchy       Cauchy 矩阵 RS 码（需要 numpy）
+    pq           m ≤ 2 专用的 RAID-5/6 式 P+Q 码，整段异或/查表，最常见的 4+1、6+2 几何下最快
+"""
+from typing import Dict, List, Optional
+
+from .ec_error import ECError
+
+DEFAULT_CODEC = 'reedsolo'
+
+
+class Codec:
+    """
+    编解码器接口：name 写入文件索引，encode/decode 与 rs_encode/rs_decode 签名一致。
+    priority 用于 best_codec 按几何自动选择，数值越大越优先
+    """
+    name = ''
+    description = ''
+    priority = 0
+
+    def available(self) -> bool:
+        return True
+
+    def supports(self, k: int, m: int) -> bool:
+        return k > 0 and m > 0 and k + m <= 256
+
+    def encode(self, data: bytes, k: int, m: int) -> List[bytes]:
+        raise NotImplementedError
+
+    def _decode(self, shards, k, m, shard_size, original_size) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, shards, k: int, m: int, shard_size: int, original_size: int) -> bytes:
+        """系统码：数据片齐全时直接拼接截断，不走解码运算"""
+        data_shards = list(shards[:k])
+        if len(data_shards) == k and all(s is not None and len(s) >= shard_size for s in data_shards):
+            return b''.join(s[:shard_size] for s in data_shards)[:original_size]
+        return self._decode(shards, k, m, shard_size, original_size)
+
+    def reconstruct(self, shards, k: int, m: int, shard_size: int, targets: List[int]) -> List[bytes]:
+        """
+        只重建 targets 指定的分片。通用实现为解码后重新编码再取目标分片，
+        支持按生成矩阵逐行计算的编解码器应覆盖此方法
+        """
+        data = self.decode(shards, k, m, shard_size, k * shard_size)
+        encoded = self.encode(data, k, m)
+        return [encoded[t] for t in targets]
+
+
+class ReedsoloCodec(Codec):
+    name = 'reedsolo'
+    description = 'reedsolo 兼容 RS（历史格式）'
+
+    def __init__(self, backend: str = 'auto'):
+        self.backend = backend
+        self._encode_fn = None
+        self._decode_fn = None
+        if backend != 'reedsolo':
+            try:
+                from .rs_vectorized import encode, decode
+                self._encode_fn, self._decode_fn = encode, decode
+                self.backend = 'vectorized'
+            except ImportError:
+                if backend == 'vectorized':
+                    raise
+        if self._encode_fn is None:
+            from .rs_systematic import encode, decode
+            self._encode_fn, self._decode_fn = encode, decode
+            self.backend = 'reedsolo'
+
+    def encode(self, data, k, m):
+        return self._encode_fn(data, k, m)
+
+    def _decode(self, shards, k, m, shard_size, original_size):
+        return self._decode_fn(shards, k, m, shard_size, original_size)
+
+    def reconstruct(self, shards, k, m, shard_size, targets):
+        if self.backend != 'vectorized':
+            return super().reconstruct(shards, k, m, shard_size, targets)
+        from .rs_vectorized import reconstruct
+        return reconstruct(shards, k, m, shard_size, targets)
+
+
+class MatrixCodec(Codec):
+    """按校验矩阵编码的 RS 码，编解码共用 rs_vectorized 的矩阵实现"""
+
+    def __init__(self, name: str, description: str, parity_fn):
+        self.name = name
+        self.description = description
+        self._parity_fn = parity_fn
+
+    def available(self) -> bool:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def encode(self, data, k, m):
+        from .rs_vectorized import matrix_encode
+        return matrix_encode(data, k, m, self._parity_fn(k, m))
+
+    def _decode(self, shards, k, m, shard_size, original_size):
+        from .rs_vectorized import matrix_decode
+        return matrix_decode(shards, k, m, shard_size, original_size, self._parity_fn(k, m))
+
+    def reconstruct(self, shards, k, m, shard_size, targets):
+        from .rs_vectorized import reconstruct
+        return reconstruct(shards, k, m, shard_size, targets, self._parity_fn(k, m))
+
+
+class PQCodec(Codec):
+    name = 'pq'
+    description = 'P+Q 异或码（仅 m ≤ 2）'
+    priority = 100
+
+    def supports(self, k, m):
+        return 0 < k <= 255 and m in (1, 2)
+
+    def encode(self, data, k, m):
+        from .xor_pq import encode
+        return encode(data, k, m)
+
+    def _decode(self, shards, k, m, shard_size, original_size):
+        from .xor_pq import decode
+        return decode(shards, k, m, shard_size, original_size)
+
+    def reconstruct(self, shards, k, m, shard_size, targets):
+        from .xor_pq import reconstruct
+        return reconstruct(shards, k, m, shard_size, targets)
+
+
+_registry: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec, replace: bool = False) -> Codec:
+    if codec.name in _registry and not replace:
+        raise ValueError(f"编解码器已存在: {codec.name}")
+    _registry[codec.name] = codec
+    return codec
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """按名称取编解码器，None / 空串表示历史默认（reedsolo）"""
+    codec = _registry.get(name or DEFAULT_CODEC)
+    if codec is None:
+        raise ECError(f"未知的编解码器: {name}")
+    if not codec.available():
+        raise ECError(f"编解码器 {codec.name} 在当前环境不可用")
+    return codec
+
+
+def best_codec(k: int, m: int) -> str:
+    """该几何下最优先的可用编解码器，同优先级时取历史默认"""
+    candidates = [c for c in _registry.values() if c.available() and c.supports(k, m)]
+    if not candidates:
+        raise ECError(f"没有支持 k={k}, m={m} 的编解码器")
+    return max(candidates, key=lambda c: (c.priority, c.name == DEFAULT_CODEC)).name
+
+
+def list_codecs() -> List[dict]:
+    return [{'name': c.name, 'description': c.description, 'available': c.available()}
+            for c in _registry.values()]
+
+
+def _register_builtin(backend: str):
+    from .gf256 import vandermonde_parity_matrix, cauchy_parity_matrix
+    register_codec(ReedsoloCodec(backend))
+    register_codec(MatrixCodec('vandermonde', 'Vandermonde RS（需要 numpy）', vandermonde_parity_matrix))
+    register_codec(MatrixCodec('cauchy', 'Cauchy RS（需要 numpy）', cauchy_parity_matrix))
+    register_codec(PQCodec())
@@ -0,0 +1,143 @@
+# ec_engine/gf256.py
+"""
+GF(2^8) 有限域运算，参数与 reedsolo 默认值保持一致（本原多项式 0x11d，生成元 2，fcr=0），
+保证矩阵编解码的输出与 rs_systematic 逐列编码的结果逐字节相同。
+"""
+from functools import lru_cache
+from typing import List, Tuple
+
+PRIM = 0x11d
+GENERATOR = 2
+
+GF_EXP = [0] * 512
+GF_LOG = [0] * 256
+
+_x = 1
+for _i in range(255):
+    GF_EXP[_i] = _x
+    GF_LOG[_x] = _i
+    # 乘以生成元 2 再对本原多项式取模
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= PRIM
+for _i in range(255, 512):
+    GF_EXP[_i] = GF_EXP[_i - 255]
+
+
+def gf_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def gf_inv(a: int) -> int:
+    if a == 0:
+        raise ZeroDivisionError("GF(256) 中 0 没有逆元")
+    return GF_EXP[255 - GF_LOG[a]]
+
+
+def gf_pow(a: int, power: int) -> int:
+    if a == 0:
+        return 0
+    return GF_EXP[(GF_LOG[a] * power) % 255]
+
+
+def generator_poly(m: int) -> List[int]:
+    """RS 生成多项式 g(x) = (x - α^0)(x - α^1)...(x - α^(m-1))，高次项在前"""
+    g = [1]
+    for i in range(m):
+        root = gf_pow(GENERATOR, i)
+        out = [0] * (len(g) + 1)
+        for j, coef in enumerate(g):
+            out[j] ^= coef
+            out[j + 1] ^= gf_mul(coef, root)
+        g = out
+    return g
+
+
+@lru_cache(maxsize=64)
+def parity_matrix(k: int, m: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    返回 m×k 校验矩阵 P：parity[j] = Σ P[j][i]·data[i]。
+    系统码 RS 的校验位是消息的线性函数，对单位向量做一次多项式除法即可得到每一列。
+    """
+    gen = generator_poly(m)
+    matrix = [[0] * k for _ in range(m)]
+    for i in range(k):
+        # 消息 e_i 补 m 个零后对 g(x) 做综合除法，余数即校验位
+        msg = [0] * (k + m)
+        msg[i] = 1
+        for pos in range(k):
+            coef = msg[pos]
+            if coef != 0:
+                for j in range(1, len(gen)):
+                    msg[pos + j] ^= gf_mul(gen[j], coef)
+        for j in range(m):
+            matrix[j][i] = msg[k + j]
+    return tuple(tuple(row) for row in matrix)
+
+
+def generator_matrix(k: int, m: int, parity=None) -> List[List[int]]:
+    """(k+m)×k 生成矩阵：前 k 行为单位阵，后 m 行为校验矩阵（默认 reedsolo 兼容的校验矩阵）"""
+    parity = parity_matrix(k, m) if parity is None else parity
+    identity = [[1 if r == c else 0 for c in range(k)] for r in range(k)]
+    return identity + [list(row) for row in parity]
+
+
+def mat_mul(a, b) -> List[List[int]]:
+    """GF(256) 矩阵乘法"""
+    result = []
+    for row in a:
+        out = [0] * len(b[0])
+        for coef, b_row in zip(row, b):
+            if coef:
+                out = [o ^ gf_mul(coef, v) for o, v in zip(out, b_row)]
+        result.append(out)
+    return result
+
+
+@lru_cache(maxsize=64)
+def vandermonde_parity_matrix(k: int, m: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Vandermonde RS 的 m×k 校验矩阵：V[i][j] = i^j（i = 0..k+m-1 互不相同），
+    P = V下 · V上⁻¹ 把 V 化为系统形式，V 任意 k 行可逆，化简后仍是 MDS 码
+    """
+    if k + m > 256:
+        raise ValueError("k + m 不能超过 256")
+    vander = [[gf_pow(x, j) if x else (1 if j == 0 else 0) for j in range(k)] for x in range(k + m)]
+    parity = mat_mul(vander[k:], invert_matrix(vander[:k]))
+    return tuple(tuple(row) for row in parity)
+
+
+@lru_cache(maxsize=64)
+def cauchy_parity_matrix(k: int, m: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Cauchy RS 的 m×k 校验矩阵：P[j][i] = 1 / (x_j + y_i)，x_j = k + j，y_i = i，
+    两组取值不相交，Cauchy 矩阵任意方子阵可逆，[I | P] 为 MDS 码
+    """
+    if k + m > 256:
+        raise ValueError("k + m 不能超过 256")
+    return tuple(tuple(gf_inv((k + j) ^ i) for i in range(k)) for j in range(m))
+
+
+def invert_matrix(matrix: List[List[int]]) -> List[List[int]]:
+    """高斯-约当消元求 GF(256) 方阵的逆"""
+    size = len(matrix)
+    work = [list(row) + [1 if r == c else 0 for c in range(size)] for r, row in enumerate(matrix)]
+
+    for col in range(size):
+        pivot = next((r for r in range(col, size) if work[r][col] != 0), None)
+        if pivot is None:
+            raise ValueError("矩阵不可逆")
+        work[col], work[pivot] = work[pivot], work[col]
+
+        inv = gf_inv(work[col][col])
+        work[col] = [gf_mul(v, inv) for v in work[col]]
+
+        for r in range(size):
+            factor = work[r][col]
+            if r != col and factor != 0:
+                pivot_row = work[col]
+                work[r] = [v ^ gf_mul(factor, p) for v, p in zip(work[r], pivot_row)]
+
+    return [row[size:] for row in work]
@@ -41,7 +41,7 @@ def rs_encode(file_path: str, k: int, m: int, output_paths: List[str]):
         'm': m,
         'block_size': block_size,
         'original_size': len(content),
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': datetime.datetime.now().isoformat(),
         'filename': os.path.basename(file_path)
     }
     with open(os.path.join(output_paths[0], 'encoded', 'meta.json'), 'w') as f:
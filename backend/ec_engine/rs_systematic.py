@@ -65,14 +65,14 @@ def decode(shards: List[Optional[bytes]], k: int, m: int, shard_size: int, origi
 
     out_data_cols = [[0] * k for _ in range(shard_size)]
 
+    # 缺失分片对整个文件都相同，擦除位置只需计算一次
+    erase_pos = [i for i in range(n) if shards[i] is None]
+
     for j in range(shard_size):
         codeword = bytearray(n)
-        erase_pos = []
         for i in range(n):
             b = shards[i][j] if shards[i] is not None and j < len(shards[i]) else 0
             codeword[i] = b
-            if shards[i] is None:  # 简化擦除位置判断
-                erase_pos.append(i)
 
         # 解码（带擦除位）
         try:
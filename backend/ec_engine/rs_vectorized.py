@@ -0,0 +1,159 @@
+# ec_engine/rs_vectorized.py
+"""
+基于 NumPy 的系统码RS编解码：把编码看作 GF(256) 上的矩阵乘法，一次处理整个分片缓冲区，
+输出与 rs_systematic 逐列调用 reedsolo 的结果逐字节一致，已有分片可直接互读。
+matrix_encode / matrix_decode 接受任意 m×k 校验矩阵，Vandermonde / Cauchy 等编解码器共用同一套实现。
+"""
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .gf256 import GF_EXP, GF_LOG, parity_matrix, generator_matrix, invert_matrix, mat_mul
+
+# 256×256 完整乘法表：MUL_TABLE[c][x] = c·x，按系数取一行后对整段数据做查表
+_log = np.array(GF_LOG, dtype=np.int32)
+_exp = np.array(GF_EXP, dtype=np.uint8)
+MUL_TABLE = _exp[(_log[:, None] + _log[None, :])]
+MUL_TABLE[0, :] = 0
+MUL_TABLE[:, 0] = 0
+
+
+# 解码矩阵缓存容量：同一块坏盘引发的降级读/重建会反复命中同一擦除模式
+DECODE_MATRIX_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=DECODE_MATRIX_CACHE_SIZE)
+def decode_matrix(k: int, m: int, present: Tuple[int, ...], parity=None) -> Tuple[Tuple[int, ...], ...]:
+    """
+    擦除解码矩阵：取生成矩阵中 present（k 个存活分片下标，升序）对应的 k×k 子矩阵求逆，
+    按 (k, m, present, 校验矩阵) 缓存，同一擦除模式只求逆一次
+    """
+    gen = generator_matrix(k, m, parity)
+    inverse = invert_matrix([gen[i] for i in present])
+    return tuple(tuple(row) for row in inverse)
+
+
+@lru_cache(maxsize=DECODE_MATRIX_CACHE_SIZE)
+def repair_matrix(k: int, m: int, present: Tuple[int, ...], targets: Tuple[int, ...],
+                  parity=None) -> Tuple[Tuple[int, ...], ...]:
+    """
+    定向修复矩阵：len(targets)×k，第 r 行把 present 对应的 k 个存活分片线性组合成分片 targets[r]，
+    即生成矩阵第 targets[r] 行乘以存活子矩阵的逆，只需计算丢失的行
+    """
+    gen = generator_matrix(k, m, parity)
+    inverse = [list(row) for row in decode_matrix(k, m, present, parity)]
+    rows = mat_mul([gen[t] for t in targets], inverse)
+    return tuple(tuple(row) for row in rows)
+
+
+def _mul_acc(out: np.ndarray, coef: int, src: np.ndarray) -> None:
+    """out ^= coef·src"""
+    if coef == 0:
+        return
+    if coef == 1:
+        np.bitwise_xor(out, src, out=out)
+    else:
+        np.bitwise_xor(out, MUL_TABLE[coef][src], out=out)
+
+
+def encode(data: bytes, k: int, m: int) -> List[bytes]:
+    """
+    系统码RS编码：输入原始 data，输出 k+m 个等长分片（前 k 个为数据片，后 m 个为校验片）
+    """
+    return matrix_encode(data, k, m, parity_matrix(k, m))
+
+
+def decode(shards: List[Optional[bytes]], k: int, m: int, shard_size: int, original_size: int) -> bytes:
+    """
+    系统码RS解码：shards 长度应为 k+m，可包含 None；需保证有 >= k 片有效
+    """
+    return matrix_decode(shards, k, m, shard_size, original_size, parity_matrix(k, m))
+
+
+def matrix_encode(data: bytes, k: int, m: int, parity: Tuple[Tuple[int, ...], ...]) -> List[bytes]:
+    """按给定的 m×k 校验矩阵做系统码编码"""
+    if k <= 0 or m <= 0:
+        raise ValueError("k 和 m 必须为正整数")
+    shard_size = (len(data) + k - 1) // k if len(data) else 1
+    padded = np.zeros(k * shard_size, dtype=np.uint8)
+    padded[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+    data_rows = padded.reshape(k, shard_size)
+
+    parity_shards = []
+    for j in range(m):
+        acc = np.zeros(shard_size, dtype=np.uint8)
+        for i in range(k):
+            _mul_acc(acc, parity[j][i], data_rows[i])
+        parity_shards.append(acc.tobytes())
+
+    return [data_rows[i].tobytes() for i in range(k)] + parity_shards
+
+
+def matrix_decode(shards: List[Optional[bytes]], k: int, m: int, shard_size: int, original_size: int,
+                  parity: Tuple[Tuple[int, ...], ...]) -> bytes:
+    """按给定的 m×k 校验矩阵做擦除解码：shards 长度应为 k+m，可包含 None；需保证有 >= k 片有效"""
+    if k <= 0 or m <= 0:
+        raise ValueError("k 和 m 必须为正整数")
+    n = k + m
+    shards = list(shards[:n]) + [None] * (n - len(shards[:n]))
+
+    present = [i for i in range(n) if shards[i] is not None]
+    if len(present) < k:
+        raise ValueError("可用分片不足，无法恢复")
+
+    # 规范化长度：不足补零，超出截断
+    rows = {}
+    for i in present[:k]:
+        buf = np.zeros(shard_size, dtype=np.uint8)
+        s = shards[i][:shard_size]
+        buf[:len(s)] = np.frombuffer(s, dtype=np.uint8)
+        rows[i] = buf
+
+    used = tuple(present[:k])
+    inverse = decode_matrix(k, m, used, parity)
+
+    out = np.empty((k, shard_size), dtype=np.uint8)
+    for di in range(k):
+        if di in rows:
+            out[di] = rows[di]
+            continue
+        acc = np.zeros(shard_size, dtype=np.uint8)
+        for col, src in enumerate(used):
+            _mul_acc(acc, inverse[di][col], rows[src])
+        out[di] = acc
+
+    return out.tobytes()[:original_size]
+
+
+def reconstruct(shards: List[Optional[bytes]], k: int, m: int, shard_size: int, targets: List[int],
+                parity: Optional[Tuple[Tuple[int, ...], ...]] = None) -> List[bytes]:
+    """
+    只重建 targets 指定的分片（数据片或校验片均可）：取 k 个存活分片，每个目标分片一次矩阵行运算，
+    计算量与丢失分片数成正比，不需要先解出全部数据再整体重新编码
+    """
+    if k <= 0 or m <= 0:
+        raise ValueError("k 和 m 必须为正整数")
+    parity = parity_matrix(k, m) if parity is None else parity
+    n = k + m
+    shards = list(shards[:n]) + [None] * (n - len(shards[:n]))
+
+    present = tuple(i for i in range(n) if shards[i] is not None)[:k]
+    if len(present) < k:
+        raise ValueError("可用分片不足，无法恢复")
+
+    rows = []
+    for i in present:
+        buf = np.zeros(shard_size, dtype=np.uint8)
+        s = shards[i][:shard_size]
+        buf[:len(s)] = np.frombuffer(s, dtype=np.uint8)
+        rows.append(buf)
+
+    matrix = repair_matrix(k, m, present, tuple(targets), parity)
+    out = []
+    for coeffs in matrix:
+        acc = np.zeros(shard_size, dtype=np.uint8)
+        for coef, src in zip(coeffs, rows):
+            _mul_acc(acc, coef, src)
+        out.append(acc.tobytes())
+    return out
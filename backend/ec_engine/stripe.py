@@ -0,0 +1,39 @@
+# ec_engine/stripe.py
+"""
+条带化布局：文件按 k × stripe_size 字节切成条带，每个条带独立编码成 k+m 个块，
+第 i 个分片 = 各条带第 i 块按顺序拼接，条带 s 的块位于分片内偏移 s × stripe_size 处。
+旧格式文件等价于 stripe_size = shard_size、stripe_count = 1 的单条带文件。
+"""
+from typing import Iterator, NamedTuple
+
+
+class Stripe(NamedTuple):
+    index: int
+    data_offset: int   # 条带在原文件中的起始偏移
+    data_len: int      # 条带包含的原始数据长度
+    shard_offset: int  # 条带的块在每个分片内的起始偏移
+    chunk_size: int    # 条带内每个块的长度（与 rs_encode 的分片大小算法一致）
+
+
+def stripe_count(original_size: int, k: int, stripe_size: int) -> int:
+    """文件被切成的条带数，空文件也占一个条带"""
+    stripe_bytes = k * stripe_size
+    return max(1, (original_size + stripe_bytes - 1) // stripe_bytes)
+
+
+def get_stripe(index: int, original_size: int, k: int, stripe_size: int) -> Stripe:
+    data_offset = index * k * stripe_size
+    data_len = max(0, min(k * stripe_size, original_size - data_offset))
+    chunk_size = (data_len + k - 1) // k if data_len else 1
+    return Stripe(index, data_offset, data_len, index * stripe_size, chunk_size)
+
+
+def iter_stripes(original_size: int, k: int, stripe_size: int) -> Iterator[Stripe]:
+    for index in range(stripe_count(original_size, k, stripe_size)):
+        yield get_stripe(index, original_size, k, stripe_size)
+
+
+def shard_length(original_size: int, k: int, stripe_size: int) -> int:
+    """单个分片的总长度"""
+    last = get_stripe(stripe_count(original_size, k, stripe_size) - 1, original_size, k, stripe_size)
+    return last.shard_offset + last.chunk_size
@@ -0,0 +1,159 @@
+# ec_engine/xor_pq.py
+"""
+m ≤ 2 的快速编解码（RAID-5/6 式 P+Q）：
+    P = D0 ⊕ D1 ⊕ ... ⊕ D(k-1)
+    Q = g^0·D0 ⊕ g^1·D1 ⊕ ... ⊕ g^(k-1)·D(k-1)，g = 2
+整段缓冲区上运算，单个数据片丢失且 P 可用时只需异或。
+有 numpy 时按 8 字节一组异或，Q 用霍纳法则 Q = (...(D(k-1)·g ⊕ D(k-2))·g ⊕ ...) ⊕ D0 计算，
+乘 g 用移位加条件异或 0x1d 实现，不查表；没有 numpy 时用 int.from_bytes 大整数异或、bytes.translate 查表乘法。
+"""
+from functools import lru_cache
+from typing import List, Optional
+
+from .gf256 import gf_mul, gf_inv, gf_pow, GENERATOR, PRIM
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if np is not None:
+    _LOW7 = np.uint64(0x7f7f7f7f7f7f7f7f)
+    _HIGH = np.uint64(0x8080808080808080)
+    _POLY = np.uint64(PRIM & 0xff)
+    _SEVEN = np.uint64(7)
+    _ONE = np.uint64(1)
+
+
+@lru_cache(maxsize=256)
+def _mul_table(coef: int) -> bytes:
+    return bytes(gf_mul(coef, x) for x in range(256))
+
+
+def _mul(coef: int, buf: bytes) -> bytes:
+    """常数乘整段缓冲区"""
+    if coef == 1:
+        return buf
+    return buf.translate(_mul_table(coef))
+
+
+def _words(buf: bytes, size: int):
+    """把缓冲区补零到 8 字节对齐后看作 uint64 数组"""
+    padded = -size % 8
+    if padded:
+        buf = buf + b"\x00" * padded
+    return np.frombuffer(buf, dtype=np.uint64)
+
+
+def _xor_all(buffers, size: int) -> bytes:
+    if np is None:
+        acc = 0
+        for buf in buffers:
+            acc ^= int.from_bytes(buf, 'little')
+        return acc.to_bytes(size, 'little')
+
+    acc = np.zeros((size + 7) // 8, dtype=np.uint64)
+    for buf in buffers:
+        np.bitwise_xor(acc, _words(buf, size), out=acc)
+    return acc.tobytes()[:size]
+
+
+def _q_sum(data: List[Optional[bytes]], size: int) -> bytes:
+    """Σ g^i·D_i，None 视为全零"""
+    if np is None:
+        return _xor_all((_mul(gf_pow(GENERATOR, i), d) for i, d in enumerate(data) if d is not None), size)
+
+    acc = np.zeros((size + 7) // 8, dtype=np.uint64)
+    scratch = np.empty_like(acc)
+    for i in range(len(data) - 1, -1, -1):
+        # acc = acc·g：每个字节左移一位，最高位溢出的字节再异或本原多项式低 8 位
+        np.bitwise_and(acc, _HIGH, out=scratch)
+        np.right_shift(scratch, _SEVEN, out=scratch)
+        np.multiply(scratch, _POLY, out=scratch)
+        np.bitwise_and(acc, _LOW7, out=acc)
+        np.left_shift(acc, _ONE, out=acc)
+        np.bitwise_xor(acc, scratch, out=acc)
+        if data[i] is not None:
+            np.bitwise_xor(acc, _words(data[i], size), out=acc)
+    return acc.tobytes()[:size]
+
+
+def _check(k: int, m: int):
+    if k <= 0 or m <= 0:
+        raise ValueError("k 和 m 必须为正整数")
+    if m > 2:
+        raise ValueError("P+Q 编解码只支持 m ≤ 2")
+    if k > 255:
+        raise ValueError("P+Q 编解码要求 k ≤ 255")
+
+
+def encode(data: bytes, k: int, m: int) -> List[bytes]:
+    """输出 k 个数据片 + P（m ≥ 1）+ Q（m = 2）"""
+    _check(k, m)
+    shard_size = (len(data) + k - 1) // k if len(data) else 1
+    padded = data + b"\x00" * (k * shard_size - len(data))
+    data_shards = [padded[i * shard_size:(i + 1) * shard_size] for i in range(k)]
+
+    parity = [_xor_all(data_shards, shard_size)]
+    if m == 2:
+        parity.append(_q_sum(data_shards, shard_size))
+    return data_shards + parity
+
+
+def decode(shards: List[Optional[bytes]], k: int, m: int, shard_size: int, original_size: int) -> bytes:
+    """
+    擦除解码：shards 长度应为 k+m，可包含 None；需保证有 >= k 片有效
+    """
+    _check(k, m)
+    n = k + m
+    shards = list(shards[:n]) + [None] * (n - len(shards[:n]))
+    # 规范化长度：不足补零，超出截断
+    shards = [None if s is None else s[:shard_size] + b"\x00" * (shard_size - len(s[:shard_size]))
+              for s in shards]
+    if sum(1 for s in shards if s is not None) < k:
+        raise ValueError("可用分片不足，无法恢复")
+
+    data = shards[:k]
+    p = shards[k]
+    q = shards[k + 1] if m == 2 else None
+    missing = [i for i in range(k) if data[i] is None]
+
+    if len(missing) == 1:
+        x = missing[0]
+        if p is not None:
+            # 单片丢失：P 异或其余数据片
+            data[x] = _xor_all([p] + [d for d in data if d is not None], shard_size)
+        else:
+            # P 也丢失：g^x·Dx = Q ⊕ Σ(i≠x) g^i·Di
+            qx = _xor_all([q, _q_sum(data, shard_size)], shard_size)
+            data[x] = _mul(gf_inv(gf_pow(GENERATOR, x)), qx)
+    elif len(missing) == 2:
+        x, y = missing
+        pxy = _xor_all([p] + [d for d in data if d is not None], shard_size)   # Dx ⊕ Dy
+        qxy = _xor_all([q, _q_sum(data, shard_size)], shard_size)              # g^x·Dx ⊕ g^y·Dy
+        # Dx = (g^(y-x)·Pxy ⊕ g^(-x)·Qxy) / (g^(y-x) ⊕ 1)，Dy = Pxy ⊕ Dx
+        gyx = gf_pow(GENERATOR, y - x)
+        denom = gf_inv(gyx ^ 1)
+        a = gf_mul(gyx, denom)
+        b = gf_mul(gf_inv(gf_pow(GENERATOR, x)), denom)
+        data[x] = _xor_all([_mul(a, pxy), _mul(b, qxy)], shard_size)
+        data[y] = _xor_all([pxy, data[x]], shard_size)
+
+    return b''.join(data)[:original_size]
+
+
+def reconstruct(shards: List[Optional[bytes]], k: int, m: int, shard_size: int, targets: List[int]) -> List[bytes]:
+    """
+    只重建 targets 指定的分片：先补出缺失的数据片（单片丢失时只是异或），再按需计算 P / Q
+    """
+    data = decode(shards, k, m, shard_size, k * shard_size)
+    data_shards = [data[i * shard_size:(i + 1) * shard_size] for i in range(k)]
+    out = []
+    for t in targets:
+        if t < k:
+            out.append(data_shards[t])
+        elif t == k:
+            out.append(_xor_all(data_shards, shard_size))
+        else:
+            out.append(_q_sum(data_shards, shard_size))
+    return out
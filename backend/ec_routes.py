@@ -1,20 +1,55 @@
 # ec_routes.py - 纠删码策略路由
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request, send_file, Response
 import json
 import requests
+from node_client import node_http
 import hashlib
 import time
 import os
-from io import BytesIO
+import tempfile
+import itertools
+import math
+import random
+import shutil
+import mimetypes
+import threading
+import uuid
+import zlib
+from collections import deque
+from queue import Queue
+from datetime import datetime, timezone
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import quote
+from werkzeug.http import http_date
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, NeedData, Epilogue
 from auth import login_required, admin_required
 from common import get_db_connection, get_node_config_by_id
-from config import NAS_SHARED_SECRET
+from config import (NAS_SHARED_SECRET, EC_STRIPE_SIZE, EC_CODEC_WORKERS, EC_CODEC_QUEUE_SIZE,
+                    EC_SHARD_IO_WORKERS, EC_NODE_MAX_CONCURRENCY, EC_HEDGE_DEFAULT_DELAY,
+                    EC_READ_AHEAD_STRIPES, EC_PREFETCH_WORKERS, EC_UPLOAD_READ_SIZE, EC_DEFAULT_CODEC,
+                    EC_MANIFEST_CONNECT_TIMEOUT, EC_MANIFEST_READ_TIMEOUT, EC_REPAIR_ENABLED, EC_REPAIR_WORKERS,
+                    EC_REPAIR_SCAN_INTERVAL, EC_REPAIR_MAX_ATTEMPTS, EC_REPAIR_BANDWIDTH, EC_REPAIR_OFFLINE_GRACE, EC_PLACEMENT_FREE_TTL,
+                    EC_SCRUB_BYTES_PER_SCAN, EC_SCRUB_BANDWIDTH)
 
-# 导入EC编解码引擎
-from ec_engine import rs_encode, rs_decode
+# 导入EC编解码引擎（编解码统一经由进程池）
+from ec_engine import (iter_stripes, get_stripe, shard_length, ECError, CodecPool, DEFAULT_CODEC, get_codec, best_codec,
+                       list_codecs)
 
 ec_bp = Blueprint('ec', __name__)
 
+_codec_pool = None
+_codec_pool_lock = threading.Lock()
+
+
+def get_codec_pool():
+    """懒加载编解码进程池（首次用到时才启动工作进程）"""
+    global _codec_pool
+    if _codec_pool is None:
+        with _codec_pool_lock:
+            if _codec_pool is None:
+                _codec_pool = CodecPool(EC_CODEC_WORKERS, EC_CODEC_QUEUE_SIZE)
+    return _codec_pool
+
 
 def init_ec_tables():
     """初始化纠删码相关表"""
@@ -75,12 +110,198 @@ def init_ec_tables():
         )
     ''')
 
+    # 条带化字段：旧记录 stripe_size 为 0，按 shard_size 单条带处理
+    cursor.execute("PRAGMA table_info(cross_ec_files)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'stripe_size' not in columns:
+        cursor.execute('ALTER TABLE cross_ec_files ADD COLUMN stripe_size INTEGER DEFAULT 0')
+    if 'stripe_count' not in columns:
+        cursor.execute('ALTER TABLE cross_ec_files ADD COLUMN stripe_count INTEGER DEFAULT 1')
+    # 每个条带各分片块的 CRC32（JSON 二维数组 [条带][分片]），旧记录为空，读取时不做校验
+    if 'checksums' not in columns:
+        cursor.execute('ALTER TABLE cross_ec_files ADD COLUMN checksums TEXT')
+    # 编解码器名称：文件按写入时的编解码器读取，旧记录均为 reedsolo 兼容格式
+    if 'codec' not in columns:
+        cursor.execute(f"ALTER TABLE cross_ec_files ADD COLUMN codec TEXT DEFAULT '{DEFAULT_CODEC}'")
+    # 上次校验巡检（逐块比对 CRC32）的时间，巡检按此轮转
+    if 'scrubbed_at' not in columns:
+        cursor.execute('ALTER TABLE cross_ec_files ADD COLUMN scrubbed_at DATETIME')
+
+    # 策略与跨节点配置可指定编解码器
+    for table in ('ec_policies', 'cross_ec_config'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if 'codec' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN codec TEXT DEFAULT '{DEFAULT_CODEC}'")
+
+    # 分片放置（规范化）：cross_ec_disks 记录磁盘及其所在节点的 ip/port（节点换 IP 只需更新这里），
+    # cross_ec_shards 记录每个分片所在磁盘、长度、整片 CRC32 与状态（ok / lost / corrupt）。
+    # cross_ec_files.disks 仍随写入更新以兼容旧版本，路由只从这两张表读取
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cross_ec_disks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id TEXT NOT NULL,
+            ip TEXT,
+            port INTEGER,
+            disk TEXT NOT NULL,
+            UNIQUE(node_id, disk)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cross_ec_shards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER NOT NULL,
+            shard_index INTEGER NOT NULL,
+            disk_id INTEGER NOT NULL,
+            size INTEGER,
+            checksum TEXT,
+            state TEXT DEFAULT 'ok',
+            UNIQUE(file_id, shard_index),
+            FOREIGN KEY (file_id) REFERENCES cross_ec_files(id),
+            FOREIGN KEY (disk_id) REFERENCES cross_ec_disks(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cross_ec_disks_node ON cross_ec_disks (node_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cross_ec_shards_disk ON cross_ec_shards (disk_id)')
+
+    # 旧记录迁移：把 disks JSON 展开成分片行，ip/port 以节点表中的当前值为准
+    cursor.execute('''
+        SELECT id, disks, size, k, m, shard_size, stripe_size FROM cross_ec_files
+        WHERE id NOT IN (SELECT DISTINCT file_id FROM cross_ec_shards)
+    ''')
+    legacy_files = cursor.fetchall()
+    for file_id, disks_json, original_size, k, m, shard_size, stripe_size in legacy_files:
+        disks = []
+        for disk_info in (json.loads(disks_json) if disks_json else [])[:k + m]:
+            cursor.execute('SELECT ip, port FROM nodes WHERE node_id = ?', (disk_info.get('node_id'),))
+            node = cursor.fetchone()
+            disks.append(dict(disk_info, ip=node[0], port=node[1]) if node else disk_info)
+        _save_cross_ec_placement(cursor, file_id, disks, shard_length(original_size, k, stripe_size or shard_size))
+    if legacy_files:
+        print(f"[CROSS_EC] 已迁移 {len(legacy_files)} 个文件的分片放置信息")
+
+    # 后台修复队列：spare 为文件还能再丢失的分片数（m - 丢失数），越小越先修；
+    # repair_bytes 为预计修复流量（读 k 块 + 写丢失块），用于估算剩余时间
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ec_repair_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL UNIQUE,
+            spare INTEGER NOT NULL,
+            lost_indices TEXT,
+            repair_bytes INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            enqueued_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ec_repair_queue_pick ON ec_repair_queue (status, spare, enqueued_at)
+    ''')
+    # 校验巡检发现的损坏分片，与丢失分片分开记录；placement 为入队时的分片位置 [[分片索引, disk_id]]，
+    # 降级情况（丢失/损坏集合、分片位置）不变时巡检保留重试次数与失败状态
+    cursor.execute("PRAGMA table_info(ec_repair_queue)")
+    queue_columns = [col[1] for col in cursor.fetchall()]
+    if 'corrupt_indices' not in queue_columns:
+        cursor.execute('ALTER TABLE ec_repair_queue ADD COLUMN corrupt_indices TEXT')
+    if 'placement' not in queue_columns:
+        cursor.execute('ALTER TABLE ec_repair_queue ADD COLUMN placement TEXT')
+
     conn.commit()
     conn.close()
 
 
+def _cross_ec_disk_id(cursor, disk_info):
+    """登记磁盘并返回其 id，ip/port 以传入值为准"""
+    cursor.execute('''
+        INSERT OR IGNORE INTO cross_ec_disks (node_id, ip, port, disk) VALUES (?, ?, ?, ?)
+    ''', (disk_info['node_id'], disk_info['ip'], disk_info['port'], disk_info['disk']))
+    cursor.execute('''
+        UPDATE cross_ec_disks SET ip = ?, port = ? WHERE node_id = ? AND disk = ?
+    ''', (disk_info['ip'], disk_info['port'], disk_info['node_id'], disk_info['disk']))
+    cursor.execute('SELECT id FROM cross_ec_disks WHERE node_id = ? AND disk = ?',
+                   (disk_info['node_id'], disk_info['disk']))
+    return cursor.fetchone()[0]
+
+
+def _save_cross_ec_placement(cursor, file_id, disks, size, shard_checksums=None, indices=None):
+    """写入文件分片所在磁盘；indices 指定只更新哪些分片（重建时），默认全部"""
+    for i in (range(len(disks)) if indices is None else indices):
+        checksum = None if shard_checksums is None else f'{shard_checksums[i]:08x}'
+        cursor.execute('''
+            INSERT INTO cross_ec_shards (file_id, shard_index, disk_id, size, checksum, state)
+            VALUES (?, ?, ?, ?, ?, 'ok')
+            ON CONFLICT(file_id, shard_index) DO UPDATE SET
+                disk_id = excluded.disk_id, size = excluded.size, state = 'ok',
+                checksum = COALESCE(excluded.checksum, checksum)
+        ''', (file_id, i, _cross_ec_disk_id(cursor, disks[i]), size, checksum))
+
+
+def _load_cross_ec_placements(cursor, file_id=None):
+    """各文件按分片索引排列的磁盘信息 {file_id: [disk_info]}，file_id 指定时只查该文件"""
+    query = '''
+        SELECT s.file_id, d.node_id, d.ip, d.port, d.disk
+        FROM cross_ec_shards s JOIN cross_ec_disks d ON d.id = s.disk_id
+    '''
+    if file_id is None:
+        cursor.execute(query + ' ORDER BY s.file_id, s.shard_index')
+    else:
+        cursor.execute(query + ' WHERE s.file_id = ? ORDER BY s.shard_index', (file_id,))
+    placements = {}
+    for fid, node_id, ip, port, disk in cursor.fetchall():
+        placements.setdefault(fid, []).append({'node_id': node_id, 'ip': ip, 'port': port, 'disk': disk})
+    return placements
+
+
+def _load_cross_ec_disks(cursor, file_id):
+    return _load_cross_ec_placements(cursor, file_id).get(file_id, [])
+
+
+def _load_node_cross_ec_shards(cursor, node_id):
+    """某节点上的全部分片 [(filename, shard_index, disk)]，经 cross_ec_disks 的 node_id 索引查询"""
+    cursor.execute('''
+        SELECT f.filename, s.shard_index, d.disk
+        FROM cross_ec_disks d
+        JOIN cross_ec_shards s ON s.disk_id = d.id
+        JOIN cross_ec_files f ON f.id = s.file_id
+        WHERE d.node_id = ?
+        ORDER BY f.filename, s.shard_index
+    ''', (node_id,))
+    return cursor.fetchall()
+
+
+def _delete_cross_ec_placement(cursor, filename):
+    cursor.execute('''
+        DELETE FROM cross_ec_shards WHERE file_id IN (SELECT id FROM cross_ec_files WHERE filename = ?)
+    ''', (filename,))
+
+
 # ==================== EC策略管理 ====================
 
+def _resolve_codec(codec, k, m):
+    """
+    解析策略/配置指定的编解码器：'auto' 按几何选最快的可用编解码器（m ≤ 2 时为 pq），
+    返回 (编解码器名称, 错误信息)
+    """
+    try:
+        k, m = int(k), int(m)
+        if codec == 'auto':
+            return best_codec(k, m), None
+        if not get_codec(codec).supports(k, m):
+            return None, f'编解码器 {codec} 不支持 k={k}, m={m}'
+    except (ECError, ValueError) as e:
+        return None, str(e)
+    return codec, None
+
+
+@ec_bp.route('/api/ec_codecs', methods=['GET'])
+@login_required
+def get_ec_codecs():
+    """可用的编解码器列表"""
+    return jsonify({'success': True, 'codecs': list_codecs(), 'default': EC_DEFAULT_CODEC})
+
+
 @ec_bp.route('/api/ec_policies', methods=['GET'])
 @login_required
 def get_ec_policies():
@@ -89,7 +310,7 @@ def get_ec_policies():
     cursor = conn.cursor()
 
     cursor.execute('''
-        SELECT id, name, description, policy_type, k, m, status, created_at
+        SELECT id, name, description, policy_type, k, m, status, created_at, codec
         FROM ec_policies
         ORDER BY created_at DESC
     ''')
@@ -104,7 +325,8 @@ def get_ec_policies():
             'k': row[4],
             'm': row[5],
             'status': row[6],
-            'created_at': row[7]
+            'created_at': row[7],
+            'codec': row[8] or DEFAULT_CODEC
         }
 
         cursor.execute('''
@@ -130,6 +352,7 @@ def create_ec_policy():
     policy_type = data.get('policy_type', 'intra_node')
     k = data.get('k')
     m = data.get('m')
+    codec = data.get('codec') or EC_DEFAULT_CODEC
 
     if not name or not k or not m:
         return jsonify({'error': '缺少必要参数'}), 400
@@ -137,13 +360,17 @@ def create_ec_policy():
     if policy_type not in ['intra_node', 'inter_node']:
         return jsonify({'error': '策略类型无效'}), 400
 
+    codec, codec_error = _resolve_codec(codec, k, m)
+    if codec_error:
+        return jsonify({'error': codec_error}), 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute('''
-        INSERT INTO ec_policies (name, description, policy_type, k, m, status)
-        VALUES (?, ?, ?, ?, ?, 'active')
-    ''', (name, description, policy_type, k, m))
+        INSERT INTO ec_policies (name, description, policy_type, k, m, status, codec)
+        VALUES (?, ?, ?, ?, ?, 'active', ?)
+    ''', (name, description, policy_type, k, m, codec))
 
     policy_id = cursor.lastrowid
     conn.commit()
@@ -193,14 +420,14 @@ def apply_ec_policy(policy_id):
 
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT policy_type, k, m FROM ec_policies WHERE id = ?', (policy_id,))
+    cursor.execute('SELECT policy_type, k, m, codec FROM ec_policies WHERE id = ?', (policy_id,))
     policy = cursor.fetchone()
 
     if not policy:
         conn.close()
         return jsonify({'error': '策略不存在'}), 404
 
-    policy_type, k, m = policy[0], policy[1], policy[2]
+    policy_type, k, m, codec = policy[0], policy[1], policy[2], policy[3] or DEFAULT_CODEC
 
     if policy_type != 'intra_node':
         conn.close()
@@ -217,8 +444,9 @@ def apply_ec_policy(policy_id):
 
     try:
         node_url = f"http://{node_ip}:{node_port}/api/ec_config"
-        response = requests.post(node_url, json={
+        response = node_http.post(node_url, json={
             'scheme': 'rs',
+            'codec': codec,
             'k': k,
             'm': m,
             'disks': disks
@@ -262,7 +490,7 @@ def get_node_ec_config(node_id):
     conn.close()
 
     try:
-        response = requests.get(
+        response = node_http.get(
             f"http://{node_ip}:{node_port}/api/ec_config",
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
             timeout=5
@@ -297,7 +525,7 @@ def save_node_ec_config(node_id):
     conn.close()
 
     try:
-        response = requests.post(
+        response = node_http.post(
             f"http://{node_ip}:{node_port}/api/ec_config",
             json=request.json,
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -332,7 +560,7 @@ def delete_node_ec_config(node_id):
     conn.close()
 
     try:
-        response = requests.delete(
+        response = node_http.delete(
             f"http://{node_ip}:{node_port}/api/ec_config",
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
             timeout=10
@@ -362,7 +590,7 @@ def proxy_node_disks(node_id):
     node_url = f"http://{node['ip']}:{node.get('port', 5000)}/api/disks"
 
     try:
-        resp = requests.get(node_url, timeout=10)
+        resp = node_http.get(node_url, timeout=10)
         return jsonify(resp.json()), resp.status_code
 
     except requests.exceptions.Timeout:
@@ -383,7 +611,7 @@ def get_cross_ec_config():
     cursor = conn.cursor()
 
     cursor.execute('''
-        SELECT id, name, k, m, nodes, status, created_at 
+        SELECT id, name, k, m, nodes, status, created_at, codec 
         FROM cross_ec_config 
         WHERE status = 'active'
         ORDER BY created_at DESC
@@ -407,7 +635,8 @@ def get_cross_ec_config():
         'nodes': nodes,
         'totalDisks': total_disks,
         'status': row[5],
-        'created_at': row[6]
+        'created_at': row[6],
+        'codec': row[7] or DEFAULT_CODEC
     }
 
     return jsonify({'success': True, 'config': config})
@@ -423,25 +652,34 @@ def save_cross_ec_config():
     m = data.get('m')
     nodes = data.get('nodes', [])
     name = data.get('name', 'default')
+    codec = data.get('codec') or EC_DEFAULT_CODEC
 
     if not k or not m:
         return jsonify({'error': '缺少k或m参数'}), 400
 
-
+    codec, codec_error = _resolve_codec(codec, k, m)
+    if codec_error:
+        return jsonify({'error': codec_error}), 400
 
     total_disks = sum(len(n.get('disks', [])) for n in nodes)
     if total_disks < k + m:
         return jsonify({'error': f'总磁盘数({total_disks})必须 >= k+m({k + m})'}), 400
 
+    # 故障域约束：每个节点最多放 ⌈(k+m)/节点数⌉ 个分片
+    disk_counts = [len(n.get('disks', [])) for n in nodes if n.get('disks')]
+    cap = math.ceil((k + m) / len(disk_counts))
+    if sum(min(c, cap) for c in disk_counts) < k + m:
+        return jsonify({'error': f'每个节点最多放{cap}个分片，当前节点与磁盘分布无法容纳k+m({k + m})个分片'}), 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute("UPDATE cross_ec_config SET status = 'inactive'")
 
     cursor.execute('''
-        INSERT INTO cross_ec_config (name, k, m, nodes, status)
-        VALUES (?, ?, ?, ?, 'active')
-    ''', (name, k, m, json.dumps(nodes)))
+        INSERT INTO cross_ec_config (name, k, m, nodes, status, codec)
+        VALUES (?, ?, ?, ?, 'active', ?)
+    ''', (name, k, m, json.dumps(nodes), codec))
 
     config_id = cursor.lastrowid
     conn.commit()
@@ -476,76 +714,35 @@ def delete_cross_ec_config():
         for row in cursor.fetchall():
             nodes_map[str(row[0])] = {'ip': row[1], 'port': row[2], 'status': row[3]}
 
-        cursor.execute('SELECT filename, disks FROM cross_ec_files')
-        files = cursor.fetchall()
-
-        # 收集离线节点需要删除的分片
+        # 按节点逐个查询其上的分片（走 node_id 索引），离线节点的分片整体转为待处理任务
+        cursor.execute('SELECT DISTINCT node_id FROM cross_ec_disks')
+        shard_nodes = [row[0] for row in cursor.fetchall()]
         offline_shards = {}  # { node_id: [{ filename, shard_index, disk }, ...] }
 
-        for filename, disks_json in files:
-            try:
-                disks = json.loads(disks_json) if disks_json else []
-                for i, disk_info in enumerate(disks):
-                    if not isinstance(disk_info, dict):
-                        continue
-
-                    node_id = str(disk_info.get('node_id') or disk_info.get('nodeId') or '')
-                    node_ip = disk_info.get('ip')
-                    node_port = disk_info.get('port')
-                    disk = disk_info.get('disk')
-
-                    if not disk:
-                        continue
-
-                    # 检查节点状态
-                    node_info = nodes_map.get(node_id)
-                    if node_info:
-                        node_ip = node_info['ip']
-                        node_port = node_info['port']
-                        is_online = node_info['status'] == 'online'
-                    else:
-                        is_online = False
-
-                    if not is_online:
-                        # 节点离线，收集待处理任务
-                        if node_id not in offline_shards:
-                            offline_shards[node_id] = []
-                        offline_shards[node_id].append({
-                            'filename': filename,
-                            'shard_index': i,
-                            'disk': disk
-                        })
-                        continue
-
-                    if not node_ip or not node_port:
-                        continue
+        for shard_node in shard_nodes:
+            node_id = str(shard_node)
+            shards = [{'filename': filename, 'shard_index': i, 'disk': disk}
+                      for filename, i, disk in _load_node_cross_ec_shards(cursor, shard_node) if disk]
+            node_info = nodes_map.get(node_id)
+            if not node_info or node_info['status'] != 'online':
+                offline_shards[node_id] = shards
+                continue
 
-                    # 节点在线，立即删除
-                    try:
-                        resp = requests.delete(
-                            f"http://{node_ip}:{node_port}/api/ec_shard",
-                            params={
-                                'filename': filename,
-                                'shard_index': i,
-                                'disk': disk
-                            },
-                            headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                            timeout=5
-                        )
-                        if resp.status_code == 200:
-                            deleted_shards += 1
-                    except Exception as e:
-                        # 删除失败，加入离线待处理
-                        if node_id not in offline_shards:
-                            offline_shards[node_id] = []
-                        offline_shards[node_id].append({
-                            'filename': filename,
-                            'shard_index': i,
-                            'disk': disk
-                        })
-                        shard_errors.append(f"{filename}[{i}]: {str(e)}")
-            except Exception as e:
-                shard_errors.append(f"{filename}: {str(e)}")
+            for shard in shards:
+                # 节点在线，立即删除
+                try:
+                    resp = node_http.delete(
+                        f"http://{node_info['ip']}:{node_info['port']}/api/ec_shard",
+                        params=shard,
+                        headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+                        timeout=5
+                    )
+                    if resp.status_code == 200:
+                        deleted_shards += 1
+                except Exception as e:
+                    # 删除失败，加入离线待处理
+                    offline_shards.setdefault(node_id, []).append(shard)
+                    shard_errors.append(f"{shard['filename']}[{shard['shard_index']}]: {str(e)}")
 
         # 为离线节点创建待处理任务
         for node_id, shards in offline_shards.items():
@@ -562,6 +759,7 @@ def delete_cross_ec_config():
     cursor.execute("UPDATE cross_ec_config SET status = 'deleted'")
 
     # 2. 清理文件记录表
+    cursor.execute("DELETE FROM cross_ec_shards")
     cursor.execute("DELETE FROM cross_ec_files")
 
     conn.commit()
@@ -603,7 +801,7 @@ def get_ec_status():
 
     # 获取跨节点EC状态
     cursor.execute('''
-        SELECT id, name, k, m, nodes, status, created_at 
+        SELECT id, name, k, m, nodes, status, created_at, codec 
         FROM cross_ec_config 
         WHERE status = 'active'
         ORDER BY created_at DESC
@@ -622,6 +820,7 @@ def get_ec_status():
             'total_disks': total_disks,
             'status': row[5],
             'created_at': row[6],
+            'codec': row[7] or DEFAULT_CODEC,
             'health': 'healthy'
         }
 
@@ -632,7 +831,7 @@ def get_ec_status():
     for node in nodes:
         node_id, ip, port, name = node
         try:
-            response = requests.get(
+            response = node_http.get(
                 f"http://{ip}:{port}/api/ec_config",
                 headers={'X-NAS-Secret': NAS_SHARED_SECRET},
                 timeout=3
@@ -664,7 +863,7 @@ def get_ec_files():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('SELECT filename, size, k, m, sha256, created_at FROM cross_ec_files')
+    cursor.execute('SELECT filename, size, k, m, sha256, created_at, codec FROM cross_ec_files')
     rows = cursor.fetchall()
     conn.close()
 
@@ -675,6 +874,7 @@ def get_ec_files():
         'm': row[3],
         'sha256': row[4],
         'ctime': row[5],
+        'codec': row[6] or DEFAULT_CODEC,
         'source': 'cross',
         'sourceName': '跨节点EC'
     } for row in rows]
@@ -699,7 +899,7 @@ def proxy_node_ec_files(node_id):
     ip, port = node
 
     try:
-        response = requests.get(
+        response = node_http.get(
             f"http://{ip}:{port}/api/ec_files",
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
             timeout=10
@@ -707,27 +907,748 @@ def proxy_node_ec_files(node_id):
         return jsonify(response.json()), response.status_code
     except Exception as e:
         return jsonify({'error': f'获取EC文件列表失败: {str(e)}'}), 500
+
+
+# ==================== 跨节点EC分片读写 ====================
+#
+# 分片以 application/octet-stream 原始字节传输，定位信息放在查询参数中，分片元信息放在 X-EC-Meta 头（JSON）。
+# 旧节点只认 hex-in-JSON：二进制写入失败而 JSON 写入成功的节点会被记住，之后直接走 JSON；
+# 读取时带 Accept: application/octet-stream，旧节点仍返回 JSON，按响应类型分别解析。
+# 旧节点忽略 JSON 中的 offset、总是整片覆盖，因此 offset > 0 的条带块不走 JSON 回退：
+# 多条带文件的放置与重建目标都避开这类节点，只有单条带（只写偏移 0）的文件才会放到它们上面。
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+
+# 只支持 hex-in-JSON 的旧节点 {"ip:port"}
+_hex_only_nodes = set()
+
+
+def _supports_striped_writes(disk_info):
+    """节点能否按偏移写入条带块（未确认为只支持 JSON 的旧节点）"""
+    return f"{disk_info['ip']}:{disk_info['port']}" not in _hex_only_nodes
+
+
+def _store_cross_ec_shard(filename, shard_index, disk_info, shard_data, meta, offset=0, timeout=60):
+    """把分片（或分片内 offset 处的一个条带块）写入节点，失败抛出异常"""
+    node_key = f"{disk_info['ip']}:{disk_info['port']}"
+    url = f"http://{node_key}/api/ec_shard"
+
+    if node_key not in _hex_only_nodes:
+        resp = node_http.post(
+            url,
+            params={
+                'filename': filename,
+                'shard_index': shard_index,
+                'disk': disk_info['disk'],
+                'offset': offset
+            },
+            data=shard_data,
+            headers={
+                'X-NAS-Secret': NAS_SHARED_SECRET,
+                'Content-Type': BINARY_CONTENT_TYPE,
+                'X-EC-Meta': json.dumps(meta)
+            },
+            timeout=timeout
+        )
+        if resp.status_code == 200:
+            return
+        if offset > 0:
+            raise Exception(f"节点{disk_info.get('node_id')}按偏移写入失败({resp.status_code}): {resp.text}")
+        print(f"[CROSS_EC] 节点{disk_info.get('node_id')}二进制写入失败({resp.status_code})，尝试JSON格式")
+    elif offset > 0:
+        # JSON 写入会忽略 offset 并覆盖整个分片，宁可失败也不能写坏已写入的条带
+        raise Exception(f"节点{disk_info.get('node_id')}不支持按偏移写入分片")
+
+    resp = node_http.post(
+        url,
+        json={
+            'filename': filename,
+            'shard_index': shard_index,
+            'shard_data': shard_data.hex(),
+            'disk': disk_info['disk'],
+            'meta': meta
+        },
+        headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+        timeout=timeout
+    )
+    if resp.status_code != 200:
+        raise Exception(f"节点{disk_info.get('node_id')}存储分片失败: {resp.text}")
+    _hex_only_nodes.add(node_key)
+
+
+def _fetch_cross_ec_shard(filename, shard_index, disk_info, offset=0, length=None, timeout=10, cancel=None):
+    """
+    从节点获取单个分片（或分片内 [offset, offset+length) 的一段），失败返回 None。
+    cancel 为 threading.Event：发起请求前和接收响应体的过程中检查，已设置时关闭响应、放弃读取并返回 None
+    """
+    if cancel is not None and cancel.is_set():
+        return None
+    params = {
+        'filename': filename,
+        'shard_index': shard_index,
+        'disk': disk_info['disk']
+    }
+    if length is not None:
+        params['offset'] = offset
+        params['length'] = length
+
+    try:
+        resp = node_http.get(
+            f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
+            params=params,
+            headers={'X-NAS-Secret': NAS_SHARED_SECRET, 'Accept': BINARY_CONTENT_TYPE},
+            timeout=timeout,
+            stream=True
+        )
+        if resp.status_code == 200:
+            if resp.headers.get('Content-Type', '').startswith(BINARY_CONTENT_TYPE):
+                parts = []
+                for part in resp.iter_content(chunk_size=256 * 1024):
+                    if cancel is not None and cancel.is_set():
+                        resp.close()
+                        return None
+                    parts.append(part)
+                data = b''.join(parts)
+            else:
+                data = bytes.fromhex(resp.json()['shard_data'])
+            if length is not None and len(data) > length:
+                # 不支持区间读取的旧节点会返回整个分片
+                data = data[offset:offset + length]
+            return data
+        resp.close()
+    except Exception as e:
+        print(f"[CROSS_EC] 获取分片失败 {filename} shard {shard_index}: {e}")
+    return None
+
+
+def _delete_cross_ec_shard(filename, shard_index, disk_info, timeout=10):
+    """删除节点上的单个分片，返回是否成功"""
+    try:
+        resp = node_http.delete(
+            f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
+            params={
+                'filename': filename,
+                'shard_index': shard_index,
+                'disk': disk_info['disk']
+            },
+            headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+            timeout=timeout
+        )
+        return resp.status_code == 200
+    except Exception as e:
+        print(f"[CROSS_EC] 删除分片失败 {filename} shard {shard_index}: {e}")
+        return False
+
+
+# ==================== 跨节点EC分片并发IO ====================
+
+# 分片读写线程池（所有EC请求共享），以及每个节点的并发上限，避免单个慢盘被请求淹没。
+# 节点名额在进入线程池之前分配：超出上限的任务在该节点自己的等待队列里排队，
+# 线程池中只有拿到名额的任务，慢节点积压的任务不会占住其他节点要用的线程。
+_shard_io_pool = ThreadPoolExecutor(max_workers=EC_SHARD_IO_WORKERS, thread_name_prefix='ec-shard-io')
+_node_io = {}  # {"ip:port": [执行中的任务数, deque([(future, fn, args, kwargs)])]}
+_node_io_lock = threading.Lock()
+
+
+def _submit_node_io(disk_info, fn, *args, **kwargs):
+    """提交节点IO任务并立即返回 Future，同一节点同时执行的任务数受 EC_NODE_MAX_CONCURRENCY 限制"""
+    node_key = f"{disk_info['ip']}:{disk_info['port']}"
+    future = Future()
+    with _node_io_lock:
+        state = _node_io.setdefault(node_key, [0, deque()])
+        if state[0] >= EC_NODE_MAX_CONCURRENCY:
+            state[1].append((future, fn, args, kwargs))
+            return future
+        state[0] += 1
+    _shard_io_pool.submit(_run_node_io, node_key, future, fn, args, kwargs)
+    return future
+
+
+def _run_node_io(node_key, future, fn, args, kwargs):
+    """执行一个已拿到节点名额的任务，结束后把名额交给该节点队列中的下一个任务（重新进入线程池排队）"""
+    if future.set_running_or_notify_cancel():  # 排队期间已取消的任务不执行
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+    with _node_io_lock:
+        state = _node_io[node_key]
+        if not state[1]:
+            state[0] -= 1
+            return
+        next_task = state[1].popleft()
+    _shard_io_pool.submit(_run_node_io, node_key, *next_task)
+
+
+def _store_stripe_shards(filename, disks, shards, meta, offset=0):
+    """并发写入一个条带的 k+m 个块，等待全部完成，任一失败则抛出第一个异常"""
+    futures = [_submit_node_io(disk_info, _store_cross_ec_shard, filename, i, disk_info, shards[i], meta, offset)
+               for i, disk_info in enumerate(disks)]
+    errors = [f.exception() for f in futures]
+    first_error = next((e for e in errors if e is not None), None)
+    if first_error is not None:
+        raise first_error
+
+
+def _delete_cross_ec_shards(filename, disks, indices=None):
+    """并发删除文件在各节点上的分片（indices 指定只删除哪些分片，默认全部），返回成功删除的分片数"""
+    futures = [_submit_node_io(disks[i], _delete_cross_ec_shard, filename, i, disks[i])
+               for i in (range(len(disks)) if indices is None else indices)]
+    return sum(1 for f in futures if f.result())
+
+
+def _same_shard_position(old_disks, i, disk_info):
+    """旧文件的分片 i 是否就在 disk_info 上（节点上的分片按文件名、分片索引、磁盘存放）"""
+    return (i < len(old_disks) and
+            (old_disks[i]['node_id'], old_disks[i]['disk']) == (disk_info['node_id'], disk_info['disk']))
+
+
+def _avoid_old_shard_positions(target_disks, old_disks):
+    """
+    同名覆盖上传时在选出的磁盘间互换分片顺序，使新分片 i 不落在旧文件分片 i 所在的磁盘上：
+    上传期间旧文件保持完整，失败时只需清理新分片，提交后再删除旧分片。返回仍与旧分片重合的分片索引
+    """
+    for i in range(len(target_disks)):
+        if not _same_shard_position(old_disks, i, target_disks[i]):
+            continue
+        for j in range(len(target_disks)):
+            if (j != i and not _same_shard_position(old_disks, i, target_disks[j])
+                    and not _same_shard_position(old_disks, j, target_disks[i])):
+                target_disks[i], target_disks[j] = target_disks[j], target_disks[i]
+                break
+    return {i for i, disk_info in enumerate(target_disks) if _same_shard_position(old_disks, i, disk_info)}
+
+
+# 各节点分片读取延迟样本 {"ip:port": deque}，用于计算对冲读取的触发阈值（p95）
+_shard_latency = {}
+_shard_latency_lock = threading.Lock()
+
+
+def _record_shard_latency(disk_info, seconds):
+    node_key = f"{disk_info['ip']}:{disk_info['port']}"
+    with _shard_latency_lock:
+        samples = _shard_latency.get(node_key)
+        if samples is None:
+            samples = _shard_latency[node_key] = deque(maxlen=200)
+        samples.append(seconds)
+
+
+def _shard_hedge_delay(disk_info):
+    """某节点分片读取的 p95 延迟，样本不足时使用默认值"""
+    node_key = f"{disk_info['ip']}:{disk_info['port']}"
+    with _shard_latency_lock:
+        samples = sorted(_shard_latency.get(node_key, ()))
+    if len(samples) < 20:
+        return EC_HEDGE_DEFAULT_DELAY
+    return samples[int(len(samples) * 0.95) - 1]
+
+
+def _timed_fetch_cross_ec_shard(filename, shard_index, disk_info, offset, length, cancel=None):
+    start = time.monotonic()
+    data = _fetch_cross_ec_shard(filename, shard_index, disk_info, offset, length, cancel=cancel)
+    if data is not None:
+        _record_shard_latency(disk_info, time.monotonic() - start)
+    return data
+
+
+def _load_checksums(checksums_json):
+    """数据库中的条带校验和，旧记录返回 None"""
+    return json.loads(checksums_json) if checksums_json else None
+
+
+def _stripe_checksums(checksums, stripe):
+    return checksums[stripe.index] if checksums and stripe.index < len(checksums) else None
+
+
+def _chunk_intact(data, shard_index, length, checksums):
+    """条带块完整性：长度不足视为截断；有校验和时比对 CRC32，位翻转同样视为损坏"""
+    if length is not None and len(data) < length:
+        return False
+    return checksums is None or zlib.crc32(data) == checksums[shard_index]
+
+
+def _gather_cross_ec_shards(filename, k, m, disks, offset=0, length=None, failed=None, checksums=None):
+    """
+    并发收集解码所需分片，凑齐任意 k 个有效分片即返回，剩余请求不再等待。
+    先并发请求 k 个数据片（数据片齐全时 rs_decode 直接拼接，不读校验片也不做解码运算）；
+    某片失败时补请求下一个候选分片；某片超过该节点 p95 延迟仍未返回时，对冲请求一个校验片。
+    failed 为跨条带共享的失败分片集合，前面条带失败过的分片后续直接跳过。
+    checksums 为本条带各分片的 CRC32，校验不通过的块按擦除处理并补读下一个分片（只影响本条带）。
+    凑齐后仍在进行的读取（被对冲的慢分片、对冲请求）通过共享的取消标志中止，不再占用节点名额和带宽。
+    """
+    failed = failed if failed is not None else set()
+    shards = [None] * (k + m)
+    candidates = deque(i for i in range(min(k + m, len(disks))) if i not in failed)
+    running = {}  # {future: [分片索引, 发起时间, 是否已对冲]}
+    received = 0
+    cancel = threading.Event()
+
+    def launch():
+        i = candidates.popleft()
+        future = _submit_node_io(disks[i], _timed_fetch_cross_ec_shard, filename, i, disks[i], offset, length,
+                                 cancel)
+        running[future] = [i, time.monotonic(), False]
+
+    while candidates and len(running) < k:
+        launch()
+
+    while running and received < k:
+        timeout = None
+        if candidates:
+            deadlines = [start + _shard_hedge_delay(disks[i])
+                         for i, start, hedged in running.values() if not hedged]
+            if deadlines:
+                timeout = max(0.0, min(deadlines) - time.monotonic())
+
+        done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # 慢分片：对冲请求下一个候选分片
+            now = time.monotonic()
+            for state in list(running.values()):
+                i, start, hedged = state
+                if not hedged and candidates and now >= start + _shard_hedge_delay(disks[i]):
+                    state[2] = True
+                    print(f"[CROSS_EC] 分片 {i} 响应过慢，对冲读取分片 {candidates[0]}: {filename}")
+                    launch()
+            continue
+
+        for future in done:
+            i = running.pop(future)[0]
+            data = future.result()
+            if data is not None and not _chunk_intact(data, i, length, checksums):
+                print(f"[CROSS_EC] 分片 {i} 在偏移 {offset} 处校验失败，按擦除处理: {filename}")
+                if candidates:
+                    launch()
+            elif data is None:
+                failed.add(i)
+                if candidates:
+                    launch()
+            elif received < k:
+                shards[i] = data
+                received += 1
+
+    # 排队中的请求直接取消，已在传输的请求读到下一块时发现标志后关闭连接
+    cancel.set()
+    for future in running:
+        future.cancel()
+
+    return shards
+
+
+# 条带预取线程池：下载/导出在发送当前条带时，后台收集并解码后续条带
+_stripe_prefetch_pool = ThreadPoolExecutor(max_workers=EC_PREFETCH_WORKERS, thread_name_prefix='ec-prefetch')
+
+
+def _read_cross_ec_stripe_slice(filename, disks, stripe, lo, hi, failed, checksums=None):
+    """
+    只读取覆盖条带内 [lo, hi) 的数据片对应区段，无需解码；
+    所需数据片有任何一个不可用或校验失败时返回 None，由调用方改走整条带解码。
+    有校验和时需读取整块才能校验，此时按块读取后再截取。
+    """
+    chunk = stripe.chunk_size
+    indices = range(lo // chunk, (hi - 1) // chunk + 1)
+    if any(i in failed for i in indices):
+        return None
+
+    futures = []
+    for i in indices:
+        part_lo = max(lo, i * chunk) - i * chunk
+        part_hi = min(hi, (i + 1) * chunk) - i * chunk
+        if checksums is None:
+            fetch_lo, fetch_len = part_lo, part_hi - part_lo
+        else:
+            fetch_lo, fetch_len = 0, chunk
+        futures.append((i, part_lo - fetch_lo, part_hi - fetch_lo, fetch_len, _submit_node_io(
+            disks[i], _timed_fetch_cross_ec_shard, filename, i, disks[i],
+            stripe.shard_offset + fetch_lo, fetch_len)))
+
+    parts = []
+    for i, cut_lo, cut_hi, fetch_len, future in futures:
+        part = future.result()
+        if part is None or not _chunk_intact(part, i, fetch_len, checksums):
+            return None
+        parts.append(part[cut_lo:cut_hi])
+    return b''.join(parts)
+
+
+def _read_cross_ec_stripe(filename, k, m, disks, stripe, failed, lo=0, hi=None, checksums=None, codec=None):
+    """读取一个条带内 [lo, hi) 的原始数据：部分读取优先只取相关数据片，否则收集分片交给进程池解码"""
+    hi = stripe.data_len if hi is None else hi
+    partial = lo > 0 or hi < stripe.data_len
+    if partial:
+        data = _read_cross_ec_stripe_slice(filename, disks, stripe, lo, hi, failed, checksums)
+        if data is not None:
+            return data
+
+    shards = _gather_cross_ec_shards(filename, k, m, disks,
+                                     stripe.shard_offset, stripe.chunk_size, failed, checksums)
+    available = sum(1 for s in shards if s is not None)
+    if available < k:
+        raise ECError(f'分片不足，需要{k}个，只有{available}个')
+    decoded = get_codec_pool().submit_decode(shards, k, m, stripe.chunk_size, stripe.data_len, codec).result()
+    return decoded[lo:hi] if partial else decoded
+
+
+def _iter_cross_ec_file(filename, original_size, k, m, stripe_size, disks, start=0, end=None,
+                        read_ahead=None, checksums=None, codec=None):
+    """
+    逐条带收集分片并解码，依次产出文件 [start, end) 范围内的原始数据，只读取与该范围重叠的条带。
+    checksums 为文件的条带校验和（旧记录为 None），校验失败的块按擦除处理；codec 为文件记录的编解码器。
+    每产出一个条带时，后续 read_ahead 个条带已在后台收集/解码，内存占用约为 (read_ahead + 1) 个条带。
+    """
+    end = original_size if end is None else end
+    read_ahead = EC_READ_AHEAD_STRIPES if read_ahead is None else read_ahead
+    stripe_bytes = k * stripe_size
+    first_index = start // stripe_bytes
+    last_index = (end - 1) // stripe_bytes if end > start else first_index
+    failed = set()
+    pending = deque()
+
+    try:
+        for index in range(first_index, last_index + 1):
+            stripe = get_stripe(index, original_size, k, stripe_size)
+            lo = max(start - stripe.data_offset, 0)
+            hi = min(end - stripe.data_offset, stripe.data_len)
+            pending.append(_stripe_prefetch_pool.submit(
+                _read_cross_ec_stripe, filename, k, m, disks, stripe, failed, lo, hi,
+                _stripe_checksums(checksums, stripe), codec))
+            if len(pending) > read_ahead:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # 客户端中途断开或出错时，取消尚未开始的预取
+        for future in pending:
+            future.cancel()
+
+
+# ==================== 跨节点EC分片放置 ====================
+#
+# 每个文件的 k+m 个分片从配置中的全部磁盘里挑选，而不是固定使用前 k+m 个磁盘：
+# 同一节点最多放 ⌈(k+m)/节点数⌉ 个分片（节点故障最多丢这么多片），同一磁盘最多一个分片，
+# 满足约束的磁盘之间按剩余空间加权随机选择，写入负载和容量占用分摊到整个池。
+
+# 磁盘剩余空间缓存 {(ip, port, disk): (free, 查询时间)}
+_disk_free_cache = {}
+_disk_free_lock = threading.Lock()
+
+
+def _fetch_disk_free(disk_info):
+    try:
+        resp = node_http.get(
+            f"http://{disk_info['ip']}:{disk_info['port']}/api/disk-info",
+            params={'path': disk_info['disk']},
+            headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+            timeout=3
+        )
+        if resp.status_code == 200:
+            return resp.json().get('free')
+    except Exception:
+        pass
+    return None
+
+
+def _disk_free_space(disks):
+    """各磁盘剩余空间（字节，查询失败为 None），过期的缓存项并发刷新"""
+    now = time.monotonic()
+    keys = [(d['ip'], d['port'], d['disk']) for d in disks]
+    with _disk_free_lock:
+        stale = [d for d, key in zip(disks, keys)
+                 if key not in _disk_free_cache or now - _disk_free_cache[key][1] > EC_PLACEMENT_FREE_TTL]
+    futures = [(d, _shard_io_pool.submit(_fetch_disk_free, d)) for d in stale]
+    with _disk_free_lock:
+        for d, future in futures:
+            _disk_free_cache[(d['ip'], d['port'], d['disk'])] = (future.result(), now)
+        return [_disk_free_cache[key][0] for key in keys]
+
+
+def _reserve_disk_space(disks, nbytes):
+    """放置后先在缓存中扣减预计写入量，避免缓存有效期内的上传都挤到同一批磁盘"""
+    with _disk_free_lock:
+        for d in disks:
+            key = (d['ip'], d['port'], d['disk'])
+            free, fetched = _disk_free_cache.get(key, (None, 0))
+            if free is not None:
+                _disk_free_cache[key] = (max(free - nbytes, 0), fetched)
+
+
+def _cross_ec_disks(cursor, nodes):
+    """展开跨节点EC配置中的全部磁盘，跳过不存在、离线或熔断中的节点"""
+    all_disks = []
+    for node in nodes:
+        node_id = node.get('node_id')
+        cursor.execute('SELECT ip, port, status FROM nodes WHERE node_id = ?', (node_id,))
+        node_info = cursor.fetchone()
+        if not node_info or node_info[2] == 'offline':
+            continue
+        if not node_http.is_available(f"{node_info[0]}:{node_info[1]}"):
+            continue
+        for disk in node.get('disks', []):
+            # 兼容新旧格式：disk 可能是字符串 'F:' 或对象 { mount: 'F:', serial: 'xxx' }
+            disk_mount = disk if isinstance(disk, str) else disk.get('mount', disk)
+            all_disks.append({
+                'node_id': node_id,
+                'ip': node_info[0],
+                'port': node_info[1],
+                'disk': disk_mount
+            })
+    return all_disks
+
+
+def _place_shards(candidates, count, total, placed=None, domains=None):
+    """
+    从 candidates 中为 count 个分片选择磁盘，返回按分片顺序排列的磁盘列表，无法满足约束时抛出 ECError。
+    total 为文件分片总数（k+m），placed 为该文件其余分片已在的磁盘（重建时使用），一并计入各节点的分片数。
+    domains 为计算每节点上限所用的节点数，默认取 candidates 与 placed 涉及的节点数。
+    """
+    placed = placed or []
+    node_ids = {d['node_id'] for d in candidates} | {d['node_id'] for d in placed}
+    domains = domains or len(node_ids)
+    cap = math.ceil(total / max(domains, 1))
+
+    node_load = {}
+    used = set()
+    for d in placed:
+        node_load[d['node_id']] = node_load.get(d['node_id'], 0) + 1
+        used.add((d['node_id'], d['disk']))
+    free = _disk_free_space(candidates)
+
+    chosen = []
+    for _ in range(count):
+        eligible = [(d, f) for d, f in zip(candidates, free)
+                    if (d['node_id'], d['disk']) not in used and node_load.get(d['node_id'], 0) < cap]
+        if not eligible:
+            raise ECError(f'可用磁盘不足：{total}个分片需分布在{domains}个节点上，'
+                          f'每个节点最多{cap}个分片且每个磁盘最多1个分片')
+        # 剩余空间未知的磁盘按已知磁盘的最小值计权，全部未知时等概率
+        known = [f for _, f in eligible if f]
+        floor = min(known) if known else 1
+        disk, _ = random.choices(eligible, weights=[f if f else floor for _, f in eligible], k=1)[0]
+        chosen.append(disk)
+        used.add((disk['node_id'], disk['disk']))
+        node_load[disk['node_id']] = node_load.get(disk['node_id'], 0) + 1
+    return chosen
+
+
+# ==================== 跨节点EC流式上传 ====================
+
+class _MultipartUpload:
+    """
+    增量解析 multipart/form-data 请求体，不经过 request.files（后者会先把整个请求体落盘）。
+    next_file() 定位到 file 字段，之后 read(n) 边接收边返回文件内容；文件之前和之后的普通字段收集到 fields。
+    """
+
+    def __init__(self, stream, boundary, read_size=EC_UPLOAD_READ_SIZE):
+        self.fields = {}
+        self.filename = None
+        self.content_type = None
+        self._stream = stream
+        self._read_size = read_size
+        self._decoder = MultipartDecoder(boundary.encode('latin-1'))
+        self._field = None      # 正在接收的普通字段 [name, bytearray]
+        self._in_file = False
+        self._pending = b''     # 已解析但尚未被 read 取走的文件内容
+        self._eof = False
+        self._done = False
+
+    def _next_event(self):
+        while True:
+            event = self._decoder.next_event()
+            if not isinstance(event, NeedData):
+                return event
+            if self._eof:
+                raise ValueError('请求体不完整')
+            data = self._stream.read(self._read_size)
+            self._eof = not data
+            self._decoder.receive_data(data or None)
+
+    def _advance(self):
+        """处理一个解析事件，文件内容放入 _pending；返回 False 表示请求体已结束"""
+        if self._done:
+            return False
+        event = self._next_event()
+        if isinstance(event, Epilogue):
+            self._done = True
+        elif isinstance(event, File):
+            self._field = None
+            # 只取第一个 file 字段，其余文件字段忽略
+            self._in_file = event.name == 'file' and self.filename is None
+            if self._in_file:
+                self.filename = event.filename or ''
+                self.content_type = event.headers.get('Content-Type')
+        elif isinstance(event, Field):
+            self._field = [event.name, bytearray()]
+        elif isinstance(event, Data):
+            if self._in_file:
+                self._pending = event.data
+                self._in_file = event.more_data
+            elif self._field is not None:
+                self._field[1] += event.data
+                if not event.more_data:
+                    self.fields[self._field[0]] = self._field[1].decode('utf-8', 'replace')
+                    self._field = None
+        return True
+
+    def next_file(self):
+        """解析到 file 字段开头返回 True，请求体中没有文件时返回 False"""
+        while self.filename is None:
+            if not self._advance():
+                return False
+        return True
+
+    def read(self, size=-1):
+        """读取文件内容，至多 size 字节（size < 0 读到文件结尾），文件结束返回 b''"""
+        chunks = []
+        remaining = size
+        while remaining != 0:
+            if not self._pending:
+                if not self._in_file or not self._advance():
+                    break
+                continue
+            piece = self._pending if remaining < 0 else self._pending[:remaining]
+            self._pending = self._pending[len(piece):]
+            chunks.append(piece)
+            if remaining > 0:
+                remaining -= len(piece)
+        return b''.join(chunks)
+
+    def finish(self):
+        """读完请求体剩余部分，收集文件之后的普通字段"""
+        while self._advance():
+            pass
+        return self.fields
+
+
+def _read_full(reader, size):
+    """从流中读满 size 字节，流结束时返回实际读到的部分"""
+    chunks = []
+    while size > 0:
+        chunk = reader.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _encode_stream_to_cross_ec(reader, filename, k, m, disks, stripe_size, codec=None):
+    """
+    流水线上传：请求线程按条带从 reader 读取并增量计算 SHA-256，条带提交进程池编码，
+    发送线程按条带顺序把编好的分片并发推送到各节点，接收、编码、分发三者重叠进行。
+    在途条带数有上限（发送跟不上时读取阻塞），内存占用与文件大小无关。
+    返回 (original_size, shard_size, stripe_count, sha256, checksums, shard_checksums)，
+    checksums[条带][分片] 为各块的 CRC32，shard_checksums[分片] 为整个分片的 CRC32
+    """
+    stripe_bytes = k * stripe_size
+    pool = get_codec_pool()
+    outbox = Queue(maxsize=max(pool.workers, 1))
+    errors = []
+    checksums = []
+    shard_checksums = [0] * (k + m)
+
+    def send():
+        while True:
+            item = outbox.get()
+            if item is None:
+                return
+            stripe, future, meta = item
+            if errors:
+                continue
+            try:
+                shards = future.result()
+                checksums.append([zlib.crc32(shard) for shard in shards])
+                for i, shard in enumerate(shards):
+                    shard_checksums[i] = zlib.crc32(shard, shard_checksums[i])
+                _store_stripe_shards(filename, disks, shards, meta, offset=stripe.shard_offset)
+            except Exception as e:
+                errors.append(e)
+
+    def stripe_meta(stripe):
+        return {'k': k, 'm': m, 'codec': codec or DEFAULT_CODEC,
+                'stripe_size': stripe_size, 'stripe_index': stripe.index}
+
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    hasher = hashlib.sha256()
+    original_size = 0
+    held = None
+    try:
+        while True:
+            data = _read_full(reader, stripe_bytes)
+            if held is not None and not data:
+                break
+            if errors:
+                break
+            hasher.update(data)
+            original_size += len(data)
+            stripe = get_stripe(held[0].index + 1 if held else 0, original_size, k, stripe_size)
+            future = pool.submit_encode(data, k, m, codec)
+            # 读到下一个条带才能确定上一个不是最后一个，最后一个条带的元数据需带上文件总长与 SHA-256
+            if held is not None:
+                outbox.put((held[0], held[1], stripe_meta(held[0])))
+            held = (stripe, future)
+            if len(data) < stripe_bytes:
+                break
+
+        if not errors:
+            stripe, future = held
+            stripe_total = stripe.index + 1
+            shard_size = stripe.shard_offset + stripe.chunk_size
+            file_sha = hasher.hexdigest()
+            meta = stripe_meta(stripe)
+            meta.update({
+                'stripe_count': stripe_total,
+                'shard_size': shard_size,
+                'original_size': original_size,
+                'sha256': file_sha
+            })
+            outbox.put((stripe, future, meta))
+    finally:
+        outbox.put(None)
+        sender.join()
+
+    if errors:
+        raise errors[0]
+    return original_size, shard_size, stripe_total, file_sha, checksums, shard_checksums
+
+
 @ec_bp.route('/api/ec_upload', methods=['POST'])
 @login_required
 @admin_required
 def upload_ec_file():
-    """上传文件到EC池"""
-    if 'file' not in request.files:
+    """上传文件到EC池（跨节点目标边接收请求体边编码分发）"""
+    if request.mimetype != 'multipart/form-data' or 'boundary' not in request.mimetype_params:
         return jsonify({'error': '没有文件'}), 400
 
-    file = request.files['file']
-    target = request.form.get('target', 'cross')
-
-    if file.filename == '':
+    upload = _MultipartUpload(request.stream, request.mimetype_params['boundary'])
+    try:
+        has_file = upload.next_file()
+    except ValueError:
+        has_file = False
+    if not has_file:
+        return jsonify({'error': '没有文件'}), 400
+    if upload.filename == '':
         return jsonify({'error': '未选择文件'}), 400
 
+    # target 位于文件之前（或在查询参数中）时可直接流式处理；
+    # 否则先把文件落到临时文件，读完请求体拿到 target 后再决定去向
+    target = request.args.get('target') or upload.fields.get('target')
+    file_stream = upload
+    if target is None:
+        file_stream = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+        shutil.copyfileobj(upload, file_stream)
+        file_stream.seek(0)
+        target = upload.finish().get('target', 'cross')
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     if target == 'cross':
         # ==================== 跨节点EC上传 ====================
         cursor.execute('''
-            SELECT k, m, nodes FROM cross_ec_config 
+            SELECT k, m, nodes, codec FROM cross_ec_config 
             WHERE status = 'active' LIMIT 1
         ''')
         config = cursor.fetchone()
@@ -735,91 +1656,77 @@ def upload_ec_file():
             conn.close()
             return jsonify({'error': '未配置跨节点EC'}), 400
 
-        k, m, nodes_json = config
+        k, m, nodes_json, codec = config
+        codec = codec or DEFAULT_CODEC
         nodes = json.loads(nodes_json)
 
-        # 收集所有磁盘信息
-        all_disks = []
-        for node in nodes:
-            node_id = node.get('node_id')
-            cursor.execute('SELECT ip, port FROM nodes WHERE node_id = ?', (node_id,))
-            node_info = cursor.fetchone()
-            if node_info:
-                for disk in node.get('disks', []):
-                    # 兼容新旧格式：disk 可能是字符串 'F:' 或对象 { mount: 'F:', serial: 'xxx' }
-                    disk_mount = disk if isinstance(disk, str) else disk.get('mount', disk)
-                    all_disks.append({
-                        'node_id': node_id,
-                        'ip': node_info[0],
-                        'port': node_info[1],
-                        'disk': disk_mount
-                    })
+        # 收集所有磁盘信息；可能超过一个条带的文件不放到不支持按偏移写入的旧节点上
+        all_disks = _cross_ec_disks(cursor, nodes)
+        if not request.content_length or request.content_length > k * EC_STRIPE_SIZE:
+            all_disks = [d for d in all_disks if _supports_striped_writes(d)]
 
         if len(all_disks) < k + m:
             conn.close()
             return jsonify({'error': f'磁盘数量不足，需要{k+m}个，只有{len(all_disks)}个'}), 400
 
         try:
-            # 读取文件
-            data = file.read()
-            filename = file.filename
-            file_sha = hashlib.sha256(data).hexdigest()
-            original_size = len(data)
-
-            print(f"[CROSS_EC] 开始编码文件: {filename}, 大小: {original_size}, k={k}, m={m}")
-
-            # RS编码
-            shards = rs_encode(data, k, m)
-            shard_size = len(shards[0]) if shards else 0
-
-            print(f"[CROSS_EC] 编码完成，分片数: {len(shards)}, 分片大小: {shard_size}")
-
-            meta = {
-                'k': k, 'm': m,
-                'shard_size': shard_size,
-                'original_size': original_size,
-                'sha256': file_sha
-            }
+            # 每节点上限按配置中的节点数计算，节点离线时不放宽（宁可拒绝写入，也不写出单节点故障即不可恢复的文件）
+            target_disks = _place_shards(all_disks, k + m, k + m,
+                                         domains=sum(1 for node in nodes if node.get('disks')))
+        except ECError as e:
+            conn.close()
+            return jsonify({'error': str(e)}), 400
+        if request.content_length:
+            _reserve_disk_space(target_disks, request.content_length // k)
 
-            # 分发分片到各节点
-            used_disks = []
-            for i, disk_info in enumerate(all_disks[:k + m]):
-                shard_data = shards[i]
-                print(f"[CROSS_EC] 发送分片 {i} 到 {disk_info['node_id']}:{disk_info['disk']}")
-
-                resp = requests.post(
-                    f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
-                    json={
-                        'filename': filename,
-                        'shard_index': i,
-                        'shard_data': shard_data.hex(),
-                        'disk': disk_info['disk'],
-                        'meta': meta
-                    },
-                    headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                    timeout=60
-                )
-                if resp.status_code != 200:
-                    raise Exception(f"节点{disk_info['node_id']}存储分片失败: {resp.text}")
-
-                used_disks.append({
-                    'node_id': disk_info['node_id'],
-                    'ip': disk_info['ip'],
-                    'port': disk_info['port'],
-                    'disk': disk_info['disk']
-                })
+        filename = upload.filename
+        # 同名文件覆盖：记下旧版本的分片位置，新版本提交后删除
+        cursor.execute('SELECT id FROM cross_ec_files WHERE filename = ?', (filename,))
+        old_row = cursor.fetchone()
+        old_disks = _load_cross_ec_disks(cursor, old_row[0]) if old_row else []
+        overlap = _avoid_old_shard_positions(target_disks, old_disks)
 
-            # 保存文件索引
+        try:
+            stripe_size = EC_STRIPE_SIZE
+            print(f"[CROSS_EC] 开始流式编码文件: {filename}, k={k}, m={m}, 编解码器: {codec}, 条带大小: {stripe_size}")
+
+            original_size, shard_size, stripe_total, file_sha, checksums, shard_checksums = _encode_stream_to_cross_ec(
+                file_stream, filename, k, m, target_disks, stripe_size, codec)
+            upload.finish()
+            print(f"[CROSS_EC] 编码完成，大小: {original_size}, 条带数: {stripe_total}, "
+                  f"分片数: {k + m}, 分片大小: {shard_size}")
+
+            used_disks = [{
+                'node_id': disk_info['node_id'],
+                'ip': disk_info['ip'],
+                'port': disk_info['port'],
+                'disk': disk_info['disk']
+            } for disk_info in target_disks]
+
+            # 保存文件索引（同名文件覆盖时先清掉旧记录的分片行）
+            _delete_cross_ec_placement(cursor, filename)
             cursor.execute('''
-                INSERT OR REPLACE INTO cross_ec_files 
-                (filename, size, k, m, shard_size, sha256, disks, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
-            ''', (filename, original_size, k, m, shard_size, file_sha, json.dumps(used_disks)))
+                INSERT OR REPLACE INTO cross_ec_files
+                (filename, size, k, m, shard_size, sha256, disks, stripe_size, stripe_count, checksums, codec,
+                 created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+            ''', (filename, original_size, k, m, shard_size, file_sha, json.dumps(used_disks),
+                  stripe_size, stripe_total, json.dumps(checksums), codec))
+            _save_cross_ec_placement(cursor, cursor.lastrowid, used_disks, shard_size, shard_checksums)
             conn.commit()
             conn.close()
 
             print(f"[CROSS_EC] 文件上传成功: {filename}")
 
+            # 旧版本中未被新分片覆盖的分片尽力删除，失败只记录日志（巡检不会再引用它们）
+            stale = [i for i in range(len(old_disks)) if not _same_shard_position(used_disks, i, old_disks[i])]
+            if stale:
+                try:
+                    deleted = _delete_cross_ec_shards(filename, old_disks, stale)
+                    print(f"[CROSS_EC] 已清理旧版本分片 {deleted}/{len(stale)} 个: {filename}")
+                except Exception as e:
+                    print(f"[CROSS_EC] 清理旧版本分片失败 {filename}: {e}")
+
             return jsonify({
                 'success': True,
                 'message': f'文件 {filename} 已上传到跨节点EC池',
@@ -830,6 +1737,10 @@ def upload_ec_file():
             conn.close()
             import traceback
             traceback.print_exc()
+            # 全有或全无：任一分片写入失败或请求体中断，清理已写入的分片（与旧版本重合的位置不能删）
+            fresh = [i for i in range(len(target_disks)) if i not in overlap]
+            deleted = _delete_cross_ec_shards(filename, target_disks, fresh)
+            print(f"[CROSS_EC] 上传失败，已清理 {deleted} 个分片: {filename}")
             return jsonify({'error': f'上传失败: {str(e)}'}), 500
 
     else:
@@ -844,9 +1755,8 @@ def upload_ec_file():
         conn.close()
 
         try:
-            file.seek(0)
-            files = {'file': (file.filename, file.stream, file.content_type)}
-            response = requests.post(
+            files = {'file': (upload.filename, file_stream, upload.content_type)}
+            response = node_http.post(
                 f"http://{ip}:{port}/api/ec_upload",
                 files=files,
                 headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -868,58 +1778,39 @@ def export_all_cross_ec():
 
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT filename, size, k, m, shard_size, disks FROM cross_ec_files')
+    cursor.execute('SELECT id, filename, size, k, m, shard_size, stripe_size, checksums, codec FROM cross_ec_files')
     rows = cursor.fetchall()
+    placements = _load_cross_ec_placements(cursor)
     conn.close()
 
     if not rows:
         return jsonify({'error': '没有文件可导出'}), 400
 
     try:
-        zip_buffer = BytesIO()
+        zip_buffer = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
 
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
             for row in rows:
-                filename, original_size, k, m, shard_size, disks_json = row
-                disks = json.loads(disks_json)
+                file_id, filename, original_size, k, m, shard_size, stripe_size, checksums_json, codec = row
+                disks = placements.get(file_id, [])
 
                 try:
                     print(f"[CROSS_EC_EXPORT] 开始导出: {filename}")
 
-                    # 从各节点收集分片
-                    shards = [None] * (k + m)
-
-                    for i, disk_info in enumerate(disks[:k + m]):
-                        try:
-                            resp = requests.get(
-                                f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
-                                params={
-                                    'filename': filename,
-                                    'shard_index': i,
-                                    'disk': disk_info['disk']
-                                },
-                                headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                                timeout=10
-                            )
-
-                            if resp.status_code == 200:
-                                data = resp.json()
-                                shards[i] = bytes.fromhex(data['shard_data'])
-                                print(f"[CROSS_EC_EXPORT] 获取分片 {i} 成功")
-                        except Exception as e:
-                            print(f"[CROSS_EC_EXPORT] 获取分片失败 {filename} shard {i}: {e}")
-                            continue
-
-                    # 检查可用分片数
-                    available = sum(1 for s in shards if s is not None)
-                    print(f"[CROSS_EC_EXPORT] 可用分片: {available}/{k}")
-
-                    if available >= k:
-                        decoded = rs_decode(shards, k, m, shard_size, original_size)
-                        zf.writestr(filename, decoded)
-                        print(f"[CROSS_EC_EXPORT] 已导出: {filename}")
-                    else:
-                        print(f"[CROSS_EC_EXPORT] 跳过(分片不足 {available}/{k}): {filename}")
+                    # 逐条带收集分片并解码
+                    stripes = _iter_cross_ec_file(filename, original_size, k, m, stripe_size or shard_size, disks,
+                                                  checksums=_load_checksums(checksums_json), codec=codec)
+                    try:
+                        first = next(stripes)
+                    except ECError as e:
+                        print(f"[CROSS_EC_EXPORT] 跳过({e}): {filename}")
+                        continue
+
+                    with zf.open(filename, 'w', force_zip64=True) as entry:
+                        entry.write(first)
+                        for chunk in stripes:
+                            entry.write(chunk)
+                    print(f"[CROSS_EC_EXPORT] 已导出: {filename}")
 
                 except Exception as e:
                     print(f"[CROSS_EC_EXPORT] 导出失败 {filename}: {e}")
@@ -954,33 +1845,21 @@ def delete_cross_ec_file():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('SELECT disks, k, m FROM cross_ec_files WHERE filename = ?', (filename,))
+    cursor.execute('SELECT id, k, m FROM cross_ec_files WHERE filename = ?', (filename,))
     row = cursor.fetchone()
 
     if not row:
         conn.close()
         return jsonify({'error': '文件不存在'}), 404
 
-    disks_json, k, m = row
-    disks = json.loads(disks_json)
+    file_id, k, m = row
+    disks = _load_cross_ec_disks(cursor, file_id)
 
-    # 删除各节点上的分片
-    for i, disk_info in enumerate(disks[:k + m]):
-        try:
-            requests.delete(
-                f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
-                params={
-                    'filename': filename,
-                    'shard_index': i,
-                    'disk': disk_info['disk']
-                },
-                headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                timeout=10
-            )
-        except Exception as e:
-            print(f"[CROSS_EC] 删除分片失败 {filename} shard {i}: {e}")
+    # 并发删除各节点上的分片
+    _delete_cross_ec_shards(filename, disks[:k + m])
 
     # 从数据库删除记录
+    _delete_cross_ec_placement(cursor, filename)
     cursor.execute('DELETE FROM cross_ec_files WHERE filename = ?', (filename,))
     conn.commit()
     conn.close()
@@ -988,54 +1867,140 @@ def delete_cross_ec_file():
     return jsonify({'success': True, 'message': '文件已删除'})
 
 
+def _parse_download_ranges(original_size, etag, last_modified):
+    """
+    解析 Range / If-Range 请求头，返回按请求顺序排列的 [(start, end)]（end 不含）。
+    返回 None 表示忽略 Range、按完整文件响应；返回空列表表示没有可满足的范围（416）
+    """
+    byte_range = request.range
+    if byte_range is None or byte_range.units != 'bytes':
+        return None
+
+    # If-Range 与当前版本不一致时，客户端缓存的片段已失效，直接返回完整文件
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None
+    if if_range.date is not None and if_range.date != last_modified:
+        return None
+
+    ranges = []
+    for begin, end in byte_range.ranges:
+        if begin < 0:
+            start, stop = max(original_size + begin, 0), original_size
+        else:
+            start, stop = begin, original_size if end is None else min(end, original_size)
+        if start < stop:
+            ranges.append((start, stop))
+    return ranges
+
+
+def _primed(chunks, filename):
+    """先取出第一块数据（分片不足时在发送响应头前抛出 ECError），返回可直接交给 Response 的生成器"""
+    first = next(chunks, b'')
+
+    def generate():
+        yield first
+        try:
+            for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            print(f"[CROSS_EC] 下载中断 {filename}: {e}")
+            raise
+
+    return generate()
+
 
 @ec_bp.route('/api/ec_download', methods=['GET'])
 @login_required
 def download_cross_ec_file():
-    """下载跨节点EC文件"""
+    """下载跨节点EC文件，支持 Range（含多段）与 If-Range"""
     filename = request.args.get('name')
     if not filename:
         return jsonify({'error': '缺少文件名'}), 400
 
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT size, k, m, shard_size, disks FROM cross_ec_files WHERE filename = ?', (filename,))
+    cursor.execute('''
+        SELECT id, size, k, m, shard_size, stripe_size, sha256, created_at, checksums, codec
+        FROM cross_ec_files WHERE filename = ?
+    ''', (filename,))
     row = cursor.fetchone()
-    conn.close()
 
     if not row:
+        conn.close()
         return jsonify({'error': '文件不存在'}), 404
 
-    original_size, k, m, shard_size, disks_json = row
-    disks = json.loads(disks_json)
+    file_id, original_size, k, m, shard_size, stripe_size, sha256, created_at, checksums_json, codec = row
+    disks = _load_cross_ec_disks(cursor, file_id)
+    conn.close()
+    checksums = _load_checksums(checksums_json)
+    stripe_size = stripe_size or shard_size
+    content_type = mimetypes.guess_type(filename)[0] or BINARY_CONTENT_TYPE
 
-    # 收集分片
-    shards = [None] * (k + m)
-    for i, disk_info in enumerate(disks[:k + m]):
+    last_modified = None
+    if created_at:
         try:
-            resp = requests.get(
-                f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
-                params={'filename': filename, 'shard_index': i, 'disk': disk_info['disk']},
-                headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                timeout=10
-            )
-            if resp.status_code == 200:
-                shards[i] = bytes.fromhex(resp.json()['shard_data'])
-        except:
-            continue
+            last_modified = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
 
-    available = sum(1 for s in shards if s is not None)
-    if available < k:
-        return jsonify({'error': f'分片不足，需要{k}个，只有{available}个'}), 500
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}"
+    }
+    if sha256:
+        headers['ETag'] = f'"{sha256}"'
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
 
-    # 解码
-    decoded = rs_decode(shards, k, m, shard_size, original_size)
+    def read(start=0, end=None):
+        return _iter_cross_ec_file(filename, original_size, k, m, stripe_size, disks, start, end,
+                                   checksums=checksums, codec=codec)
 
-    return send_file(
-        BytesIO(decoded),
-        download_name=filename,
-        as_attachment=True
-    )
+    ranges = _parse_download_ranges(original_size, sha256, last_modified)
+    if ranges is not None and not ranges:
+        headers['Content-Range'] = f'bytes */{original_size}'
+        return Response(status=416, headers=headers)
+
+    try:
+        if ranges is None:
+            # 边收集边解码边发送，客户端在一个条带的延迟内即可收到数据
+            body = _primed(read(), filename)
+            headers['Content-Length'] = str(original_size)
+            return Response(body, status=200, content_type=content_type, headers=headers)
+
+        if len(ranges) == 1:
+            # 单段范围只读取与之重叠的条带，条带内只取覆盖范围的数据片
+            start, end = ranges[0]
+            body = _primed(read(start, end), filename)
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{original_size}'
+            headers['Content-Length'] = str(end - start)
+            return Response(body, status=206, content_type=content_type, headers=headers)
+
+        # 多段范围：multipart/byteranges，各段依次读取
+        boundary = uuid.uuid4().hex
+        part_headers = [
+            (f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+             f'Content-Range: bytes {start}-{end - 1}/{original_size}\r\n\r\n').encode()
+            for start, end in ranges
+        ]
+        closing = f'\r\n--{boundary}--\r\n'.encode()
+
+        first_range = _primed(read(*ranges[0]), filename)
+
+        def parts():
+            for i, (part_header, (start, end)) in enumerate(zip(part_headers, ranges)):
+                yield part_header
+                yield from (first_range if i == 0 else read(start, end))
+            yield closing
+
+        body = parts()
+        headers['Content-Length'] = str(sum(len(h) for h in part_headers)
+                                        + sum(end - start for start, end in ranges) + len(closing))
+        return Response(body, status=206,
+                        content_type=f'multipart/byteranges; boundary={boundary}', headers=headers)
+    except ECError as e:
+        return jsonify({'error': str(e)}), 500
 
 
 # ==================== 跨节点EC扩展功能 ====================
@@ -1117,64 +2082,250 @@ def add_disk_to_cross_ec():
 
     return jsonify({'success': True, 'message': '磁盘添加成功'})
 
-@ec_bp.route('/api/cross_ec_config/check_shards', methods=['GET'])
-@login_required
-def check_cross_ec_shards():
-    """检测丢失的分片"""
+# ==================== 跨节点EC分片巡检 ====================
+#
+# 节点 GET /api/ec_manifest 在一个流式响应中列出本节点的全部EC分片，每行一个 JSON（NDJSON）：
+#     {"filename": "...", "shard_index": 0, "disk": "D:", "size": 1048576}
+# 中心并发拉取各节点清单，在内存中与 cross_ec_files 索引比对，每个节点只需一次请求。
+# 旧节点没有该接口（404/405/501），回退为逐分片 check_only 请求，经分片IO线程池并发执行。
+# 节点不可达时其上分片的状态未知，保持上次巡检的结论，不可达超过 EC_REPAIR_OFFLINE_GRACE 才按丢失处理。
+
+class _ManifestUnsupported(Exception):
+    pass
+
+
+_node_unreachable_since = {}  # {"ip:port": 巡检首次发现不可达的时间（monotonic）}
+
+
+def _fetch_node_manifest(node_key):
+    """拉取节点分片清单 {(filename, shard_index, disk): size}，节点不支持清单接口时抛出 _ManifestUnsupported"""
+    with node_http.get(
+        f"http://{node_key}/api/ec_manifest",
+        headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+        timeout=(EC_MANIFEST_CONNECT_TIMEOUT, EC_MANIFEST_READ_TIMEOUT),
+        stream=True
+    ) as resp:
+        if resp.status_code in (404, 405, 501):
+            raise _ManifestUnsupported()
+        if resp.status_code != 200:
+            raise Exception(f"节点 {node_key} 返回 {resp.status_code}")
+        manifest = {}
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            manifest[(item['filename'], int(item['shard_index']), item['disk'])] = item.get('size')
+        return manifest
+
+
+def _check_cross_ec_shard(filename, shard_index, disk_info, timeout=5):
+    """旧节点：单个分片的存在性检查，节点不可达或出错（5xx）时返回 None"""
+    try:
+        resp = node_http.get(
+            f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
+            params={
+                'filename': filename,
+                'shard_index': shard_index,
+                'disk': disk_info['disk'],
+                'check_only': 'true'  # 只检查存在性，不返回数据
+            },
+            headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+            timeout=timeout
+        )
+    except Exception:
+        return None
+    if resp.status_code >= 500:
+        return None
+    return resp.status_code == 200
+
+
+def _scan_cross_ec_shards(scrub_budget=0):
+    """
+    巡检全部跨节点EC文件：按节点批量拉取分片清单，与分片表比对，清单中长度不足的分片同样视为丢失，
+    比对结果写回分片状态；不可达节点上的分片在宽限期内不判为丢失。
+    scrub_budget > 0 时在丢失状态提交后再做一轮校验巡检（见 _scrub_cross_ec_files）。
+    返回 (files, lost, corrupt, unreachable_nodes)，files 为 {file_id: (filename, size, k, m)}，
+    lost / corrupt 为 {file_id: [丢失 / 损坏的分片索引]}，corrupt 包含此前巡检标记且尚未修复的分片
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
     # 获取所有EC文件
-    cursor.execute('SELECT filename, size, k, m, shard_size, disks FROM cross_ec_files')
-    files = cursor.fetchall()
+    cursor.execute('SELECT id, filename, size, k, m FROM cross_ec_files')
+    files = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+    # 按节点归集待检查的分片 {"ip:port": [(分片行 id, file_id, 分片索引, 长度, 当前状态, disk_info)]}
+    cursor.execute('''
+        SELECT s.id, s.file_id, s.shard_index, s.size, s.state, d.node_id, d.ip, d.port, d.disk
+        FROM cross_ec_shards s JOIN cross_ec_disks d ON d.id = s.disk_id
+    ''')
+    expected = {}
+    for shard_id, file_id, i, size, state, node_id, ip, port, disk in cursor.fetchall():
+        disk_info = {'node_id': node_id, 'ip': ip, 'port': port, 'disk': disk}
+        expected.setdefault(f"{ip}:{port}", []).append((shard_id, file_id, i, size, state, disk_info))
+
+    manifests = {node_key: _shard_io_pool.submit(_fetch_node_manifest, node_key) for node_key in expected}
+
+    lost = {}  # {file_id: [丢失的分片索引]}
+    lost_ids = []
+    unknown = {}  # {"ip:port": [节点不可达、状态未知的分片]}
+    legacy_checks = {}
+    for node_key, shards in expected.items():
+        try:
+            manifest = manifests[node_key].result()
+        except _ManifestUnsupported:
+            legacy_checks[node_key] = [
+                (shard, _submit_node_io(shard[5], _check_cross_ec_shard, files[shard[1]][0], shard[2], shard[5]))
+                for shard in shards]
+            continue
+        except Exception as e:
+            print(f"[CROSS_EC] 获取节点 {node_key} 分片清单失败: {e}")
+            unknown[node_key] = shards
+            continue
+
+        for shard_id, file_id, i, size, state, disk_info in shards:
+            found = manifest.get((files[file_id][0], i, disk_info['disk']), -1)
+            if found == -1 or (found is not None and size is not None and found < size):
+                lost.setdefault(file_id, []).append(i)
+                lost_ids.append(shard_id)
+
+    for node_key, checks in legacy_checks.items():
+        for shard, future in checks:
+            found = future.result()
+            if found is None:
+                unknown.setdefault(node_key, []).append(shard)
+            elif not found:
+                lost.setdefault(shard[1], []).append(shard[2])
+                lost_ids.append(shard[0])
+
+    # 不可达节点上的分片：宽限期内沿用上次结论（之前已丢失的仍算丢失），超过宽限期按丢失修复
+    now = time.monotonic()
+    for node_key in expected:
+        if node_key not in unknown:
+            _node_unreachable_since.pop(node_key, None)
+    unknown_ids = set()
+    for node_key, shards in unknown.items():
+        offline_for = now - _node_unreachable_since.setdefault(node_key, now)
+        for shard_id, file_id, i, size, state, disk_info in shards:
+            if offline_for >= EC_REPAIR_OFFLINE_GRACE or state == 'lost':
+                lost.setdefault(file_id, []).append(i)
+                lost_ids.append(shard_id)
+            else:
+                unknown_ids.add(shard_id)
+    unreachable_nodes = list(unknown)
+
+    cursor.execute("UPDATE cross_ec_shards SET state = 'ok' WHERE state = 'lost'")
+    cursor.executemany("UPDATE cross_ec_shards SET state = 'lost' WHERE id = ?", [(i,) for i in lost_ids])
+    conn.commit()
+
+    if scrub_budget > 0:
+        # 校验巡检要读取大量数据，期间不持有写事务；结论最后在一个短事务里写回
+        corrupt_shards, scrubbed = _scrub_cross_ec_files(set(lost_ids) | unknown_ids, scrub_budget)
+        # 巡检期间被重新上传或迁移的分片（位置或条带校验和已变）不再标记
+        cursor.executemany('''
+            UPDATE cross_ec_shards SET state = 'corrupt'
+            WHERE id = ? AND disk_id = ?
+              AND file_id IN (SELECT id FROM cross_ec_files WHERE checksums = ?)
+        ''', corrupt_shards)
+        cursor.executemany('UPDATE cross_ec_files SET scrubbed_at = ? WHERE id = ?', scrubbed)
+        conn.commit()
+
+    # 损坏状态由校验巡检写入、重建成功后清除，这里汇总全部未修复的损坏分片
+    corrupt = {}
+    cursor.execute("SELECT file_id, shard_index FROM cross_ec_shards WHERE state = 'corrupt'")
+    for file_id, i in cursor.fetchall():
+        if file_id in files:
+            corrupt.setdefault(file_id, []).append(i)
     conn.close()
 
-    lost_shards = []
+    return files, lost, corrupt, unreachable_nodes
 
-    for row in files:
-        filename, original_size, k, m, shard_size, disks_json = row
-        disks = json.loads(disks_json)
 
-        lost_count = 0
-        lost_indices = []
+def _scrub_cross_ec_files(skip, budget):
+    """
+    校验巡检：按上次校验时间从旧到新逐个文件读出全部条带块，与记录的条带 CRC32 比对，
+    长度不足或校验不一致的分片视为损坏（读取失败的不算，存在性由清单比对负责）。
+    读取流量受 EC_SCRUB_BANDWIDTH 限速，累计读取超过 budget 字节后在当前文件结束时停止，
+    下次巡检从未校验的文件继续。skip 为已确认丢失的分片行 id。
+    使用独立连接且只读，读取期间不持有数据库锁；返回 (corrupt, scrubbed) 由调用方写回：
+    corrupt 为损坏分片 [(行 id, disk_id, 文件条带校验和)]，scrubbed 为已校验文件 [(校验时间, file_id)]
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, filename, size, k, m, stripe_size, shard_size, checksums FROM cross_ec_files
+        WHERE checksums IS NOT NULL
+        ORDER BY scrubbed_at IS NOT NULL, scrubbed_at, id
+    ''')
+    candidates = cursor.fetchall()
+    corrupt = []
+    scrubbed = []
+    spent = 0
+    now = time.strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        for file_id, filename, original_size, k, m, stripe_size, shard_size, checksums_json in candidates:
+            if spent >= budget:
+                break
+            checksums = _load_checksums(checksums_json)
+            cursor.execute('''
+                SELECT s.id, s.disk_id, s.shard_index, d.node_id, d.ip, d.port, d.disk
+                FROM cross_ec_shards s JOIN cross_ec_disks d ON d.id = s.disk_id
+                WHERE s.file_id = ? ORDER BY s.shard_index
+            ''', (file_id,))
+            shards = {i: (shard_id, disk_id, {'node_id': node_id, 'ip': ip, 'port': port, 'disk': disk})
+                      for shard_id, disk_id, i, node_id, ip, port, disk in cursor.fetchall()
+                      if shard_id not in skip}
+            bad = set()
+            for stripe in iter_stripes(original_size, k, stripe_size or shard_size):
+                stripe_checksums = _stripe_checksums(checksums, stripe)
+                if stripe_checksums is None:
+                    break
+                indices = [i for i in shards if i not in bad]
+                _scrub_bucket.consume(stripe.chunk_size * len(indices))
+                spent += stripe.chunk_size * len(indices)
+                futures = {i: _submit_node_io(shards[i][2], _fetch_cross_ec_shard, filename, i, shards[i][2],
+                                              stripe.shard_offset, stripe.chunk_size)
+                           for i in indices}
+                for i, future in futures.items():
+                    data = future.result()
+                    if data is not None and not _chunk_intact(data, i, stripe.chunk_size, stripe_checksums):
+                        print(f"[CROSS_EC] 校验巡检发现损坏分片 {filename} shard {i} 条带 {stripe.index}")
+                        bad.add(i)
+            corrupt.extend((shards[i][0], shards[i][1], checksums_json) for i in sorted(bad))
+            scrubbed.append((now, file_id))
+    finally:
+        conn.close()
+    return corrupt, scrubbed
 
-        # 检查每个分片是否可访问
-        for i, disk_info in enumerate(disks[:k + m]):
-            try:
-                resp = requests.get(
-                    f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
-                    params={
-                        'filename': filename,
-                        'shard_index': i,
-                        'disk': disk_info['disk'],
-                        'check_only': 'true'  # 只检查存在性，不返回数据
-                    },
-                    headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                    timeout=5
-                )
-                if resp.status_code != 200:
-                    lost_count += 1
-                    lost_indices.append(i)
-            except Exception as e:
-                lost_count += 1
-                lost_indices.append(i)
 
-        if lost_count > 0:
-            lost_shards.append({
-                'filename': filename,
-                'size': original_size,
-                'k': k,
-                'm': m,
-                'lost_count': lost_count,
-                'lost_indices': lost_indices,
-                'recoverable': lost_count <= m  # 丢失数量不超过m则可恢复
-            })
+@ec_bp.route('/api/cross_ec_config/check_shards', methods=['GET'])
+@login_required
+def check_cross_ec_shards():
+    """检测丢失的分片"""
+    files, lost, corrupt, unreachable_nodes = _scan_cross_ec_shards()
+
+    lost_shards = []
+    for n in sorted(set(lost) | set(corrupt)):
+        filename, original_size, k, m = files[n][:4]
+        lost_indices = sorted(lost.get(n, []))
+        corrupt_indices = sorted(set(corrupt.get(n, [])) - set(lost_indices))
+        lost_shards.append({
+            'filename': filename,
+            'size': original_size,
+            'k': k,
+            'm': m,
+            'lost_count': len(lost_indices),
+            'lost_indices': lost_indices,
+            'corrupt_indices': corrupt_indices,
+            'recoverable': len(lost_indices) + len(corrupt_indices) <= m  # 丢失与损坏合计不超过m则可恢复
+        })
 
     return jsonify({
         'success': True,
         'lost_shards': lost_shards,
         'total_files': len(files),
-        'affected_files': len(lost_shards)
+        'affected_files': len(lost_shards),
+        'unreachable_nodes': unreachable_nodes
     })
 
 
@@ -1190,66 +2341,81 @@ def rebuild_cross_ec_shard():
     if not filename:
         return jsonify({'error': '缺少文件名'}), 400
 
+    result, status = _rebuild_cross_ec_file(filename, target_disk)
+    return jsonify(result), status
+
+
+def _rebuild_cross_ec_file(filename, target_disk=None, throttle=None):
+    """
+    重建单个文件丢失/损坏的分片，返回 (结果, HTTP 状态码)。
+    第一个条带读取全部 k+m 块并按条带校验和核对，读不到或校验失败的分片整片重建到目标磁盘
+    （偏移 0 的写入会重新创建分片文件，不能只改写第一个块）；之后的条带只读 k 个块（外加巡检标记为损坏的分片），
+    读取失败或校验失败时再补读，其中坏块只重建该块，在原位置按条带偏移改写。任一条带无法修复或写入失败时结果为失败。
+    throttle(nbytes) 在每个条带读写前调用，后台修复用它把修复流量限制在IO预算内
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
     # 获取文件信息
-    cursor.execute('SELECT size, k, m, shard_size, disks FROM cross_ec_files WHERE filename = ?', (filename,))
+    cursor.execute('''
+        SELECT id, size, k, m, shard_size, stripe_size, checksums, codec FROM cross_ec_files WHERE filename = ?
+    ''', (filename,))
     row = cursor.fetchone()
 
     if not row:
         conn.close()
-        return jsonify({'error': '文件不存在'}), 404
-
-    original_size, k, m, shard_size, disks_json = row
-    disks = json.loads(disks_json)
-
-    # 收集现有分片，记录丢失的分片索引
-    shards = [None] * (k + m)
-    lost_indices = []
-
-    for i, disk_info in enumerate(disks[:k + m]):
-        try:
-            resp = requests.get(
-                f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
-                params={
-                    'filename': filename,
-                    'shard_index': i,
-                    'disk': disk_info['disk']
-                },
-                headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                timeout=10
-            )
-            if resp.status_code == 200:
-                shards[i] = bytes.fromhex(resp.json()['shard_data'])
-            else:
-                lost_indices.append(i)
-        except:
-            lost_indices.append(i)
+        return {'error': '文件不存在'}, 404
+
+    file_id, original_size, k, m, shard_size, stripe_size, checksums_json, codec = row
+    stripe_size = stripe_size or shard_size
+    disks = _load_cross_ec_disks(cursor, file_id)
+    checksums = _load_checksums(checksums_json)
+    stripes = list(iter_stripes(original_size, k, stripe_size))
+    # 校验巡检标记为损坏的分片，不知道坏在哪些条带，每个条带都读取核对
+    cursor.execute("SELECT shard_index FROM cross_ec_shards WHERE file_id = ? AND state = 'corrupt'", (file_id,))
+    suspect = {row[0] for row in cursor.fetchall()}
+
+    def gather(stripe, skip=(), verify=None):
+        """
+        读取条带的块（skip 中的分片不读），返回 (块列表, 读取失败的分片, 校验失败的分片)，未读的块和坏块为 None。
+        verify 为 None 时读取全部存活块；否则先读 verify 中的分片，再按索引顺序补足 k 块，
+        有块读取失败或校验失败时才补读下一个存活分片，直到凑齐 k 个完好块或无分片可读
+        """
+        stripe_checksums = _stripe_checksums(checksums, stripe)
+        alive = [i for i in range(k + m) if i not in skip]
+        if verify is None:
+            batch, rest = alive, []
+        else:
+            rest = [i for i in alive if i not in verify]
+            batch = [i for i in alive if i in verify]
+            batch, rest = batch + rest[:max(k - len(batch), 0)], rest[max(k - len(batch), 0):]
+        shards = [None] * (k + m)
+        unreadable, corrupt = set(), set()
+        while batch:
+            futures = [(i, _submit_node_io(disks[i], _timed_fetch_cross_ec_shard, filename, i, disks[i],
+                                           stripe.shard_offset, stripe.chunk_size))
+                       for i in batch]
+            for i, future in futures:
+                chunk = future.result()
+                if chunk is None:
+                    unreadable.add(i)
+                elif not _chunk_intact(chunk, i, stripe.chunk_size, stripe_checksums):
+                    print(f"[CROSS_EC] 分片 {i} 在条带 {stripe.index} 校验失败: {filename}")
+                    corrupt.add(i)
+                else:
+                    shards[i] = chunk
+            need = max(k - sum(chunk is not None for chunk in shards), 0)
+            batch, rest = rest[:need], rest[need:]
+        return shards, unreadable, corrupt
 
-    available = sum(1 for s in shards if s is not None)
+    # 第一个条带读不到（节点离线或分片不存在）或校验失败的分片整片重建
+    first = gather(stripes[0])
+    lost_indices = sorted(first[1] | first[2])
+    available = sum(1 for chunk in first[0] if chunk is not None)
 
     if available < k:
         conn.close()
-        return jsonify({'error': f'分片不足，需要至少{k}个，只有{available}个，无法重建'}), 400
-
-    if len(lost_indices) == 0:
-        conn.close()
-        return jsonify({'success': True, 'message': '所有分片完整，无需重建'})
-
-    # 解码还原原始数据
-    try:
-        decoded = rs_decode(shards, k, m, shard_size, original_size)
-    except Exception as e:
-        conn.close()
-        return jsonify({'error': f'解码失败: {str(e)}'}), 500
-
-    # 重新编码
-    try:
-        new_shards = rs_encode(decoded, k, m)
-    except Exception as e:
-        conn.close()
-        return jsonify({'error': f'编码失败: {str(e)}'}), 500
+        return {'error': f'分片不足，需要至少{k}个，只有{available}个，无法重建'}, 400
 
     # 确定目标磁盘
     if target_disk:
@@ -1257,139 +2423,509 @@ def rebuild_cross_ec_shard():
         parts = target_disk.split(':', 1)
         if len(parts) != 2:
             conn.close()
-            return jsonify({'error': '目标磁盘格式错误，应为 node_id:disk_path'}), 400
+            return {'error': '目标磁盘格式错误，应为 node_id:disk_path'}, 400
         target_node_id, target_disk_path = parts
 
         cursor.execute('SELECT ip, port FROM nodes WHERE node_id = ?', (target_node_id,))
         target_node = cursor.fetchone()
         if not target_node:
             conn.close()
-            return jsonify({'error': '目标节点不存在'}), 404
+            return {'error': '目标节点不存在'}, 404
 
         target_ip, target_port = target_node
+        if len(stripes) > 1 and not _supports_striped_writes({'ip': target_ip, 'port': target_port}):
+            conn.close()
+            return {'error': '目标节点不支持按偏移写入分片，无法存放多条带文件'}, 400
     else:
         target_node_id = None
         target_ip = None
         target_port = None
         target_disk_path = None
 
-    # 重建丢失的分片
-    rebuilt_count = 0
     errors = []
+    targets = {}  # {shard_index: 新的磁盘信息}，整片丢失的分片
+    relocate = []  # 原节点离线（或多条带文件的原节点不支持按偏移写入）、需要另选磁盘的分片
 
     for idx in lost_indices:
-        shard_data = new_shards[idx]
-
         # 确定存储位置
         if target_node_id and target_disk_path:
             # 使用指定的目标磁盘
-            store_ip = target_ip
-            store_port = target_port
-            store_disk = target_disk_path
-            store_node_id = target_node_id
+            targets[idx] = {
+                'node_id': target_node_id,
+                'ip': target_ip,
+                'port': target_port,
+                'disk': target_disk_path
+            }
+            continue
+
+        # 尝试使用原位置，如果原节点在线的话
+        original_disk_info = disks[idx]
+        cursor.execute('SELECT ip, port, status FROM nodes WHERE node_id = ?', (original_disk_info['node_id'],))
+        node_check = cursor.fetchone()
+        if (node_check and node_check[2] == 'online' and
+                (len(stripes) == 1 or _supports_striped_writes({'ip': node_check[0], 'port': node_check[1]}))):
+            targets[idx] = {
+                'node_id': original_disk_info['node_id'],
+                'ip': node_check[0],
+                'port': node_check[1],
+                'disk': original_disk_info['disk']
+            }
         else:
-            # 尝试使用原位置，如果原节点在线的话
-            original_disk_info = disks[idx]
+            relocate.append(idx)
+
+    if relocate:
+        # 原节点离线：按放置规则从EC配置的磁盘中另选，计入该文件其余分片所在的节点，保持故障域约束
+        cursor.execute('''
+            SELECT id, nodes FROM cross_ec_config 
+            WHERE status = 'active' ORDER BY created_at DESC LIMIT 1
+        ''')
+        config_row = cursor.fetchone()
+        if not config_row:
+            errors.extend(f'分片{idx}: 无法找到可用节点' for idx in relocate)
+        else:
+            placed = [targets.get(i, d) for i, d in enumerate(disks[:k + m]) if i not in relocate]
+            offline_nodes = {disks[i]['node_id'] for i in relocate}
+            candidates = [d for d in _cross_ec_disks(cursor, json.loads(config_row[1]))
+                          if d['node_id'] not in offline_nodes and (len(stripes) == 1 or _supports_striped_writes(d))]
             try:
-                # 检查原节点是否在线
-                cursor.execute('SELECT ip, port, status FROM nodes WHERE node_id = ?', (original_disk_info['node_id'],))
-                node_check = cursor.fetchone()
-                if node_check and node_check[2] == 'online':
-                    store_ip = node_check[0]
-                    store_port = node_check[1]
-                    store_disk = original_disk_info['disk']
-                    store_node_id = original_disk_info['node_id']
-                else:
-                    # 原节点离线，从EC配置中找一个在线的节点
-                    cursor.execute('''
-                        SELECT id, nodes FROM cross_ec_config 
-                        WHERE status = 'active' ORDER BY created_at DESC LIMIT 1
-                    ''')
-                    config_row = cursor.fetchone()
-                    if not config_row:
-                        errors.append(f'分片{idx}: 无法找到可用节点')
-                        continue
+                for idx, store_info in zip(relocate, _place_shards(candidates, len(relocate), k + m, placed)):
+                    targets[idx] = store_info
+            except ECError as e:
+                errors.extend(f'分片{idx}: {str(e)}' for idx in relocate)
+
+    # 定向修复：逐条带读取 k 个存活块，只计算该条带坏块所在的行，算出后即写到目标位置（整片丢失的写到新位置，
+    # 其余坏块在原位置按偏移改写）。下一条带的读取在后台预取，上一条带的写入与本条带的计算重叠，内存约为两个条带
+    lost = set(lost_indices)
+    unrepaired = set(lost) - set(targets)  # 至少有一个块未能修复的分片
+    in_place = set()  # 有块在原位置改写过的分片
+    repaired_chunks = 0
+    meta = {
+        'k': k,
+        'm': m,
+        'codec': codec or DEFAULT_CODEC,
+        'shard_size': shard_size,
+        'original_size': original_size,
+        'stripe_size': stripe_size,
+        'stripe_count': len(stripes),
+        'rebuilt': True,
+        'rebuilt_at': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
 
-                    config_nodes = json.loads(config_row[1])
-                    found_target = False
-
-                    for cn in config_nodes:
-                        cn_id = cn.get('node_id')
-                        cursor.execute('SELECT ip, port, status FROM nodes WHERE node_id = ?', (cn_id,))
-                        cn_check = cursor.fetchone()
-                        if cn_check and cn_check[2] == 'online':
-                            store_ip = cn_check[0]
-                            store_port = cn_check[1]
-                            store_disk = cn.get('disks', ['/'])[0]
-                            store_node_id = cn_id
-                            found_target = True
-                            break
-
-                    if not found_target:
-                        errors.append(f'分片{idx}: 没有可用的在线节点')
-                        continue
-            except Exception as e:
-                errors.append(f'分片{idx}: 查找目标节点失败 - {str(e)}')
+    def read(stripe):
+        if stripe.index == 0:
+            return first
+        return gather(stripe, lost, suspect - lost)
+
+    def wait_stores(pending):
+        nonlocal repaired_chunks
+        for idx, stripe_index, future in pending:
+            error = future.exception()
+            if error is None:
+                repaired_chunks += 1
                 continue
+            errors.append(f'分片{idx}: 条带{stripe_index}存储异常 - {str(error)}')
+            unrepaired.add(idx)
+            targets.pop(idx, None)
+
+    pool = get_codec_pool()
+    next_shards = _stripe_prefetch_pool.submit(read, stripes[0])
+    pending_stores = []
+    for stripe in stripes:
+        shards, unreadable, corrupt = next_shards.result()
+        next_shards = None
+        if stripe.index + 1 < len(stripes):
+            next_shards = _stripe_prefetch_pool.submit(read, stripes[stripe.index + 1])
+
+        bad = (unreadable | corrupt) - lost
+        wanted = sorted(set(targets) | bad)
+        if not wanted:
+            continue
+        intact = sum(chunk is not None for chunk in shards)
+        if intact < k:
+            errors.append(f'条带{stripe.index}: 可用块不足{k}个，无法修复')
+            unrepaired.update(wanted)
+            continue
 
-        # 存储重建的分片
+        if throttle is not None:
+            throttle(stripe.chunk_size * (intact + len(unreadable | corrupt) + len(wanted)))
         try:
-            resp = requests.post(
-                f"http://{store_ip}:{store_port}/api/ec_shard",
-                json={
-                    'filename': filename,
-                    'shard_index': idx,
-                    'shard_data': shard_data.hex(),
-                    'disk': store_disk,
-                    'meta': {
-                        'k': k,
-                        'm': m,
-                        'shard_size': len(shard_data),
-                        'original_size': original_size,
-                        'rebuilt': True,
-                        'rebuilt_at': time.strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                },
-                headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                timeout=60
-            )
-
-            if resp.status_code == 200:
-                # 更新disks信息
-                disks[idx] = {
-                    'node_id': store_node_id,
-                    'ip': store_ip,
-                    'port': store_port,
-                    'disk': store_disk
-                }
-                rebuilt_count += 1
-            else:
-                errors.append(f'分片{idx}: 存储失败 - {resp.text}')
+            rebuilt = pool.reconstruct(shards, k, m, stripe.chunk_size, wanted, codec)
         except Exception as e:
-            errors.append(f'分片{idx}: 存储异常 - {str(e)}')
+            errors.append(f'条带{stripe.index}: 重建失败 - {str(e)}')
+            unrepaired.update(wanted)
+            continue
 
-    # 更新数据库中的磁盘信息
+        # 同一分片的块按条带顺序写入：先等上一条带写完，再提交本条带
+        wait_stores(pending_stores)
+        stripe_meta = dict(meta, stripe_index=stripe.index)
+        pending_stores = []
+        for idx, chunk in zip(wanted, rebuilt):
+            if idx in lost:
+                store_info = targets.get(idx)
+                if store_info is None:
+                    # 没有目标磁盘，或在前面的条带已写入失败
+                    continue
+            else:
+                store_info = disks[idx]
+                in_place.add(idx)
+            pending_stores.append((idx, stripe.index, _submit_node_io(
+                store_info, _store_cross_ec_shard, filename, idx, store_info, chunk, stripe_meta,
+                stripe.shard_offset)))
+    wait_stores(pending_stores)
+    if next_shards is not None:
+        next_shards.cancel()
+
+    # 整片丢失的分片全部条带都写成功才更新磁盘信息；原位置改写的分片位置不变，只恢复状态
+    for idx, store_info in targets.items():
+        disks[idx] = store_info
+    rebuilt_count = len(targets)
+    repaired_in_place = sorted(in_place - unrepaired)
+
+    # 更新数据库中的磁盘信息（重建出的分片与原分片逐字节相同，整片校验和不变）
     if rebuilt_count > 0:
+        _save_cross_ec_placement(cursor, file_id, disks, shard_length(original_size, k, stripe_size),
+                                 indices=sorted(targets))
         cursor.execute('''
             UPDATE cross_ec_files SET disks = ? WHERE filename = ?
         ''', (json.dumps(disks), filename))
-        conn.commit()
-
+    if repaired_in_place:
+        cursor.executemany('''
+            UPDATE cross_ec_shards SET state = 'ok' WHERE file_id = ? AND shard_index = ?
+        ''', [(file_id, idx) for idx in repaired_in_place])
+    if not errors:
+        # 全部条带已逐块核对通过，巡检标记的损坏状态一并清除
+        cursor.execute("UPDATE cross_ec_shards SET state = 'ok' WHERE file_id = ? AND state = 'corrupt'", (file_id,))
+    conn.commit()
     conn.close()
 
     if errors:
-        return jsonify({
-            'success': rebuilt_count > 0,
-            'message': f'重建完成，成功{rebuilt_count}个，失败{len(errors)}个',
+        return {
+            'success': False,
+            'message': f'重建未完成，成功{rebuilt_count + len(repaired_in_place)}个分片，失败{len(unrepaired)}个',
             'rebuilt_count': rebuilt_count,
+            'repaired_in_place': repaired_in_place,
+            'repaired_chunks': repaired_chunks,
             'errors': errors
-        })
+        }, 200
 
-    return jsonify({
+    if rebuilt_count == 0 and not repaired_in_place:
+        return {'success': True, 'message': '所有分片完整，无需重建', 'rebuilt_count': 0}, 200
+
+    return {
         'success': True,
-        'message': f'分片重建成功，共重建{rebuilt_count}个分片',
-        'rebuilt_count': rebuilt_count
-    })
+        'message': f'分片重建成功，共重建{rebuilt_count}个分片，原位修复{len(repaired_in_place)}个分片',
+        'rebuilt_count': rebuilt_count,
+        'repaired_in_place': repaired_in_place,
+        'repaired_chunks': repaired_chunks
+    }, 200
+
+
+# ==================== 跨节点EC后台修复 ====================
+#
+# 巡检线程定期调用 _scan_cross_ec_shards，把降级文件写入 ec_repair_queue（持久化，重启后继续）；
+# 修复线程按 spare 从小到大领取任务，调用 _rebuild_cross_ec_file 定向修复，
+# 所有修复线程共享一个令牌桶，读写流量合计不超过 EC_REPAIR_BANDWIDTH。
+
+class _TokenBucket:
+    """令牌桶：rate 字节/秒，桶容量为 1 秒的额度，额度不足时调用方按欠额睡眠；rate <= 0 不限速"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= nbytes
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _RepairScheduler:
+    def __init__(self, workers, scan_interval, bandwidth, max_attempts):
+        self.workers = workers
+        self.scan_interval = scan_interval
+        self.max_attempts = max_attempts
+        self.bucket = _TokenBucket(bandwidth)
+        self.last_scan = None
+        self._threads = []
+        self._scan_requested = threading.Event()
+        self._has_work = threading.Event()
+        self._claim_lock = threading.Lock()
+        self._running = {}        # {filename: 已传输字节数}
+        self._rate = None         # 单个修复任务的传输速率（字节/秒，指数滑动平均）
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return bool(self._threads)
+
+    def start(self):
+        if self._threads:
+            return
+        # 上次进程退出时未完成的任务重新排队
+        conn = get_db_connection()
+        conn.execute("UPDATE ec_repair_queue SET status = 'pending' WHERE status = 'running'")
+        conn.commit()
+        conn.close()
+
+        self._threads.append(threading.Thread(target=self._scan_loop, name='ec-repair-scan', daemon=True))
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._work_loop, name=f'ec-repair-{i}', daemon=True))
+        for t in self._threads:
+            t.start()
+        print(f"[EC_REPAIR] 后台修复已启动，{self.workers} 个修复线程")
+
+    def request_scan(self):
+        self._scan_requested.set()
+
+    def _scan_loop(self):
+        while True:
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"[EC_REPAIR] 巡检失败: {e}")
+            self._scan_requested.wait(timeout=self.scan_interval)
+            self._scan_requested.clear()
+
+    def scan(self, scrub_budget=EC_SCRUB_BYTES_PER_SCAN):
+        """巡检并更新修复队列，返回新入队/重新入队的文件数；scrub_budget 为本次校验巡检的读取上限"""
+        files, lost, corrupt, _ = _scan_cross_ec_shards(scrub_budget)
+        degraded = {}
+        for n in set(lost) | set(corrupt):
+            filename, original_size, k, m = files[n][:4]
+            lost_indices = sorted(lost.get(n, []))
+            corrupt_indices = sorted(set(corrupt.get(n, [])) - set(lost_indices))
+            chunk = (original_size + k - 1) // k
+            # 重建逐条带读取 k 个完好块（损坏的分片也要读出核对），再写回丢失/损坏的分片
+            degraded[filename] = (n, m - len(lost_indices) - len(corrupt_indices), lost_indices, corrupt_indices,
+                                  chunk * (k + len(lost_indices) + 2 * len(corrupt_indices)))
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # 各文件当前的分片位置，和丢失/损坏集合一起判断降级情况是否变化
+        cursor.execute('SELECT file_id, shard_index, disk_id FROM cross_ec_shards ORDER BY file_id, shard_index')
+        placements = {}
+        for file_id, i, disk_id in cursor.fetchall():
+            placements.setdefault(file_id, []).append([i, disk_id])
+        cursor.execute('SELECT filename, status, lost_indices, corrupt_indices, placement FROM ec_repair_queue')
+        queued = {row[0]: row[1:] for row in cursor.fetchall()}
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        enqueued = 0
+
+        for filename, (file_id, spare, lost_indices, corrupt_indices, repair_bytes) in degraded.items():
+            status, old_lost, old_corrupt, old_placement = queued.get(filename, (None, None, None, None))
+            if status == 'running':
+                continue
+            lost_json, corrupt_json = json.dumps(lost_indices), json.dumps(corrupt_indices)
+            placement = json.dumps(placements.get(file_id, []))
+            if (status in ('pending', 'failed') and (old_lost, old_corrupt or '[]', old_placement)
+                    == (lost_json, corrupt_json, placement)):
+                # 降级情况没变：保留重试次数，已放弃的任务不再重新排队
+                cursor.execute('UPDATE ec_repair_queue SET spare = ?, repair_bytes = ? WHERE filename = ?',
+                               (spare, repair_bytes, filename))
+                continue
+            if spare < 0:
+                new_status = 'failed'
+                error = f'丢失{len(lost_indices)}个、损坏{len(corrupt_indices)}个分片，超过可恢复数量'
+            else:
+                new_status, error = 'pending', None
+                enqueued += status != 'pending'
+            if status is None:
+                cursor.execute('''
+                    INSERT INTO ec_repair_queue (filename, spare, lost_indices, corrupt_indices, placement,
+                                                 repair_bytes, status, last_error)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (filename, spare, lost_json, corrupt_json, placement, repair_bytes, new_status, error))
+            else:
+                # 丢失/损坏集合或分片位置变了，按新的降级情况重新计数
+                cursor.execute('''
+                    UPDATE ec_repair_queue SET spare = ?, lost_indices = ?, corrupt_indices = ?, placement = ?,
+                        repair_bytes = ?, status = ?, last_error = ?, attempts = 0,
+                        enqueued_at = CASE WHEN status = 'pending' THEN enqueued_at ELSE ? END
+                    WHERE filename = ?
+                ''', (spare, lost_json, corrupt_json, placement, repair_bytes, new_status, error, now, filename))
+
+        # 已不再降级（已修复或已删除）的排队任务直接结束
+        for filename, (status, *_) in queued.items():
+            if filename not in degraded and status in ('pending', 'failed'):
+                cursor.execute('''
+                    UPDATE ec_repair_queue SET status = 'done', last_error = NULL, finished_at = ? WHERE filename = ?
+                ''', (now, filename))
+
+        conn.commit()
+        conn.close()
+        self.last_scan = now
+        if enqueued:
+            print(f"[EC_REPAIR] 巡检发现 {len(degraded)} 个降级文件，{enqueued} 个加入修复队列")
+        self._has_work.set()
+        return enqueued
+
+    def _claim(self):
+        """领取 spare 最小的待修复任务"""
+        with self._claim_lock:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT filename, repair_bytes FROM ec_repair_queue WHERE status = 'pending'
+                ORDER BY spare ASC, enqueued_at ASC LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            if row:
+                cursor.execute('''
+                    UPDATE ec_repair_queue SET status = 'running', attempts = attempts + 1, started_at = ?
+                    WHERE filename = ?
+                ''', (time.strftime('%Y-%m-%d %H:%M:%S'), row[0]))
+                conn.commit()
+            conn.close()
+        return tuple(row) if row else None
+
+    def _work_loop(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"[EC_REPAIR] 领取修复任务失败: {e}")
+                job = None
+            if job is None:
+                self._has_work.wait(timeout=5)
+                self._has_work.clear()
+                continue
+            self._repair(*job)
+
+    def _repair(self, filename, repair_bytes):
+        with self._lock:
+            self._running[filename] = 0
+
+        def throttle(nbytes):
+            self.bucket.consume(nbytes)
+            with self._lock:
+                self._running[filename] += nbytes
+
+        started = time.monotonic()
+        try:
+            result, status = _rebuild_cross_ec_file(filename, throttle=throttle)
+            ok = status == 200 and result.get('success') and not result.get('errors')
+            error = None if ok else (result.get('error') or '; '.join(result.get('errors', [])))
+        except Exception as e:
+            ok, error = False, str(e)
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            moved = self._running.pop(filename, 0)
+            if ok and moved and elapsed > 0:
+                rate = moved / elapsed
+                self._rate = rate if self._rate is None else 0.7 * self._rate + 0.3 * rate
+
+        conn = get_db_connection()
+        if ok:
+            conn.execute('''
+                UPDATE ec_repair_queue SET status = 'done', last_error = NULL, finished_at = ? WHERE filename = ?
+            ''', (time.strftime('%Y-%m-%d %H:%M:%S'), filename))
+        else:
+            print(f"[EC_REPAIR] 修复失败 {filename}: {error}")
+            conn.execute('''
+                UPDATE ec_repair_queue SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    last_error = ?, finished_at = ?
+                WHERE filename = ?
+            ''', (self.max_attempts, error, time.strftime('%Y-%m-%d %H:%M:%S'), filename))
+        conn.commit()
+        conn.close()
+
+    def status(self):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*), COALESCE(SUM(repair_bytes), 0) FROM ec_repair_queue GROUP BY status')
+        counts = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        cursor.execute('''
+            SELECT filename, spare, lost_indices, repair_bytes, status, attempts, last_error, enqueued_at,
+                corrupt_indices
+            FROM ec_repair_queue WHERE status IN ('pending', 'running', 'failed')
+            ORDER BY status = 'failed', spare ASC, enqueued_at ASC LIMIT 100
+        ''')
+        queue = [{
+            'filename': row[0],
+            'spare': row[1],
+            'lost_indices': json.loads(row[2]) if row[2] else [],
+            'corrupt_indices': json.loads(row[8]) if row[8] else [],
+            'repair_bytes': row[3],
+            'status': row[4],
+            'attempts': row[5],
+            'last_error': row[6],
+            'enqueued_at': row[7]
+        } for row in cursor.fetchall()]
+        cursor.execute("SELECT filename, repair_bytes FROM ec_repair_queue WHERE status = 'running'")
+        running_bytes = dict(cursor.fetchall())
+        conn.close()
+
+        with self._lock:
+            progress = dict(self._running)
+            rate = self._rate
+        for item in queue:
+            if item['filename'] in progress:
+                item['transferred'] = progress[item['filename']]
+
+        remaining = counts.get('pending', (0, 0))[1] + sum(
+            max(total - progress.get(filename, 0), 0) for filename, total in running_bytes.items())
+        # 总速率：单任务速率 × 并发数，不超过流量预算；还没有完成过任务时按预算估算
+        throughput = rate * self.workers if rate else None
+        if self.bucket.rate > 0:
+            throughput = min(throughput, self.bucket.rate) if throughput else self.bucket.rate
+
+        return {
+            'enabled': EC_REPAIR_ENABLED,
+            'started': self.started,
+            'workers': self.workers,
+            'bandwidth': self.bucket.rate,
+            'last_scan': self.last_scan,
+            'queue_depth': counts.get('pending', (0, 0))[0],
+            'running': counts.get('running', (0, 0))[0],
+            'failed': counts.get('failed', (0, 0))[0],
+            'done': counts.get('done', (0, 0))[0],
+            'remaining_bytes': remaining,
+            'throughput': throughput,
+            'eta_seconds': round(remaining / throughput) if throughput else None,
+            'queue': queue
+        }
+
+
+# 校验巡检的读取限速，与修复流量分开计
+_scrub_bucket = _TokenBucket(EC_SCRUB_BANDWIDTH)
+
+_repair_scheduler = _RepairScheduler(EC_REPAIR_WORKERS, EC_REPAIR_SCAN_INTERVAL, EC_REPAIR_BANDWIDTH,
+                                     EC_REPAIR_MAX_ATTEMPTS)
+
+
+def start_repair_scheduler():
+    """启动后台修复（EC_REPAIR_ENABLED 为 False 时不启动，仍可通过接口查看队列）"""
+    if EC_REPAIR_ENABLED:
+        _repair_scheduler.start()
+
+
+@ec_bp.route('/api/ec_repair/status', methods=['GET'])
+@login_required
+def get_ec_repair_status():
+    """后台修复状态：队列深度、正在修复的文件、剩余流量与预计完成时间"""
+    return jsonify({'success': True, **_repair_scheduler.status()})
+
+
+@ec_bp.route('/api/ec_repair/scan', methods=['POST'])
+@login_required
+@admin_required
+def trigger_ec_repair_scan():
+    """立即巡检一次；后台修复未启动时在请求内同步巡检，只更新队列，不做耗时的校验巡检"""
+    if _repair_scheduler.started:
+        _repair_scheduler.request_scan()
+        return jsonify({'success': True, 'message': '已触发巡检'})
+    enqueued = _repair_scheduler.scan(scrub_budget=0)
+    return jsonify({'success': True, 'message': f'巡检完成，{enqueued}个文件加入修复队列'})
 
 
 @ec_bp.route('/api/cross_ec_export', methods=['POST'])
@@ -1409,15 +2945,18 @@ def export_cross_ec_to_node():
     cursor = conn.cursor()
 
     # 获取文件信息
-    cursor.execute('SELECT size, k, m, shard_size, disks FROM cross_ec_files WHERE filename = ?', (filename,))
+    cursor.execute('''
+        SELECT id, size, k, m, shard_size, stripe_size, checksums, codec FROM cross_ec_files WHERE filename = ?
+    ''', (filename,))
     row = cursor.fetchone()
 
     if not row:
         conn.close()
         return jsonify({'error': '文件不存在'}), 404
 
-    original_size, k, m, shard_size, disks_json = row
-    disks = json.loads(disks_json)
+    file_id, original_size, k, m, shard_size, stripe_size, checksums_json, codec = row
+    disks = _load_cross_ec_disks(cursor, file_id)
+    checksums = _load_checksums(checksums_json)
 
     # 获取目标节点信息
     cursor.execute('SELECT ip, port FROM nodes WHERE node_id = ?', (target_node,))
@@ -1430,32 +2969,14 @@ def export_cross_ec_to_node():
     target_ip, target_port = node_row
     conn.close()
 
-    # 收集分片
-    shards = [None] * (k + m)
-    for i, disk_info in enumerate(disks[:k + m]):
-        try:
-            resp = requests.get(
-                f"http://{disk_info['ip']}:{disk_info['port']}/api/ec_shard",
-                params={
-                    'filename': filename,
-                    'shard_index': i,
-                    'disk': disk_info['disk']
-                },
-                headers={'X-NAS-Secret': NAS_SHARED_SECRET},
-                timeout=10
-            )
-            if resp.status_code == 200:
-                shards[i] = bytes.fromhex(resp.json()['shard_data'])
-        except:
-            continue
-
-    available = sum(1 for s in shards if s is not None)
-    if available < k:
-        return jsonify({'error': f'分片不足，需要{k}个，只有{available}个'}), 500
-
-    # 解码还原
+    # 逐条带收集分片并解码还原，先解出第一个条带，分片不足时在发送前就报错
+    file_stripe_size = stripe_size or shard_size
+    stripes = _iter_cross_ec_file(filename, original_size, k, m, file_stripe_size, disks,
+                                  checksums=checksums, codec=codec)
     try:
-        decoded = rs_decode(shards, k, m, shard_size, original_size)
+        first = next(stripes)
+    except ECError as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': f'解码失败: {str(e)}'}), 500
 
@@ -1463,18 +2984,33 @@ def export_cross_ec_to_node():
     try:
         # 构建完整路径
         full_path = os.path.join(target_disk, target_path, filename)
-
-        resp = requests.post(
-            f"http://{target_ip}:{target_port}/api/write_file",
-            json={
-                'path': full_path,
-                'data': decoded.hex(),
-                'create_dirs': True
-            },
-            headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+        url = f"http://{target_ip}:{target_port}/api/write_file"
+
+        # 以二进制分块流式发送，边解码边写入
+        resp = node_http.post(
+            url,
+            params={'path': full_path, 'create_dirs': 'true'},
+            data=itertools.chain([first], stripes),
+            headers={'X-NAS-Secret': NAS_SHARED_SECRET, 'Content-Type': BINARY_CONTENT_TYPE},
             timeout=120
         )
 
+        if resp.status_code != 200:
+            # 旧节点只支持 hex-in-JSON，需要重新解码整个文件
+            print(f"[CROSS_EC_EXPORT] 节点二进制写入失败({resp.status_code})，尝试JSON格式")
+            decoded = b''.join(_iter_cross_ec_file(filename, original_size, k, m, file_stripe_size, disks,
+                                                   checksums=checksums, codec=codec))
+            resp = node_http.post(
+                url,
+                json={
+                    'path': full_path,
+                    'data': decoded.hex(),
+                    'create_dirs': True
+                },
+                headers={'X-NAS-Secret': NAS_SHARED_SECRET},
+                timeout=120
+            )
+
         if resp.status_code == 200:
             return jsonify({
                 'success': True,
@@ -1521,9 +3057,8 @@ def cross_ec_health_check():
 
             node_conn = online_nodes[node_id]
             try:
-                import requests
                 url = f"http://{node_conn['ip']}:{node_conn['port']}/api/disks"
-                resp = requests.get(url, timeout=5)
+                resp = node_http.get(url, timeout=5)
                 if resp.status_code == 200:
                     actual_disks = resp.json()
                     actual_mounts = set()
@@ -1541,8 +3076,24 @@ def cross_ec_health_check():
                 print(f"获取节点 {node_id} 磁盘失败: {e}")
                 continue
 
-        # 获取所有EC文件
-        cursor.execute('SELECT filename, size, disks FROM cross_ec_files')
+        def normalize_disk(d):
+            """统一磁盘格式"""
+            return d.upper().replace('\\', '/').rstrip('/') if d else ''
+
+        # 在线磁盘在磁盘表中的行：只查在线节点的磁盘（走 node_id 索引）
+        online_disk_ids = []
+        for node_id in online_nodes:
+            cursor.execute('SELECT id, disk FROM cross_ec_disks WHERE node_id = ?', (node_id,))
+            online_disk_ids.extend(disk_id for disk_id, disk in cursor.fetchall()
+                                   if f"{node_id}:{normalize_disk(disk)}" in online_disks)
+
+        # 各文件的分片总数与在线分片数直接在分片表上汇总
+        cursor.execute(f'''
+            SELECT f.filename, f.size, COUNT(s.id),
+                COALESCE(SUM(s.disk_id IN ({', '.join('?' * len(online_disk_ids))})), 0)
+            FROM cross_ec_files f LEFT JOIN cross_ec_shards s ON s.file_id = f.id
+            GROUP BY f.id ORDER BY f.id
+        ''', online_disk_ids)
         files = cursor.fetchall()
         conn.close()
 
@@ -1558,99 +3109,37 @@ def cross_ec_health_check():
             'm': m
         }
 
-        def normalize_disk(d):
-            """统一磁盘格式"""
-            return d.upper().replace('\\', '/').rstrip('/') if d else ''
-
-        for filename, size, disks_json in files:
-            file_debug = {'filename': filename, 'shards': []}
-            try:
-                if not disks_json:
-                    corrupted_files += 1
-                    file_details.append({
-                        'filename': filename,
-                        'size': size or 0,
-                        'status': 'corrupted',
-                        'online_shards': 0,
-                        'total_shards': 0,
-                        'reason': 'disks_json为空'
-                    })
-                    continue
-
-                disks = json.loads(disks_json) if isinstance(disks_json, str) else disks_json
-
-                if not isinstance(disks, list):
-                    corrupted_files += 1
-                    file_details.append({
-                        'filename': filename,
-                        'size': size or 0,
-                        'status': 'corrupted',
-                        'online_shards': 0,
-                        'total_shards': 0,
-                        'reason': 'disks不是列表'
-                    })
-                    continue
-
-                # 统计在线的分片数
-                online_shards = 0
-                total_shards = len(disks)
-
-                for idx, disk_info in enumerate(disks):
-                    if isinstance(disk_info, dict):
-                        node_id = str(disk_info.get('node_id') or disk_info.get('nodeId') or '')
-                        disk = disk_info.get('disk', '')
-
-                        # 标准化后匹配
-                        normalized_key = f"{node_id}:{normalize_disk(disk)}"
-
-                        # 在online_disks中查找（也需要标准化比较）
-                        is_online = any(
-                            f"{node_id}:{normalize_disk(d.split(':', 1)[1] if ':' in d else d)}" == normalized_key
-                            for d in online_disks if d.startswith(f"{node_id}:")
-                        )
-
-                        if is_online:
-                            online_shards += 1
-
-                        file_debug['shards'].append({
-                            'index': idx,
-                            'node_id': node_id,
-                            'disk': disk,
-                            'normalized_key': normalized_key,
-                            'is_online': is_online
-                        })
-
-                # 判断文件状态
-                if online_shards >= k + m:
-                    healthy_files += 1
-                    status = 'healthy'
-                elif online_shards >= k:
-                    at_risk_files += 1
-                    status = 'at_risk'
-                else:
-                    corrupted_files += 1
-                    status = 'corrupted'
-
-                file_details.append({
-                    'filename': filename,
-                    'size': size or 0,
-                    'status': status,
-                    'online_shards': online_shards,
-                    'total_shards': total_shards,
-                    'shards_debug': file_debug['shards']  # 调试用
-                })
-
-            except Exception as e:
-                print(f"检查文件 {filename} 失败: {e}")
+        for filename, size, total_shards, online_shards in files:
+            if not total_shards:
                 corrupted_files += 1
                 file_details.append({
                     'filename': filename,
-                    'size': size if size else 0,
+                    'size': size or 0,
                     'status': 'corrupted',
                     'online_shards': 0,
                     'total_shards': 0,
-                    'error': str(e)
+                    'reason': '没有分片记录'
                 })
+                continue
+
+            # 判断文件状态
+            if online_shards >= k + m:
+                healthy_files += 1
+                status = 'healthy'
+            elif online_shards >= k:
+                at_risk_files += 1
+                status = 'at_risk'
+            else:
+                corrupted_files += 1
+                status = 'corrupted'
+
+            file_details.append({
+                'filename': filename,
+                'size': size or 0,
+                'status': status,
+                'online_shards': online_shards,
+                'total_shards': total_shards
+            })
 
         return jsonify({
             'success': True,
@@ -1682,7 +3171,7 @@ def proxy_node_batch_delete(node_id):
         return jsonify({'error': '节点不存在'}), 404
 
     try:
-        resp = requests.post(
+        resp = node_http.post(
             f"http://{node['ip']}:{node.get('port', 5000)}/api/batch_delete",
             json=request.json,
             headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -2,6 +2,7 @@
 from flask import Blueprint, jsonify, request
 import sqlite3
 import requests
+from node_client import node_http
 from auth import login_required, admin_required
 from common import get_node_from_db, load_nodes_config
 from config import NAS_SHARED_SECRET
@@ -26,7 +27,7 @@ def list_encrypted_disks():
             headers = {"X-NAS-Secret": NAS_SHARED_SECRET}
 
             try:
-                res = requests.get(node_url, headers=headers, timeout=5)
+                res = node_http.get(node_url, headers=headers, timeout=5)
                 if res.status_code == 200:
                     node_disks = res.json()
                     disks = []
@@ -121,7 +122,7 @@ def lock_disk():
     print(f"[管理端] 请求节点 {node_id} 锁定磁盘 {mount}")
 
     try:
-        res = requests.post(node_url, json={"drive": mount}, headers=headers, timeout=10)
+        res = node_http.post(node_url, json={"drive": mount}, headers=headers, timeout=10)
         if res.status_code == 200 and res.json().get("success"):
             conn = sqlite3.connect('nas_center.db')
             cursor = conn.cursor()
@@ -165,7 +166,7 @@ def unlock_disk():
         payload = {"drive": mount, "password": password}
         headers = {"X-NAS-Secret": NAS_SHARED_SECRET}
 
-        res = requests.post(node_url, json=payload, headers=headers, timeout=20)
+        res = node_http.post(node_url, json=payload, headers=headers, timeout=20)
 
         if res.status_code == 200:
             result = res.json()
@@ -224,7 +225,7 @@ def encrypt_disk():
         payload = {"drive": mount, "password": password}
         headers = {"X-NAS-Secret": NAS_SHARED_SECRET}
 
-        res = requests.post(node_url, json=payload, headers=headers, timeout=300)
+        res = node_http.post(node_url, json=payload, headers=headers, timeout=300)
 
         if res.status_code == 200:
             result = res.json()
@@ -298,7 +299,7 @@ def decrypt_disk():
     print(f"[管理端] 请求节点 {node_id} 永久解密磁盘 {mount}")
 
     try:
-        res = requests.post(node_url, json={"drive": mount, "password": password}, headers=headers, timeout=10)
+        res = node_http.post(node_url, json={"drive": mount, "password": password}, headers=headers, timeout=10)
         if res.status_code == 200 and res.json().get("success"):
             conn = sqlite3.connect('nas_center.db')
             cursor = conn.cursor()
@@ -339,7 +340,7 @@ def change_disk_password():
     print(f"[管理端] 请求节点 {node_id} 修改密码: {mount}")
 
     try:
-        res = requests.post(node_url, json={"drive": mount, "new_password": new_pw}, headers=headers, timeout=10)
+        res = node_http.post(node_url, json={"drive": mount, "new_password": new_pw}, headers=headers, timeout=10)
         if res.status_code == 200 and res.json().get("success"):
             print(f"[管理端] 节点 {node_id} 磁盘 {mount} 密码修改成功 ✅")
             return jsonify({"success": True})
@@ -1,6 +1,6 @@
 # file_routes.py - 文件操作路由
 from flask import Blueprint, jsonify, request, Response
-import requests
+from node_client import node_http
 from urllib.parse import quote
 from auth import login_required, permission_required
 from common import get_node_config_by_id
@@ -20,7 +20,7 @@ def list_files(node_id):
 
     try:
         url = f"http://{node_config['ip']}:{node_config['port']}/api/list?path={path}"
-        response = requests.get(url, timeout=10)
+        response = node_http.get(url, timeout=10)
         response.raise_for_status()
         return jsonify(response.json())
     except Exception as e:
@@ -52,7 +52,7 @@ def upload_to_node(node_id):
                 files.append(('file', (f.filename, f.stream, f.content_type)))
 
         data = {'path': full_path}
-        response = requests.post(url, files=files, data=data, timeout=120)
+        response = node_http.post(url, files=files, data=data, timeout=120)
 
         return jsonify(response.json()), response.status_code
     except Exception as e:
@@ -77,7 +77,7 @@ def download_from_node(node_id):
             full_path = f"{disk}/{path}".replace('//', '/')
 
         url = f"http://{node_config['ip']}:{node_config['port']}/api/download?path={full_path}"
-        response = requests.get(url, stream=True, timeout=300)
+        response = node_http.get(url, stream=True, timeout=300)
 
         if response.status_code != 200:
             return jsonify({"error": "下载失败"}), response.status_code
@@ -116,7 +116,7 @@ def mkdir_on_node(node_id):
             full_path = f"{disk}/{path}".replace('//', '/')
 
         url = f"http://{node_config['ip']}:{node_config['port']}/api/mkdir"
-        response = requests.post(url, json={"path": full_path}, timeout=10)
+        response = node_http.post(url, json={"path": full_path}, timeout=10)
 
         return jsonify(response.json()), response.status_code
     except Exception as e:
@@ -142,7 +142,7 @@ def delete_on_node(node_id):
             full_path = f"{disk}/{path}".replace('//', '/')
 
         url = f"http://{node_config['ip']}:{node_config['port']}/api/delete"
-        response = requests.post(url, json={"path": full_path}, timeout=30)
+        response = node_http.post(url, json={"path": full_path}, timeout=30)
 
         return jsonify(response.json()), response.status_code
     except Exception as e:
@@ -167,7 +167,7 @@ def preview_on_node(node_id):
             full_path = f"{disk}/{path}".replace('//', '/')
 
         url = f"http://{node_config['ip']}:{node_config['port']}/api/preview?path={full_path}"
-        response = requests.get(url, stream=True, timeout=60)
+        response = node_http.get(url, stream=True, timeout=60)
 
         if response.status_code != 200:
             return jsonify({"error": "预览失败"}), response.status_code
@@ -192,7 +192,7 @@ def delete_file(node_id):
 
     try:
         url = f"http://{node_config['ip']}:{node_config['port']}/api/files/delete"
-        response = requests.post(url, json={"path": path}, timeout=10)
+        response = node_http.post(url, json={"path": path}, timeout=10)
         response.raise_for_status()
         return jsonify(response.json())
     except Exception as e:
@@ -211,7 +211,7 @@ def mkdir(node_id):
 
     try:
         url = f"http://{node_config['ip']}:{node_config['port']}/api/files/mkdir"
-        response = requests.post(url, json={"path": path}, timeout=5)
+        response = node_http.post(url, json={"path": path}, timeout=5)
         response.raise_for_status()
         return jsonify(response.json())
     except Exception as e:
@@ -0,0 +1,255 @@
+# node_client.py - 中心访问节点的共享 HTTP 客户端
+"""
+所有蓝图访问节点都经由 node_http：每个节点（ip:port）一个 requests.Session，
+连接池 + keep-alive 复用 TCP 连接，建连失败按退避重试。
+会话同时承载代理转发的用户请求，不设默认的 X-NAS-Secret，中心发起的内部调用需自行在 headers 中携带。
+用法与 requests 相同：node_http.get(url, params=..., timeout=...)，异常类型仍为 requests.exceptions.*。
+
+每个节点记录请求耗时与连续失败次数：连续失败达到阈值后熔断，熔断期间请求直接抛出 NodeUnavailable
+（ConnectionError 的子类，原有的离线处理照常生效），后台线程定期探测，节点响应后恢复；
+耗时按操作（方法 + 路径）分别统计，样本足够时短请求的读超时按该节点同一操作的 p99 耗时自适应收紧。
+带请求体或流式读取响应体的数据传输（分片读写、上传下载、代理转发）耗时取决于数据量，
+既不参与自适应也不收紧超时，读超时也不计入熔断失败（连接失败仍然计入）。
+"""
+import threading
+import time
+from collections import deque
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from config import (NODE_HTTP_POOL_SIZE, NODE_HTTP_RETRIES, NODE_HTTP_RETRY_BACKOFF,
+                    NODE_HTTP_CONNECT_TIMEOUT, NODE_HTTP_TIMEOUT, NODE_BREAKER_FAILURES,
+                    NODE_BREAKER_PROBE_INTERVAL, NODE_LATENCY_SAMPLES, NODE_ADAPTIVE_MIN_SAMPLES,
+                    NODE_ADAPTIVE_TIMEOUT_FACTOR, NODE_ADAPTIVE_TIMEOUT_MIN, NODE_ADAPTIVE_TIMEOUT_MAX)
+
+# 熔断探测用的节点接口，任何 HTTP 响应（包括错误状态码）都说明节点已恢复
+PROBE_PATH = '/api/system-stats'
+
+
+class NodeUnavailable(requests.exceptions.ConnectionError):
+    """节点处于熔断状态，请求未发出"""
+
+
+def _percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _is_read_timeout(error):
+    """读超时：连接已建立、节点仍在处理或传输中（Retry 用尽后 requests 会把它包装成 ConnectionError）"""
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, ReadTimeoutError)
+
+
+class NodeHealth:
+    """单个节点的健康状态：各操作最近成功请求耗时、连续失败次数、熔断时间"""
+
+    def __init__(self):
+        self.latencies = {}  # {操作: deque(耗时)}
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def record_success(self, seconds=None, operation=None):
+        """记录一次成功请求，operation 为 None 时（数据传输）只清除失败计数"""
+        with self._lock:
+            if operation is not None:
+                samples = self.latencies.get(operation)
+                if samples is None:
+                    samples = self.latencies[operation] = deque(maxlen=NODE_LATENCY_SAMPLES)
+                samples.append(seconds)
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, error):
+        """记录一次失败，本次失败导致熔断时返回 True"""
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.opened_at is None and self.failures >= NODE_BREAKER_FAILURES:
+                self.opened_at = time.time()
+                return True
+            return False
+
+    def p99(self, operation):
+        """某操作的 p99 耗时，样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self.latencies.get(operation, ()))
+        if len(samples) < NODE_ADAPTIVE_MIN_SAMPLES:
+            return None
+        return _percentile(samples, 0.99)
+
+    def read_timeout(self, timeout, operation):
+        """调用方读超时不超过上限时按该操作的 p99 收紧，不会比调用方给出的更长"""
+        if timeout > NODE_ADAPTIVE_TIMEOUT_MAX:
+            return timeout
+        p99 = self.p99(operation)
+        if p99 is None:
+            return timeout
+        return min(timeout, max(NODE_ADAPTIVE_TIMEOUT_MIN, p99 * NODE_ADAPTIVE_TIMEOUT_FACTOR))
+
+    def snapshot(self):
+        with self._lock:
+            latencies = {operation: sorted(samples) for operation, samples in self.latencies.items()}
+            state = {
+                'state': 'open' if self.opened_at is not None else 'closed',
+                'failures': self.failures,
+                'opened_at': self.opened_at,
+                'last_error': self.last_error,
+                'samples': sum(len(samples) for samples in latencies.values()),
+            }
+        operations = {}
+        for operation, samples in latencies.items():
+            if not samples:
+                continue
+            operations[operation] = {
+                'samples': len(samples),
+                'p50_ms': round(_percentile(samples, 0.5) * 1000, 1),
+                'p99_ms': round(_percentile(samples, 0.99) * 1000, 1),
+                'read_timeout': self.read_timeout(NODE_HTTP_TIMEOUT, operation)
+            }
+        state['operations'] = operations
+        return state
+
+
+class NodeClient:
+    def __init__(self, pool_size=NODE_HTTP_POOL_SIZE, retries=NODE_HTTP_RETRIES, backoff=NODE_HTTP_RETRY_BACKOFF,
+                 connect_timeout=NODE_HTTP_CONNECT_TIMEOUT, timeout=NODE_HTTP_TIMEOUT):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._sessions = {}
+        self._health = {}
+        self._lock = threading.Lock()
+        self._prober = None
+
+    def _new_session(self):
+        session = requests.Session()
+        # 只重试建连失败（请求尚未发出，POST 也安全）；读超时和错误状态码交给调用方处理
+        retry = Retry(total=self.retries, connect=self.retries, read=0, status=0, other=0,
+                      backoff_factor=self.backoff, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # 会话在所有用户之间共享（代理转发也走这里），不能保存节点返回的 Cookie
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def session(self, url):
+        """url 所在节点的会话"""
+        node_key = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(node_key)
+            if session is None:
+                session = self._sessions[node_key] = self._new_session()
+        return session
+
+    def health(self, node_key):
+        """node_key（ip:port）的健康状态，首次访问时创建"""
+        with self._lock:
+            health = self._health.get(node_key)
+            if health is None:
+                health = self._health[node_key] = NodeHealth()
+        return health
+
+    def is_available(self, node_key):
+        """节点未熔断（熔断中的节点调用方可直接跳过）"""
+        return not self.health(node_key).is_open
+
+    def health_snapshot(self):
+        with self._lock:
+            items = list(self._health.items())
+        return {node_key: health.snapshot() for node_key, health in items}
+
+    def _timeout(self, timeout, health, operation):
+        if timeout is None:
+            timeout = self.timeout
+        if isinstance(timeout, (int, float)):
+            read = timeout if operation is None else health.read_timeout(timeout, operation)
+            return min(self.connect_timeout, read), read
+        return timeout
+
+    def request(self, method, url, **kwargs):
+        parts = urlsplit(url)
+        node_key = parts.netloc
+        health = self.health(node_key)
+        if health.is_open:
+            raise NodeUnavailable(f"节点 {node_key} 熔断中（{health.last_error}）")
+        # 数据传输的耗时随数据量变化，不归入任何操作的耗时统计
+        transfer = kwargs.get('stream') or kwargs.get('data') is not None or kwargs.get('files') is not None
+        operation = None if transfer else f"{method} {parts.path}"
+        kwargs['timeout'] = self._timeout(kwargs.get('timeout'), health, operation)
+        started = time.monotonic()
+        try:
+            response = self.session(url).request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # 数据传输的读超时多半是数据量大或链路慢，节点本身仍在响应，不计入熔断
+            if transfer and _is_read_timeout(e):
+                raise
+            if health.record_failure(e):
+                print(f"[节点熔断] {node_key} 连续失败 {health.failures} 次，暂停访问: {e}")
+                self._start_prober()
+            raise
+        health.record_success(time.monotonic() - started, operation)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def _start_prober(self):
+        with self._lock:
+            if self._prober is not None and self._prober.is_alive():
+                return
+            self._prober = threading.Thread(target=self._probe_loop, name='node-breaker-probe', daemon=True)
+            self._prober.start()
+
+    def _probe_loop(self):
+        """定期探测熔断中的节点，节点有响应即恢复；没有熔断节点时线程退出"""
+        while True:
+            time.sleep(NODE_BREAKER_PROBE_INTERVAL)
+            with self._lock:
+                opened = [(key, h) for key, h in self._health.items() if h.is_open]
+                if not opened:
+                    self._prober = None
+                    return
+            for node_key, health in opened:
+                url = f"http://{node_key}{PROBE_PATH}"
+                started = time.monotonic()
+                try:
+                    self.session(url).get(url, timeout=(self.connect_timeout, NODE_ADAPTIVE_TIMEOUT_MAX))
+                except requests.exceptions.RequestException as e:
+                    health.last_error = str(e)
+                    continue
+                health.record_success(time.monotonic() - started, f"GET {PROBE_PATH}")
+                print(f"[节点熔断] {node_key} 探测成功，恢复访问")
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+node_http = NodeClient()
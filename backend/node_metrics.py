@@ -0,0 +1,123 @@
+# node_metrics.py - 节点指标时序存储
+"""
+进程内的节点指标时序：每个节点每层一组定长环形缓冲（时间戳一列、每个指标一列，array('d')），
+原始采样同时累加进各降采样层的当前时间桶，时间桶结束时写入该层一个平均值（1 分钟 / 5 分钟 / 1 小时）。
+查询按时间范围自动选择能覆盖起点的最细一层，监控图表不再访问节点。
+"""
+import math
+import threading
+import time
+from array import array
+
+from config import NODE_METRICS_TIERS, NODE_STATS_INTERVAL
+
+# 记录的指标，取自节点 /api/system-stats
+METRICS = ('cpu_percent', 'memory_percent', 'disk_percent', 'cpu_temp_celsius',
+           'network_download', 'network_upload')
+
+
+class _Ring:
+    """定长环形缓冲，缺失的指标值记为 NaN"""
+
+    def __init__(self, size):
+        self.size = size
+        self.ts = array('d', [0.0]) * size
+        self.cols = {m: array('d', [math.nan]) * size for m in METRICS}
+        self.head = 0
+        self.count = 0
+
+    def append(self, ts, values):
+        i = self.head
+        self.ts[i] = ts
+        for m, col in self.cols.items():
+            col[i] = values.get(m, math.nan)
+        self.head = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def points(self, metric, start, end):
+        col = self.cols[metric]
+        out = []
+        for k in range(self.count):
+            i = (self.head - self.count + k) % self.size
+            t = self.ts[i]
+            if start <= t <= end and not math.isnan(col[i]):
+                out.append([t, col[i]])
+        return out
+
+
+class _NodeSeries:
+    def __init__(self):
+        self.rings = {name: _Ring(size) for name, _, size in NODE_METRICS_TIERS}
+        # 降采样层的当前时间桶：{层名: [桶起点, {指标: 累加和}, {指标: 样本数}]}
+        self.buckets = {name: [None, {}, {}] for name, step, _ in NODE_METRICS_TIERS if step}
+        self.lock = threading.Lock()
+
+    def record(self, ts, values):
+        with self.lock:
+            for name, step, _ in NODE_METRICS_TIERS:
+                if not step:
+                    self.rings[name].append(ts, values)
+                    continue
+                bucket = self.buckets[name]
+                start = ts - ts % step
+                if bucket[0] is not None and bucket[0] != start:
+                    sums, counts = bucket[1], bucket[2]
+                    self.rings[name].append(bucket[0], {m: sums[m] / counts[m] for m in sums})
+                    bucket[1], bucket[2] = {}, {}
+                bucket[0] = start
+                for m, v in values.items():
+                    bucket[1][m] = bucket[1].get(m, 0.0) + v
+                    bucket[2][m] = bucket[2].get(m, 0) + 1
+
+    def query(self, tier, metrics, start, end):
+        with self.lock:
+            return {m: self.rings[tier].points(m, start, end) for m in metrics}
+
+
+class NodeMetrics:
+    def __init__(self):
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def record(self, node_id, stats, ts=None):
+        """写入一次采样，stats 为节点 /api/system-stats 的返回"""
+        values = {}
+        for m in METRICS:
+            v = stats.get(m)
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                values[m] = float(v)
+        with self._lock:
+            series = self._nodes.get(node_id)
+            if series is None:
+                series = self._nodes[node_id] = _NodeSeries()
+        series.record(time.time() if ts is None else ts, values)
+
+    def forget(self, node_id):
+        with self._lock:
+            self._nodes.pop(node_id, None)
+
+    @staticmethod
+    def tiers():
+        """[(层名, 点间隔秒数, 保留秒数)]，由细到粗"""
+        return [(name, step or NODE_STATS_INTERVAL, (step or NODE_STATS_INTERVAL) * size)
+                for name, step, size in NODE_METRICS_TIERS]
+
+    def pick_tier(self, start, now=None):
+        """保留时长能覆盖 start 的最细一层，都覆盖不到时取最粗一层"""
+        age = (time.time() if now is None else now) - start
+        for name, _, retention in self.tiers():
+            if age <= retention:
+                return name
+        return NODE_METRICS_TIERS[-1][0]
+
+    def query(self, node_id, metrics, start, end, tier=None, now=None):
+        """返回 (层名, {指标: [[时间戳, 值], ...]})，节点没有数据时各指标为空列表"""
+        tier = tier or self.pick_tier(start, now)
+        with self._lock:
+            series = self._nodes.get(node_id)
+        if series is None:
+            return tier, {m: [] for m in metrics}
+        return tier, series.query(tier, metrics, start, end)
+
+
+node_metrics = NodeMetrics()
@@ -0,0 +1,155 @@
+# node_registry.py - 节点心跳登记表
+"""
+心跳只更新内存（ACTIVE_NODES 与各节点状态），O(1)，不访问数据库；
+后台线程每 NODE_HEARTBEAT_FLUSH_INTERVAL 秒把有变化的 last_seen / status 在一个事务里批量写回 nodes 表，
+同时巡检心跳超时（NODE_HEARTBEAT_TIMEOUT）的节点并标记离线。
+节点状态的变更（心跳、注册、轮询发现离线）都经由这里写回，避免多处写入互相覆盖。
+"""
+import threading
+import time
+from datetime import datetime
+
+from common import ACTIVE_NODES, get_db_connection
+from config import NODE_HEARTBEAT_FLUSH_INTERVAL, NODE_HEARTBEAT_TIMEOUT
+
+
+class NodeRegistry:
+    def __init__(self, flush_interval=NODE_HEARTBEAT_FLUSH_INTERVAL, timeout=NODE_HEARTBEAT_TIMEOUT):
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self._status = None       # {node_id: status}，首次使用时从数据库加载一次
+        self._last_beat = {}      # {node_id: 最近心跳时间戳}，只有发过心跳的节点参与超时巡检
+        self._pending = {}        # {node_id: (status, last_seen 或 None)}，待写回数据库
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='node-registry', daemon=True)
+        self._thread.start()
+
+    def _ensure_loaded(self):
+        """调用方持有 _lock"""
+        if self._status is None:
+            conn = get_db_connection()
+            try:
+                self._status = {row['node_id']: row['status']
+                                for row in conn.execute('SELECT node_id, status FROM nodes')}
+            finally:
+                conn.close()
+
+    def _set_status(self, node_id, status, last_seen=None):
+        """调用方持有 _lock"""
+        self._status[node_id] = status
+        if last_seen is None and node_id in self._pending:
+            # 保留尚未写回的 last_seen
+            last_seen = self._pending[node_id][1]
+        self._pending[node_id] = (status, last_seen)
+
+    def heartbeat(self, node_id, name, ip, port, stats):
+        """记录一次心跳，返回此前的状态（未登记的节点为 None）"""
+        if self._thread is None:
+            self.start()
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            previous = self._status.get(node_id)
+            ACTIVE_NODES[node_id] = {
+                'id': node_id,
+                'name': name,
+                'ip': ip,
+                'port': port,
+                'status': 'online',
+                'stats': stats,
+                'last_heartbeat': datetime.now().isoformat()
+            }
+            self._last_beat[node_id] = now
+            # 与 SQLite CURRENT_TIMESTAMP 同格式（UTC）
+            self._set_status(node_id, 'online', time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now)))
+        return previous
+
+    def mark_online(self, node_id):
+        """节点注册后调用，数据库已由调用方写入，这里只同步内存状态"""
+        with self._lock:
+            self._ensure_loaded()
+            self._status[node_id] = 'online'
+            self._pending.pop(node_id, None)
+
+    def mark_offline(self, node_id, reason=''):
+        """标记节点离线，返回是否由在线变为离线"""
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            self._ensure_loaded()
+            if self._status.get(node_id) == 'offline':
+                return False
+            self._set_status(node_id, 'offline')
+            self._last_beat.pop(node_id, None)
+            node = ACTIVE_NODES.get(node_id)
+            if node:
+                node['status'] = 'offline'
+        print(f"[节点心跳] 节点 {node_id} 标记为离线{f'：{reason}' if reason else ''}")
+        return True
+
+    def forget(self, node_id):
+        """节点删除后调用"""
+        with self._lock:
+            if self._status is not None:
+                self._status.pop(node_id, None)
+            self._last_beat.pop(node_id, None)
+            self._pending.pop(node_id, None)
+            ACTIVE_NODES.pop(node_id, None)
+
+    def status(self, node_id):
+        with self._lock:
+            self._ensure_loaded()
+            return self._status.get(node_id)
+
+    def sweep(self):
+        """心跳超时的节点标记为离线，返回标记的节点"""
+        deadline = time.time() - self.timeout
+        with self._lock:
+            expired = [node_id for node_id, beat in self._last_beat.items() if beat < deadline]
+        return [node_id for node_id in expired
+                if self.mark_offline(node_id, f'{self.timeout} 秒未收到心跳')]
+
+    def flush(self):
+        """把待写回的状态在一个事务里写入数据库，返回写入的节点数"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            conn = get_db_connection()
+            try:
+                conn.executemany(
+                    'UPDATE nodes SET status = ?, last_seen = COALESCE(?, last_seen) WHERE node_id = ?',
+                    [(status, last_seen, node_id) for node_id, (status, last_seen) in pending.items()])
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            # 写回失败时放回队列，期间更新过的节点以新状态为准
+            with self._lock:
+                for node_id, item in pending.items():
+                    self._pending.setdefault(node_id, item)
+            raise
+        return len(pending)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.sweep()
+                self.flush()
+            except Exception as e:
+                print(f"[节点心跳] 写回失败: {e}")
+
+
+node_registry = NodeRegistry()
+
+
+def start_node_registry():
+    node_registry.start()
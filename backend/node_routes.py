@@ -4,12 +4,15 @@ import sqlite3
 import json
 import time
 import requests
-from datetime import datetime
+from node_client import node_http
+from node_stats import node_stats
+from node_registry import node_registry
+from node_metrics import node_metrics, METRICS
 from auth import login_required, admin_required
 from common import (
     get_db, ACTIVE_NODES, load_nodes_config, save_nodes_config,
     get_node_config_by_id, get_node_from_db, get_all_nodes_from_db,
-    update_node_config, fetch_node_data
+    fetch_node_data
 )
 from config import NAS_SHARED_SECRET
 
@@ -37,29 +40,12 @@ def node_register():
     else:
         node_ip = real_ip
 
-    # 检查节点之前的状态（用于判断是否是从离线变为在线）
-    old_status = None
-    try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute('SELECT status FROM nodes WHERE node_id = ?', (node_id,))
-        row = cursor.fetchone()
-        if row:
-            old_status = row['status']
-    except:
-        pass
-
-    ACTIVE_NODES[node_id] = {
-        'id': node_id,
-        'name': data.get('name', '未命名节点'),
-        'ip': node_ip,  # ✅ 使用修正后的 IP
-        'port': data.get('port'),
-        'status': 'online',
-        'stats': data.get('stats', {}),
-        'last_heartbeat': datetime.now().isoformat()
-    }
+    # 只更新内存登记表，last_seen / 状态由后台批量写回；返回此前的状态用于判断是否从离线变为在线
+    old_status = node_registry.heartbeat(node_id, data.get('name', '未命名节点'), node_ip,  # ✅ 使用修正后的 IP
+                                         data.get('port'), data.get('stats', {}))
 
-    update_node_config(node_id, data)
+    if old_status != 'online':
+        node_stats.request_refresh()
 
     # ✅ 节点从离线变为在线时，处理待处理任务
     if old_status and old_status != 'online':
@@ -111,7 +97,7 @@ def _process_pending_tasks_for_node(node_id):
         try:
             if task_type == 'delete_pool_files':
                 target_dir = params.get('target_dir')
-                resp = requests.post(
+                resp = node_http.post(
                     f"http://{node_ip}:{node_port}/api/internal/delete-dir",
                     json={'path': target_dir},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -124,7 +110,7 @@ def _process_pending_tasks_for_node(node_id):
             elif task_type == 'delete_volume_files':
                 # 删除逻辑卷文件
                 target_path = params.get('target_path')
-                resp = requests.post(
+                resp = node_http.post(
                     f"http://{node_ip}:{node_port}/api/internal/delete-dir",
                     json={'path': target_path},
                     headers={'X-NAS-Secret': NAS_SHARED_SECRET},
@@ -140,7 +126,7 @@ def _process_pending_tasks_for_node(node_id):
                 success_count = 0
                 for shard in shards:
                     try:
-                        resp = requests.delete(
+                        resp = node_http.delete(
                             f"http://{node_ip}:{node_port}/api/ec_shard",
                             params={
                                 'filename': shard.get('filename'),
@@ -228,6 +214,9 @@ def get_all_nodes():
             if accessible_node_ids is not None and denied_nodes:
                 accessible_node_ids = [nid for nid in accessible_node_ids if nid not in denied_nodes]
 
+        # 节点实时状态来自后台轮询的快照，不在请求路径上访问节点
+        snapshot = node_stats.snapshot()
+
         # 根据权限查询节点
         if accessible_node_ids is None:
             cursor.execute('''
@@ -246,16 +235,23 @@ def get_all_nodes():
         else:
             return jsonify([])
 
+        rows = cursor.fetchall()
+
+        # 策略、磁盘容量、白名单各查一次，避免逐节点查询
+        cursor.execute('SELECT node_id, policy FROM node_policies')
+        policies = {r['node_id']: r['policy'] for r in cursor.fetchall()}
+        cursor.execute('SELECT node_id, SUM(capacity_gb) as total_storage FROM node_disks GROUP BY node_id')
+        storages = {r['node_id']: r['total_storage'] or 0 for r in cursor.fetchall()}
+        in_whitelist = None
         nodes = []
 
-        for row in cursor.fetchall():
+        for row in rows:
             node_id = row['node_id']
-            status = row['status']
+            # 心跳与离线判定先更新内存登记表，再批量写回数据库，状态以登记表为准
+            status = node_registry.status(node_id) or row['status']
 
             # 节点策略过滤
-            cursor.execute('SELECT policy FROM node_policies WHERE node_id = ?', (node_id,))
-            policy_row = cursor.fetchone()
-            policy = policy_row['policy'] if policy_row else 'all_users'
+            policy = policies.get(node_id, 'all_users')
 
             if policy == 'disabled':
                 if role == 'admin':
@@ -266,18 +262,14 @@ def get_all_nodes():
                 continue
             elif policy == 'whitelist':
                 if role != 'admin':
-                    cursor.execute('SELECT 1 FROM whitelist_users WHERE user_id = ?', (user_id,))
-                    if not cursor.fetchone():
+                    if in_whitelist is None:
+                        cursor.execute('SELECT 1 FROM whitelist_users WHERE user_id = ?', (user_id,))
+                        in_whitelist = cursor.fetchone() is not None
+                    if not in_whitelist:
                         continue
 
             # 获取磁盘总容量
-            cursor.execute('''
-                SELECT SUM(capacity_gb) as total_storage
-                FROM node_disks
-                WHERE node_id = ?
-            ''', (node_id,))
-            disk_row = cursor.fetchone()
-            total_storage = disk_row['total_storage'] if disk_row['total_storage'] else 0
+            total_storage = storages.get(node_id, 0)
 
             cpu_usage = 0
             memory_usage = 0
@@ -285,29 +277,14 @@ def get_all_nodes():
             used_storage = 0
             cpu_temp = 0
 
-            # 实时检测节点状态
-            if status == 'online':
-                try:
-                    stats_url = f"http://{row['ip']}:{row['port']}/api/system-stats"
-                    stats_response = requests.get(stats_url, timeout=2)
-
-                    if stats_response.status_code == 200:
-                        stats = stats_response.json()
-                        cpu_usage = stats.get('cpu_percent', 0)
-                        memory_usage = stats.get('memory_percent', 0)
-                        disk_usage = stats.get('disk_percent', 0)
-                        used_storage = stats.get('disk_used_gb', 0)
-                        cpu_temp = stats.get('cpu_temp_celsius', 0)
-                    else:
-                        status = 'offline'
-                        cursor.execute('UPDATE nodes SET status = ? WHERE node_id = ?', ('offline', node_id))
-                        db.commit()
-
-                except Exception as e:
-                    print(f"[DEBUG] 节点 {node_id} 离线: {e}")
-                    status = 'offline'
-                    cursor.execute('UPDATE nodes SET status = ? WHERE node_id = ?', ('offline', node_id))
-                    db.commit()
+            # 轮询失败的节点已标记为 offline，这里只取在线节点的最近一次状态
+            if status == 'online' and node_id in snapshot:
+                stats = snapshot[node_id]['stats']
+                cpu_usage = stats.get('cpu_percent', 0)
+                memory_usage = stats.get('memory_percent', 0)
+                disk_usage = stats.get('disk_percent', 0)
+                used_storage = stats.get('disk_used_gb', 0)
+                cpu_temp = stats.get('cpu_temp_celsius', 0)
 
             node_data = {
                 'id': node_id,
@@ -400,7 +377,7 @@ def rename_node(node_id):
 
         try:
             node = ACTIVE_NODES[node_id]
-            requests.post(
+            node_http.post(
                 f"http://{node['ip']}:{node['port']}/api/update-name",
                 json={'name': new_name},
                 timeout=5
@@ -436,8 +413,9 @@ def delete_node(node_id):
         cursor.execute('DELETE FROM nodes WHERE node_id = ?', (node_id,))
         conn.commit()
 
-        if node_id in ACTIVE_NODES:
-            del ACTIVE_NODES[node_id]
+        node_registry.forget(node_id)
+        node_metrics.forget(node_id)
+        node_stats.request_refresh()
 
         return jsonify({
             'success': True,
@@ -478,6 +456,8 @@ def register_node():
                 SET ip = ?, port = ?, status = 'online', last_seen = CURRENT_TIMESTAMP
                 WHERE node_id = ?
             ''', (ip, port, node_id))
+            # 跨节点EC分片按磁盘表中的 ip/port 访问，节点换地址后同步更新
+            cursor.execute('UPDATE cross_ec_disks SET ip = ?, port = ? WHERE node_id = ?', (ip, port, node_id))
             print(f"[节点更新] {node_id} - {ip}:{port}")
         else:
             cursor.execute('''
@@ -487,6 +467,9 @@ def register_node():
             print(f"[节点注册] {node_id} - {ip}:{port}")
 
         db.commit()
+        node_registry.mark_online(node_id)
+        if not existing or existing['status'] != 'online':
+            node_stats.request_refresh()
 
         return jsonify({
             'success': True,
@@ -521,7 +504,7 @@ def initialize_node():
     }
 
     try:
-        res = requests.post(node_url, json=payload, timeout=5)
+        res = node_http.post(node_url, json=payload, timeout=5)
         print(f"[主控] 已发送初始化给 {node['id']} → {res.status_code}")
         return jsonify({"success": True})
     except Exception as e:
@@ -541,35 +524,40 @@ def get_node_monitor_stats(node_id):
         if not node:
             return jsonify({"error": "节点不存在"}), 404
 
-        base_url = f"http://{node['ip']}:{node['port']}"
-
-        sys_response = requests.get(f"{base_url}/api/system-stats", timeout=5)
-        hw_response = requests.get(f"{base_url}/api/hardware-data", timeout=5)
-
-        if sys_response.status_code == 200:
+        entry = node_stats.get(node_id)
+        if entry and entry['stats']:
+            # 后台轮询的快照
+            sys_data, hw_data = entry['stats'], entry['hardware']
+        elif entry and entry['status'] == 'offline':
+            return jsonify({"error": "无法连接到节点"}), 503
+        else:
+            # 快照中还没有该节点（刚注册或轮询尚未覆盖）时直接拉取
+            base_url = f"http://{node['ip']}:{node['port']}"
+            sys_response = node_http.get(f"{base_url}/api/system-stats", timeout=5)
+            if sys_response.status_code != 200:
+                return jsonify({"error": "节点返回错误"}), 500
+            hw_response = node_http.get(f"{base_url}/api/hardware-data", timeout=5)
             sys_data = sys_response.json()
             hw_data = hw_response.json() if hw_response.status_code == 200 else {}
 
-            result = {
-                'temperatures': hw_data.get('temperatures', []),
-                'fans': hw_data.get('fans', []),
-                'voltages': hw_data.get('voltages', []),
-                'powers': hw_data.get('powers', []),
-                'clocks': hw_data.get('clocks', []),
-                'disks_temp': hw_data.get('disks_temp', []),
-                'memory_percent': sys_data.get('memory_percent', 0),
-                'disk_total_gb': sys_data.get('disk_total_gb', 0),
-                'disk_used_gb': sys_data.get('disk_used_gb', 0),
-                'cpu_temp_celsius': sys_data.get('cpu_temp_celsius', 0),
-                'cpu_freq': sys_data.get('cpu_freq', 0),
-                'cpu_power': sys_data.get('cpu_power', 0),
-                'network_download': sys_data.get('network_download', 0),
-                'network_upload': sys_data.get('network_upload', 0)
-            }
-
-            return jsonify(result)
-        else:
-            return jsonify({"error": "节点返回错误"}), 500
+        result = {
+            'temperatures': hw_data.get('temperatures', []),
+            'fans': hw_data.get('fans', []),
+            'voltages': hw_data.get('voltages', []),
+            'powers': hw_data.get('powers', []),
+            'clocks': hw_data.get('clocks', []),
+            'disks_temp': hw_data.get('disks_temp', []),
+            'memory_percent': sys_data.get('memory_percent', 0),
+            'disk_total_gb': sys_data.get('disk_total_gb', 0),
+            'disk_used_gb': sys_data.get('disk_used_gb', 0),
+            'cpu_temp_celsius': sys_data.get('cpu_temp_celsius', 0),
+            'cpu_freq': sys_data.get('cpu_freq', 0),
+            'cpu_power': sys_data.get('cpu_power', 0),
+            'network_download': sys_data.get('network_download', 0),
+            'network_upload': sys_data.get('network_upload', 0)
+        }
+
+        return jsonify(result)
 
     except requests.exceptions.Timeout:
         return jsonify({"error": "节点连接超时"}), 504
@@ -580,6 +568,46 @@ def get_node_monitor_stats(node_id):
         return jsonify({"error": str(e)}), 500
 
 
+@node_bp.route('/api/nodes/<node_id>/metrics', methods=['GET'])
+@login_required
+def get_node_metrics(node_id):
+    """
+    节点指标历史（来自后台轮询，不访问节点）
+    参数：metrics 逗号分隔的指标名（默认全部）、start / end 为 Unix 秒（默认最近 1 小时）、
+    tier 指定层（raw / 1m / 5m / 1h，默认按时间范围自动选择）
+    """
+    names = request.args.get('metrics')
+    metrics = [m for m in names.split(',') if m] if names else list(METRICS)
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        return jsonify({'success': False, 'error': f'未知的指标: {", ".join(unknown)}'}), 400
+
+    tiers = {name: step for name, step, _ in node_metrics.tiers()}
+    tier = request.args.get('tier') or None
+    if tier and tier not in tiers:
+        return jsonify({'success': False, 'error': f'未知的层: {tier}'}), 400
+
+    now = time.time()
+    try:
+        end = float(request.args.get('end') or now)
+        start = float(request.args.get('start') or end - 3600)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start / end 必须为 Unix 时间戳'}), 400
+    if start > end:
+        return jsonify({'success': False, 'error': 'start 不能晚于 end'}), 400
+
+    tier, series = node_metrics.query(node_id, metrics, start, end, tier, now)
+    return jsonify({
+        'success': True,
+        'node_id': node_id,
+        'tier': tier,
+        'step': tiers[tier],
+        'start': start,
+        'end': end,
+        'series': series
+    })
+
+
 @node_bp.route('/api/nodes/<node_id>/disks')
 @login_required
 def get_node_disks(node_id):
@@ -593,7 +621,7 @@ def get_node_disks(node_id):
             return jsonify({'error': '节点不存在'}), 404
 
         base_url = f"http://{node['ip']}:{node['port']}"
-        response = requests.get(f"{base_url}/api/disks", timeout=10)
+        response = node_http.get(f"{base_url}/api/disks", timeout=10)
 
         if response.status_code == 200:
             disks_data = response.json()
@@ -614,18 +642,9 @@ def get_node_disks(node_id):
 def get_stats():
     """获取系统统计信息"""
     try:
-        db = get_db()
-        cursor = db.cursor()
-
-        cursor.execute('SELECT COUNT(*) as total FROM nodes')
-        total_nodes = cursor.fetchone()['total']
-
-        cursor.execute('''
-            SELECT COUNT(*) as online 
-            FROM nodes 
-            WHERE status = 'online'
-        ''')
-        online_nodes = cursor.fetchone()['online']
+        snapshot = node_stats.snapshot()
+        total_nodes = len(snapshot)
+        online_nodes = sum(1 for entry in snapshot.values() if entry['status'] == 'online')
 
         offline_nodes = total_nodes - online_nodes
         warning_nodes = 0
@@ -647,6 +666,13 @@ def get_stats():
         }), 500
 
 
+@node_bp.route('/api/nodes/http-health', methods=['GET'])
+@login_required
+def get_nodes_http_health():
+    """中心访问各节点的健康状态：熔断状态、连续失败次数、耗时分位数与当前自适应读超时"""
+    return jsonify(node_http.health_snapshot())
+
+
 # ========== 节点分组 API ==========
 @node_bp.route('/api/node-groups', methods=['GET'])
 @login_required
@@ -0,0 +1,138 @@
+# node_stats.py - 节点状态后台轮询
+"""
+后台线程按 NODE_STATS_INTERVAL 并行拉取各在线节点的 /api/system-stats 与 /api/hardware-data，
+结果写入内存快照并记入 node_metrics 时序；/api/nodes、/api/stats 与监控视图直接读快照，请求路径上不再访问节点。
+节点状态以心跳登记表为准，连续 NODE_STATS_OFFLINE_FAILURES 轮拉取系统状态失败的节点经由登记表标记为 offline，
+未到次数时保留上一轮的数据并记录错误；
+节点注册/删除后可调用 request_refresh 立即刷新。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import get_db_connection
+from config import NODE_STATS_INTERVAL, NODE_STATS_WORKERS, NODE_STATS_TIMEOUT, NODE_STATS_OFFLINE_FAILURES
+from node_client import node_http
+from node_metrics import node_metrics
+from node_registry import node_registry
+
+
+class NodeStatsPoller:
+    def __init__(self, interval=NODE_STATS_INTERVAL, workers=NODE_STATS_WORKERS, timeout=NODE_STATS_TIMEOUT,
+                 offline_failures=NODE_STATS_OFFLINE_FAILURES):
+        self.interval = interval
+        self.timeout = timeout
+        self.offline_failures = offline_failures
+        self._failures = {}       # {node_id: 连续拉取失败次数}，只在轮询线程中读写
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='node-stats')
+        self._snapshot = {}       # {node_id: {node_id, ip, port, status, stats, hardware, updated_at, error}}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+        self._refresh_requested = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='node-stats-poller', daemon=True)
+        self._thread.start()
+        print(f"[节点状态] 后台轮询已启动，间隔 {self.interval} 秒")
+
+    def request_refresh(self):
+        self._refresh_requested.set()
+
+    def _loop(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[节点状态] 轮询失败: {e}")
+            self._ready.set()
+            self._refresh_requested.wait(timeout=self.interval)
+            self._refresh_requested.clear()
+
+    def _fetch(self, ip, port):
+        """返回 (系统状态, 硬件数据)；系统状态拉取失败时抛出异常，硬件数据失败时为空"""
+        base_url = f"http://{ip}:{port}"
+        resp = node_http.get(f"{base_url}/api/system-stats", timeout=self.timeout)
+        if resp.status_code != 200:
+            raise Exception(f"系统状态返回 {resp.status_code}")
+        stats = resp.json()
+        hardware = {}
+        try:
+            resp = node_http.get(f"{base_url}/api/hardware-data", timeout=self.timeout)
+            if resp.status_code == 200:
+                hardware = resp.json()
+        except Exception:
+            pass
+        return stats, hardware
+
+    def poll(self):
+        """拉取一轮并替换快照，返回快照中的节点数"""
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT node_id, ip, port, status FROM nodes').fetchall()
+        finally:
+            conn.close()
+        # 心跳写回数据库有延迟，状态以登记表为准
+        statuses = {row['node_id']: node_registry.status(row['node_id']) or row['status'] for row in rows}
+        jobs = {row['node_id']: self._pool.submit(self._fetch, row['ip'], row['port'])
+                for row in rows if statuses[row['node_id']] == 'online'}
+
+        with self._lock:
+            previous = self._snapshot
+        snapshot = {}
+        for row in rows:
+            node_id = row['node_id']
+            entry = {'node_id': node_id, 'ip': row['ip'], 'port': row['port'], 'status': statuses[node_id],
+                     'stats': {}, 'hardware': {}, 'updated_at': None, 'error': None}
+            job = jobs.get(node_id)
+            if job is None:
+                # 离线节点不拉取，保留上次的拉取时间便于排查
+                entry['updated_at'] = previous.get(node_id, {}).get('updated_at')
+            else:
+                entry['updated_at'] = time.time()
+                try:
+                    entry['stats'], entry['hardware'] = job.result()
+                    node_metrics.record(node_id, entry['stats'], entry['updated_at'])
+                    self._failures.pop(node_id, None)
+                except Exception as e:
+                    entry['error'] = str(e)
+                    failures = self._failures[node_id] = self._failures.get(node_id, 0) + 1
+                    if failures >= self.offline_failures:
+                        entry['status'] = 'offline'
+                        node_registry.mark_offline(node_id, f'连续 {failures} 次拉取系统状态失败: {e}')
+                    else:
+                        # 偶发失败：状态不变，沿用上一轮的数据
+                        last = previous.get(node_id, {})
+                        entry['stats'], entry['hardware'] = last.get('stats', {}), last.get('hardware', {})
+                        entry['updated_at'] = last.get('updated_at')
+            snapshot[node_id] = entry
+
+        # 离线（不再拉取）或已删除的节点重新计数
+        for node_id in list(self._failures):
+            if node_id not in jobs:
+                del self._failures[node_id]
+
+        with self._lock:
+            self._snapshot = snapshot
+        return len(snapshot)
+
+    def snapshot(self):
+        """{node_id: 节点状态}；首次访问时启动轮询并等待第一轮完成"""
+        if self._thread is None:
+            self.start()
+        self._ready.wait(timeout=self.timeout * 2 + 1)
+        with self._lock:
+            return self._snapshot
+
+    def get(self, node_id):
+        return self.snapshot().get(node_id)
+
+
+node_stats = NodeStatsPoller()
+
+
+def start_node_stats_poller():
+    node_stats.start()
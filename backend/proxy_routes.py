@@ -1,6 +1,7 @@
 # proxy_routes.py - 代理转发路由
 from flask import Blueprint, jsonify, request, Response, stream_with_context, session
 import requests
+from node_client import node_http
 from auth import login_required
 from common import get_db, get_node_config_by_id
 from config import NAS_SHARED_SECRET
@@ -27,9 +28,11 @@ def proxy_share_request(node_id, local_token):
     try:
         req_headers = {key: value for (key, value) in request.headers if key.lower() != 'host'}
         req_headers['X-Forwarded-For'] = request.remote_addr
+        # 公开分享链接无需登录，转发时不能携带节点密钥
+        req_headers['X-NAS-Secret'] = None
 
         if request.method == 'GET':
-            resp = requests.get(
+            resp = node_http.get(
                 target_url,
                 params=request.args,
                 headers=req_headers,
@@ -37,7 +40,7 @@ def proxy_share_request(node_id, local_token):
                 timeout=30
             )
         elif request.method == 'POST':
-            resp = requests.post(
+            resp = node_http.post(
                 target_url,
                 params=request.args,
                 data=request.get_data(),
@@ -95,6 +98,8 @@ def proxy_to_node_page(node_id, subpath):
         for key, value in request.headers:
             if key.lower() not in excluded_headers:
                 headers[key] = value
+        # 页面代理无需登录，转发时不能携带节点密钥
+        headers['X-NAS-Secret'] = None
 
         try:
             if 'convert-pdf' in subpath or 'preview' in subpath:
@@ -103,13 +108,13 @@ def proxy_to_node_page(node_id, subpath):
                 timeout = 30
 
             if request.method == 'GET':
-                response = requests.get(target_url, headers=headers, timeout=timeout)
+                response = node_http.get(target_url, headers=headers, timeout=timeout)
             elif request.method == 'POST':
-                response = requests.get(target_url, headers=headers, timeout=timeout)
+                response = node_http.get(target_url, headers=headers, timeout=timeout)
             elif request.method == 'PUT':
-                response = requests.get(target_url, headers=headers, timeout=timeout)
+                response = node_http.get(target_url, headers=headers, timeout=timeout)
             elif request.method == 'DELETE':
-                response = requests.get(target_url, headers=headers, timeout=timeout)
+                response = node_http.get(target_url, headers=headers, timeout=timeout)
             else:
                 return jsonify({'error': '不支持的请求方法'}), 405
 
@@ -157,14 +162,14 @@ def proxy_to_node(node_id, api_path):
 
     try:
         if request.method == 'GET':
-            response = requests.get(
+            response = node_http.get(
                 target_url,
                 params=request.args,
                 headers=headers,
                 timeout=30
             )
         elif request.method == 'POST':
-            response = requests.post(
+            response = node_http.post(
                 target_url,
                 json=request.get_json() if request.is_json else None,
                 data=request.get_data() if not request.is_json else None,
@@ -172,14 +177,14 @@ def proxy_to_node(node_id, api_path):
                 timeout=30
             )
         elif request.method == 'PUT':
-            response = requests.put(
+            response = node_http.put(
                 target_url,
                 json=request.get_json(),
                 headers=headers,
                 timeout=30
             )
         elif request.method == 'DELETE':
-            response = requests.delete(
+            response = node_http.delete(
                 target_url,
                 json=request.get_json() if request.is_json else None,
                 headers=headers,
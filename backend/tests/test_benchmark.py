@@ -0,0 +1,14 @@
+# tests/test_benchmark.py - 基准测试默认编解码列表的冒烟测试（在 backend 目录下执行 python -m pytest tests）
+from ec_engine.benchmark import DEFAULT_CODECS, run
+
+
+def test_default_codecs_round_trip():
+    """默认列表中的每个编解码实现在各擦除数下都能正确还原数据"""
+    report = run(DEFAULT_CODECS.split(','), [(2, 1), (4, 2)], [4096, 300 * 1024], repeat=1,
+                 measure_memory=False, stripe_size=64 * 1024, workers=1)
+    assert {entry['codec'] for entry in report['results']} == set(DEFAULT_CODECS.split(','))
+    for entry in report['results']:
+        assert 'error' not in entry and 'skipped' not in entry, entry
+        assert len(entry['decode']) == entry['m'] + 1, entry
+        for decode in entry['decode']:
+            assert decode.get('correct') is True, (entry['codec'], entry['k'], entry['m'], decode)
@@ -1251,8 +1251,9 @@ async startEcUpload(window) {
 
         try {
             const formData = new FormData();
-            formData.append('file', file);
+            // target 放在文件之前，后端可边接收边编码分发
             formData.append('target', window.uploadTargetEc);
+            formData.append('file', file);
 
             await axios.post(`${this.apiBaseUrl}/api/ec_upload`, formData, {
                 headers: { 'Content-Type': 'multipart/form-data' },
@@ -3065,6 +3066,7 @@ async handleFmUpload(event, win) {
     if (win.selectedVolumeType === 'cross-ec') {
         for (const file of files) {
             const formData = new FormData();
+            formData.append('target', 'cross');
             formData.append('file', file);
 
             try {
@@ -3086,8 +3088,8 @@ async handleFmUpload(event, win) {
 if (win.selectedVolumeType === 'single-ec' && win.selectedFmNode) {
     for (const file of files) {
         const formData = new FormData();
-        formData.append('file', file);
         formData.append('target', win.selectedFmNode.id);  // 添加这行
+        formData.append('file', file);
 
         try {
             await axios.post(`${this.apiBaseUrl}/api/ec_upload`, formData, {  // 修改这行